@@ -28,6 +28,44 @@ class Settings(BaseSettings):
     aws_bucket_name: str = ""
     aws_region: str = "us-east-1"
     
+    # Object storage backend: "s3", or "local" to keep objects under
+    # local_storage_root (offline load tests, single-node deployments)
+    storage_backend: str = "s3"
+    local_storage_root: str = "./local_storage"
+    local_storage_url: str = "http://localhost:8000/api/storage"
+    
+    # Script processing queue the worker blocks on: "sqlite" (same host),
+    # "sqs" (job_queue_sqs_url), or "" to leave pickup to the worker's S3 scan
+    job_queue_backend: str = ""
+    job_queue_sqlite_path: str = "./local_storage/job_queue.db"
+    job_queue_sqs_url: str = ""
+    job_queue_visibility_timeout_seconds: float = 900.0
+    
+    # S3 client connection pool (keep above s3_executor_max_workers)
+    s3_max_pool_connections: int = 64
+    s3_connect_timeout_seconds: float = 5.0
+    s3_read_timeout_seconds: float = 30.0
+    s3_max_attempts: int = 5
+    
+    # S3 I/O execution
+    s3_executor_max_workers: int = 32
+    s3_call_timeout_seconds: float = 30.0
+    s3_metadata_concurrency: int = 16
+    s3_stream_chunk_size: int = 1024 * 1024
+    s3_delete_concurrency: int = 8
+    s3_copy_concurrency: int = 8
+    
+    # S3 lookup cache
+    s3_cache_max_entries: int = 1024
+    s3_listing_cache_ttl_seconds: float = 10.0
+    s3_metadata_cache_ttl_seconds: float = 60.0
+    s3_presign_refresh_margin_seconds: int = 300
+    
+    # Storage retention
+    retention_keep_last_versions: int = 10
+    retention_keep_completed_versions: int = 3
+    retention_log_max_age_days: int = 30
+    
     # Services
     cad_service_url: str = "http://localhost:9000"
     
@@ -19,6 +19,7 @@ from routes.projects import router as projects_router
 from routes.scripts import router as scripts_router
 from routes.monitoring import router as monitoring_router
 from routes.project_data import router as project_data_router
+from routes.storage import router as storage_router
 
 # Import services
 from services.database import db_service
@@ -57,6 +58,7 @@ app.include_router(projects_router, prefix="/api")
 app.include_router(scripts_router, prefix="/api")
 app.include_router(monitoring_router, prefix="/api")
 app.include_router(project_data_router, prefix="/api")
+app.include_router(storage_router, prefix="/api")
 
 
 @app.get("/")
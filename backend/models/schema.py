@@ -100,6 +100,7 @@ class FileMetadata(TypedDict, total=False):
     generated_by: str
     file_size: int
     content_type: str
+    script_hash: str
 
 class File(BaseDocument):
     """File document schema - tracks all project files."""
@@ -158,6 +159,9 @@ INDEXES = {
         [("version", 1)],  # Index on version
         [("timestamp", -1)],  # Descending index on timestamp for latest first
         [("project_id", 1), ("timestamp", -1)]  # Compound index for project logs by date
+    ],
+    "deletion_jobs": [
+        [("project_id", 1), ("created_at", -1)]  # Compound index for a project's latest deletion
     ]
 }
 
@@ -1,9 +1,9 @@
 """
 Monitoring and health check routes for S3 and AI services.
 """
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, status, BackgroundTasks
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import logging
 from datetime import datetime, timezone
 
@@ -11,6 +11,7 @@ from services.s3_service import s3_service
 from services.ai_service import ai_service
 from services.database import db_service
 from services.config_validator import config_validator
+from services.retention_service import retention_service, RetentionPolicy
 from dependencies import get_current_user
 
 logger = logging.getLogger(__name__)
@@ -38,7 +39,8 @@ async def health_check():
                 "configured": s3_configured,
                 "bucket": s3_metrics.get("bucket_name"),
                 "region": s3_metrics.get("region"),
-                "metrics": s3_metrics.get("s3_operations", {})
+                "metrics": s3_metrics.get("s3_operations", {}),
+                "cache": s3_metrics.get("cache", {})
             }
         except Exception as e:
             health_status["services"]["s3"] = {
@@ -105,27 +107,7 @@ async def s3_status(current_user: dict = Depends(get_current_user)):
         metrics = s3_service.get_performance_metrics()
         
         # Test S3 connectivity
-        connectivity_test = {
-            "can_connect": False,
-            "can_list_objects": False,
-            "error": None
-        }
-        
-        try:
-            if s3_service.s3_client and s3_service.aws_bucket_name:
-                # Test basic connectivity
-                s3_service.s3_client.head_bucket(Bucket=s3_service.aws_bucket_name)
-                connectivity_test["can_connect"] = True
-                
-                # Test list objects
-                s3_service.s3_client.list_objects_v2(
-                    Bucket=s3_service.aws_bucket_name,
-                    MaxKeys=1
-                )
-                connectivity_test["can_list_objects"] = True
-                
-        except Exception as e:
-            connectivity_test["error"] = str(e)
+        connectivity_test = await s3_service.check_connectivity()
         
         return {
             "timestamp": datetime.now(timezone.utc).isoformat(),
@@ -136,12 +118,15 @@ async def s3_status(current_user: dict = Depends(get_current_user)):
             },
             "connectivity": connectivity_test,
             "performance_metrics": metrics.get("s3_operations", {}),
+            "cache_metrics": metrics.get("cache", {}),
             "bucket_structure": {
                 "input_prefix": "input/{project_name}/{project_name}_v{version}.py",
                 "output_prefix": "output/{project_name}/v{version}/MyHeadlessModel.{format}",
                 "metadata_prefix": "output/{project_name}/v{version}/metadata.json",
                 "logs_prefix": "logs/{project_name}/{project_name}_info_{timestamp}.log",
                 "processed_prefix": "processed/{project_name}/{project_name}_v{version}.py.done",
+                "manifest_prefix": "manifests/{project_name}/manifest.json",
+                "failure_index": "manifests/failure_index.json",
                 "supported_formats": [".FCStd", ".STL", ".STEP", ".OBJ", ".GLTF"]
             }
         }
@@ -156,6 +141,162 @@ async def s3_status(current_user: dict = Depends(get_current_user)):
         )
 
 
+@router.get("/s3/failures")
+async def s3_failures(
+    project_name: str = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get every failed script across the bucket from the failure index."""
+    try:
+        if current_user.get("role") != "admin":
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Admin access required"
+            )
+        
+        failed_scripts = await s3_service.get_failed_scripts(project_name)
+        
+        error_types: Dict[str, int] = {}
+        for failure in failed_scripts:
+            error_types[failure["error_type"]] = error_types.get(failure["error_type"], 0) + 1
+        
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "total_failures": len(failed_scripts),
+            "retryable": sum(1 for failure in failed_scripts if failure["can_retry"]),
+            "error_types": error_types,
+            "failed_scripts": failed_scripts
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"S3 failures error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to get failed scripts"
+        )
+
+
+@router.get("/queue")
+async def job_queue_status(current_user: dict = Depends(get_current_user)):
+    """Get the depth of the script processing queue."""
+    try:
+        if current_user.get("role") != "admin":
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Admin access required"
+            )
+        
+        stats = await s3_service.get_job_queue_stats()
+        if stats is None:
+            return {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "configured": False
+            }
+        
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "configured": True,
+            "enqueued": s3_service.performance_metrics["jobs_enqueued"],
+            "enqueue_failures": s3_service.performance_metrics["job_enqueue_failures"],
+            **stats
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Job queue status error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to get job queue status"
+        )
+
+
+@router.post("/retention/run", status_code=status.HTTP_202_ACCEPTED)
+async def run_retention(
+    background_tasks: BackgroundTasks,
+    dry_run: bool = True,
+    project_name: Optional[str] = None,
+    keep_last_versions: Optional[int] = None,
+    keep_completed_versions: Optional[int] = None,
+    log_max_age_days: Optional[int] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Start a retention job over one project or the whole bucket.
+    
+    Defaults to a dry run that only reports the keys and bytes that would be
+    reclaimed. Policy fields not given fall back to the retention_* settings.
+    """
+    try:
+        if current_user.get("role") != "admin":
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Admin access required"
+            )
+        
+        policy = RetentionPolicy.from_settings()
+        if keep_last_versions is not None:
+            policy.keep_last_versions = keep_last_versions
+        if keep_completed_versions is not None:
+            policy.keep_completed_versions = keep_completed_versions
+        if log_max_age_days is not None:
+            policy.log_max_age_days = log_max_age_days
+        
+        job = retention_service.create_job(policy, dry_run=dry_run, project_name=project_name)
+        background_tasks.add_task(retention_service.run_job, job["job_id"])
+        
+        logger.info(f"🧹 Queued retention job {job['job_id']} (dry_run={dry_run})")
+        return {
+            "success": True,
+            "job_id": job["job_id"],
+            "dry_run": dry_run,
+            "policy": job["policy"],
+            "status": job["status"]
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Retention run error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to start retention job"
+        )
+
+
+@router.get("/retention/jobs")
+async def list_retention_jobs(current_user: dict = Depends(get_current_user)):
+    """List recent retention jobs."""
+    if current_user.get("role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    
+    return {"success": True, "jobs": retention_service.list_jobs()}
+
+
+@router.get("/retention/jobs/{job_id}")
+async def get_retention_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Get a retention job's progress and report."""
+    if current_user.get("role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    
+    job = retention_service.get_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Retention job not found"
+        )
+    
+    return {"success": True, **job}
+
+
 @router.get("/ai/metrics")
 async def ai_metrics(current_user: dict = Depends(get_current_user)):
     """Get AI service performance metrics."""
@@ -306,55 +447,44 @@ async def get_processing_status(
                     detail="Project not found"
                 )
         
-        # Get comprehensive status from all S3 directories
-        scripts = await s3_service.list_project_scripts(project_name)
-        log_files = await s3_service.get_project_logs(project_name, limit=5)
+        # The project manifest indexes every S3 directory in a single read
+        manifest = await s3_service.get_project_manifest(project_name)
+        versions = sorted(
+            (manifest or {}).get("versions", {}).values(),
+            key=lambda entry: entry["version"],
+            reverse=True
+        )
         
         # Check for processed markers
-        processed_scripts = []
-        if s3_service.s3_client and s3_service.aws_bucket_name:
-            try:
-                response = s3_service.s3_client.list_objects_v2(
-                    Bucket=s3_service.aws_bucket_name,
-                    Prefix=f"processed/{project_name}/"
-                )
-                if 'Contents' in response:
-                    for obj in response['Contents']:
-                        if obj['Key'].endswith('.py.done'):
-                            processed_scripts.append({
-                                "key": obj['Key'],
-                                "processed_at": obj['LastModified'].isoformat()
-                            })
-            except Exception as e:
-                logger.warning(f"Error checking processed scripts: {e}")
+        processed_scripts = [
+            {
+                "key": f"processed/{project_name}/{project_name}_v{entry['version']}.py.done",
+                "processed_at": entry["processed_at"]
+            }
+            for entry in versions if entry["status"] == "processed"
+        ]
         
         # Get version-specific information
         version_details = []
-        latest_version = None
+        latest_version = versions[0]["version"] if versions else None
         total_output_files = 0
         
-        if scripts:
-            latest_version = scripts[0]["version"]  # Scripts are sorted by version (descending)
+        for entry in versions[:5]:  # Check last 5 versions
+            version_details.append({
+                "version": entry["version"],
+                "script_uploaded": entry["uploaded_at"],
+                "status": entry["status"],
+                "output_files_count": len(entry["outputs"]),
+                "output_files": entry["outputs"],
+                "metadata": entry["metadata"],
+                "has_metadata": entry["metadata"] is not None,
+                "error": entry["error"]
+            })
             
-            # Check each version for outputs and metadata
-            for script in scripts[:5]:  # Check last 5 versions
-                version = script["version"]
-                version_output_files = await s3_service.check_output_files(project_name, version)
-                version_metadata = await s3_service.get_version_metadata(project_name, version)
-                
-                version_details.append({
-                    "version": version,
-                    "script_uploaded": script["last_modified"],
-                    "output_files_count": len(version_output_files),
-                    "output_files": version_output_files,
-                    "metadata": version_metadata,
-                    "has_metadata": version_metadata is not None
-                })
-                
-                total_output_files += len(version_output_files)
+            total_output_files += len(entry["outputs"])
         
         # Determine overall status based on latest version
-        if not scripts:
+        if not versions:
             overall_status = "no_scripts"
             status_message = "No scripts have been uploaded yet"
         elif version_details and version_details[0]["output_files_count"] > 0:
@@ -375,9 +505,9 @@ async def get_processing_status(
             "status_message": status_message,
             "details": {
                 "scripts": {
-                    "count": len(scripts),
+                    "count": len(versions),
                     "latest_version": latest_version,
-                    "versions": [s["version"] for s in scripts]
+                    "versions": [entry["version"] for entry in versions]
                 },
                 "output_files": {
                     "total_count": total_output_files,
@@ -388,8 +518,8 @@ async def get_processing_status(
                     "scripts": processed_scripts
                 },
                 "logs": {
-                    "count": len(log_files),
-                    "latest": log_files[0] if log_files else None
+                    "count": manifest["log_count"] if manifest else 0,
+                    "latest": manifest["latest_log"] if manifest else None
                 },
                 "version_details": version_details
             }
@@ -1,15 +1,17 @@
 """
 Project management routes.
 """
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, status, BackgroundTasks
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
+import asyncio
 import logging
 from datetime import datetime
 from services.database import db_service
 from services.project_service import project_service
 from services.s3_service import s3_service
+from services.deletion_service import deletion_service
 from dependencies import get_current_user
 from models.schema import ProjectStatus
 
@@ -115,6 +117,94 @@ async def get_projects(current_user: dict = Depends(get_current_user)):
         )
 
 
+def _s3_project_name_candidates(project_id: str, project: Dict[str, Any]) -> List[str]:
+    """
+    S3 project names a database project may be stored under.
+    
+    S3 structure: output/project-{shortId}/v1/project-{shortId}.{format}
+    The short ID comes from the project metadata, or is the last 8 chars of
+    the project ID; the full project ID is kept as a fallback.
+    """
+    short_id = None
+    if project.get("latest_s3_input") and isinstance(project["latest_s3_input"], dict):
+        stored_name = project["latest_s3_input"].get("project_name", "")
+        if stored_name.startswith("project-"):
+            short_id = stored_name.replace("project-", "")
+    
+    if not short_id and len(project_id) >= 8:
+        short_id = project_id[-8:]  # Use last 8 characters
+    
+    return [
+        f"project-{short_id}" if short_id else f"project-{project_id}",
+        project_id  # Fallback to full ID
+    ]
+
+
+async def _find_project_outputs(project_id: str, user_id: str) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+    """
+    Verify project ownership and locate its output files in S3.
+    
+    Returns:
+        The S3 project name the files were found under and the output files
+        (newest version first), or (None, []) if there are none yet.
+    """
+    # Handle demo projects
+    if project_id.startswith("demo-project-"):
+        if user_id != "demo-user":
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied"
+            )
+        # Demo projects don't have actual files
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Demo projects use placeholder files. No actual model files available for download."
+        )
+    
+    # Verify project belongs to user
+    project = project_service.get_project_by_id(project_id)
+    if not project:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Project not found"
+        )
+    
+    if project.get("user_id") != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
+    
+    # Direct S3 project name mapping based on project ID
+    project_name_candidates = _s3_project_name_candidates(project_id, project)
+    logger.info(f"🔍 S3 mapping: project_id={project_id}, candidates={project_name_candidates}")
+    logger.info(f"🔍 Project from DB: title='{project.get('title')}', name='{project.get('name')}'")
+    
+    # Try to find files using different project name strategies
+    for project_name in project_name_candidates:
+        try:
+            logger.info(f"🔍 Checking S3 manifest for project: {project_name}")
+            manifest = await s3_service.get_project_manifest(project_name)
+            files = sorted(
+                (f for entry in (manifest or {}).get("versions", {}).values() for f in entry["outputs"]),
+                key=lambda f: f.get("version") or 0,
+                reverse=True
+            )
+            logger.info(f"🔍 S3 returned {len(files)} files for '{project_name}': {[f.get('filename', 'unknown') for f in files]}")
+            
+            if files:
+                logger.info(f"✅ Found files using project name: {project_name}")
+                return project_name, files
+            else:
+                logger.info(f"⚠️ No files found for project name: {project_name}")
+        except Exception as e:
+            logger.warning(f"❌ Error checking project name '{project_name}': {e}")
+            continue
+    
+    logger.warning(f"No files found for project {project_id}")
+    return None, []
+
+
 @router.get("/{project_id}/download/{format}")
 async def download_project_file(
     project_id: str,
@@ -125,81 +215,14 @@ async def download_project_file(
     """Generate a pre-signed URL for downloading a project output file."""
     try:
         user_id = current_user["id"]
-        
-        # Handle demo projects
-        if project_id.startswith("demo-project-"):
-            if user_id != "demo-user":
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="Access denied"
-                )
-            # Demo projects don't have actual files
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Demo projects use placeholder files. No actual model files available for download."
-            )
-        
-        # Verify project belongs to user
-        project = project_service.get_project_by_id(project_id)
-        if not project:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Project not found"
-            )
-        
-        if project.get("user_id") != user_id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Access denied"
-            )
-        
-        # Direct S3 project name mapping based on project ID
-        # S3 structure: output/project-{shortId}/v1/project-{shortId}.{format}
-        # Extract short ID from project metadata or use last 8 chars of project ID
-        short_id = None
-        if project.get("latest_s3_input") and isinstance(project["latest_s3_input"], dict):
-            stored_name = project["latest_s3_input"].get("project_name", "")
-            if stored_name.startswith("project-"):
-                short_id = stored_name.replace("project-", "")
-        
-        if not short_id and len(project_id) >= 8:
-            short_id = project_id[-8:]  # Use last 8 characters
-        
-        project_name_candidates = [
-            f"project-{short_id}" if short_id else f"project-{project_id}",
-            project_id  # Fallback to full ID
-        ]
-        logger.info(f"🔍 S3 mapping: project_id={project_id}, short_id={short_id}, candidates={project_name_candidates}")
-        
         format_upper = format.upper()
         
         logger.info(f"🔄 Download request for project_id: {project_id}")
-        logger.info(f"🔍 Project from DB: title='{project.get('title')}', name='{project.get('name')}'")
-        logger.info(f"🔍 Will try S3 paths: {project_name_candidates}")
         logger.info(f"🔍 Looking for format: {format_upper}")
         
-        # Try to find files using different project name strategies
-        files = []
-        successful_project_name = None
-        
-        for project_name in project_name_candidates:
-            try:
-                logger.info(f"🔍 Checking S3 for files under path: output/{project_name}/")
-                files = await s3_service.check_output_files(project_name)
-                logger.info(f"🔍 S3 returned {len(files)} files for '{project_name}': {[f.get('filename', 'unknown') for f in files]}")
-                
-                if files:
-                    successful_project_name = project_name
-                    logger.info(f"✅ Found files using project name: {project_name}")
-                    break
-                else:
-                    logger.info(f"⚠️ No files found for project name: {project_name}")
-            except Exception as e:
-                logger.warning(f"❌ Error checking project name '{project_name}': {e}")
-                continue
+        successful_project_name, files = await _find_project_outputs(project_id, user_id)
         
         if not files:
-            logger.warning(f"No files found for project {project_id}")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"No output files found for project. The EC2 worker may still be processing your script."
@@ -227,7 +250,8 @@ async def download_project_file(
             project_name=successful_project_name,
             filename=matching_file["filename"],
             version=matching_file.get("version"),
-            expiration=3600  # 1 hour
+            expiration=3600,  # 1 hour
+            etag=matching_file.get("etag")
         )
         
         if not download_url:
@@ -245,6 +269,7 @@ async def download_project_file(
             "format": format_upper,
             "version": matching_file.get("version"),
             "size": matching_file.get("size"),
+            "etag": matching_file.get("etag"),
             "last_modified": matching_file.get("last_modified")
         }
         
@@ -265,6 +290,87 @@ async def download_project_file(
         )
 
 
+@router.get("/{project_id}/downloads")
+async def get_project_download_urls(
+    project_id: str,
+    version: Optional[int] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Generate pre-signed URLs for every available output format of a version.
+    
+    Replaces one /download/{format} request per format with a single call:
+    ownership is checked and S3 is consulted once for all formats.
+    """
+    try:
+        user_id = current_user["id"]
+        
+        project_name, files = await _find_project_outputs(project_id, user_id)
+        
+        if not files:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No output files found for project. The EC2 worker may still be processing your script."
+            )
+        
+        # Default to the newest version that has outputs
+        target_version = version if version is not None else files[0].get("version")
+        version_files = [f for f in files if f.get("version") == target_version]
+        
+        if not version_files:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No output files found for version {target_version}"
+            )
+        
+        expiration = 3600  # 1 hour
+        download_urls = await asyncio.gather(*[
+            s3_service.generate_download_url(
+                project_name=project_name,
+                filename=f["filename"],
+                version=f.get("version"),
+                expiration=expiration,
+                etag=f.get("etag")
+            )
+            for f in version_files
+        ])
+        
+        formats = {}
+        for file, download_url in zip(version_files, download_urls):
+            if not download_url:
+                continue
+            format_upper = file.get("format", "").upper().lstrip('.')
+            formats[format_upper] = {
+                "download_url": download_url,
+                "filename": file["filename"],
+                "format": format_upper,
+                "version": file.get("version"),
+                "size": file.get("size"),
+                "etag": file.get("etag"),
+                "last_modified": file.get("last_modified")
+            }
+        
+        logger.info(f"✅ Generated {len(formats)} download URLs for {project_name} v{target_version}")
+        
+        return {
+            "success": True,
+            "project_id": project_id,
+            "version": target_version,
+            "expires_in": expiration,
+            "available_formats": list(formats.keys()),
+            "formats": formats
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch download URL error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to generate download URLs"
+        )
+
+
 @router.get("/{project_id}/debug")
 async def debug_project_files(
     project_id: str,
@@ -381,12 +487,19 @@ async def get_project_chat(
         )
 
 
-@router.delete("/{project_id}")
+@router.delete("/{project_id}", status_code=status.HTTP_202_ACCEPTED)
 async def delete_project(
     project_id: str,
+    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user)
 ):
-    """Delete a project and all associated data."""
+    """
+    Delete a project and all associated data.
+    
+    Database documents and the S3 objects under the project's recorded S3
+    name are removed by a background job; poll
+    GET /projects/{project_id}/deletion for progress.
+    """
     try:
         user_id = current_user["id"]
         
@@ -397,6 +510,16 @@ async def delete_project(
                 detail="Cannot delete demo projects"
             )
         
+        # A deletion already in progress is reported rather than restarted
+        existing_job = deletion_service.get_project_job(project_id)
+        if existing_job and existing_job["user_id"] == user_id and deletion_service.is_active(project_id):
+            return {
+                "success": True,
+                "message": "Project deletion already in progress",
+                "job_id": existing_job["job_id"],
+                "status": existing_job["status"]
+            }
+        
         # Verify project exists and belongs to user
         project = project_service.get_project_by_id(project_id)
         if not project:
@@ -411,17 +534,21 @@ async def delete_project(
                 detail="Access denied"
             )
         
-        # Delete the project
-        success = project_service.delete_project(project_id)
+        # Only the S3 name recorded on the project is purged: the name
+        # candidates used for lookups are guesses that may match another project
+        latest_s3_input = project.get("latest_s3_input")
+        s3_project_name = latest_s3_input.get("project_name") if isinstance(latest_s3_input, dict) else None
         
-        if success:
-            logger.info(f"✅ Successfully deleted project {project_id}")
-            return {"success": True, "message": "Project deleted successfully"}
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to delete project"
-            )
+        job = deletion_service.create_job(project_id, user_id, s3_project_name or None)
+        background_tasks.add_task(deletion_service.run_job, job["job_id"])
+        
+        logger.info(f"🗑️ Queued deletion of project {project_id} (job {job['job_id']})")
+        return {
+            "success": True,
+            "message": "Project deletion started",
+            "job_id": job["job_id"],
+            "status": job["status"]
+        }
         
     except HTTPException:
         raise
@@ -433,6 +560,25 @@ async def delete_project(
         )
 
 
+@router.get("/{project_id}/deletion")
+async def get_project_deletion_status(
+    project_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get the progress of a project's deletion job."""
+    job = deletion_service.get_project_job(project_id)
+    if not job or job["user_id"] != current_user["id"]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No deletion found for project"
+        )
+    
+    return {
+        "success": True,
+        **{key: value for key, value in job.items() if key != "user_id"}
+    }
+
+
 @router.post("/")
 async def create_project(
     project_data: ProjectCreate,
@@ -721,45 +867,6 @@ async def update_project(
         )
 
 
-@router.delete("/{project_id}")
-async def delete_project(
-    project_id: str,
-    current_user: dict = Depends(get_current_user)
-):
-    """Delete a project."""
-    try:
-        user_id = current_user["id"]
-        
-        # Don't allow deleting demo projects
-        if project_id.startswith("demo-project-"):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Cannot delete demo projects"
-            )
-        
-        # Verify project ownership
-        project = project_service.get_project_by_id(project_id)
-        if not project or project["user_id"] != user_id:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Project not found"
-            )
-        
-        # Delete project from database
-        project_service.delete_project(project_id)
-        
-        return {"message": "Project deleted successfully"}
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Delete project error: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to delete project"
-        )
-
-
 @router.post("/{project_id}/chat")
 async def send_chat_message(
     project_id: str,
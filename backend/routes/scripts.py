@@ -2,13 +2,16 @@
 Script management routes for S3-based CAD script handling.
 Handles versioning, uploads, downloads, and output file management.
 """
-from fastapi import APIRouter, HTTPException, Depends, status, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, status, BackgroundTasks, Header, Response, Query
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional, Dict, Any, List
 import logging
+import re
 from pydantic import BaseModel
 import asyncio
 from datetime import datetime, timezone
+from email.utils import format_datetime
 
 from services.database import db_service
 from services.project_service import project_service
@@ -19,6 +22,9 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/projects", tags=["scripts"])
 security = HTTPBearer()
 
+# Single byte-range requests; multi-range requests are served as full bodies
+BYTE_RANGE_PATTERN = re.compile(r"^bytes=(\d+-\d*|-\d+)$")
+
 
 @router.get("/test")
 async def test_route():
@@ -99,6 +105,7 @@ class ScriptResponse(BaseModel):
 @router.get("/{project_name}/scripts")
 async def list_project_scripts(
     project_name: str,
+    include_metadata: bool = True,
     current_user: dict = Depends(get_current_user)
 ):
     """List all script versions for a project."""
@@ -115,7 +122,7 @@ async def list_project_scripts(
                 )
         
         # Get scripts from S3
-        scripts = await s3_service.list_project_scripts(project_name)
+        scripts = await s3_service.list_project_scripts(project_name, include_metadata=include_metadata)
         
         return {
             "success": True,
@@ -314,6 +321,79 @@ async def get_project_outputs(
         )
 
 
+def _verify_output_access(project_name: str, user_id: str) -> None:
+    """Raise 404 unless the user may read the project's outputs (demo projects are open)."""
+    if project_name.startswith("demo-project-"):
+        return
+    
+    # Try to get project by ID first (frontend sends project ID)
+    logger.info(f"Looking up project by ID: {project_name}")
+    project = project_service.get_project_by_id(project_name)
+    if not project:
+        # Fallback: try by name for backward compatibility
+        logger.info(f"Project not found by ID, trying by name: {project_name}")
+        project = db_service.get_project(project_name)
+    
+    if not project:
+        logger.warning(f"Project not found: {project_name}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Project not found"
+        )
+    
+    project_owner = project.get("created_by")
+    logger.info(f"Project {project_name} owner: {project_owner}, requesting user: {user_id}")
+    
+    # Handle projects with null owners (legacy projects or data migration issues)
+    if project_owner is None:
+        logger.warning(f"Project {project_name} has null owner, allowing access for user {user_id}")
+        # Allow access for projects with null owners - they may be legacy projects
+    elif project_owner != user_id:
+        logger.warning(f"Project access denied for user {user_id}, project owned by {project_owner}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Project not found or access denied"
+        )
+
+
+def _normalize_output_format(format: str) -> str:
+    """Map a requested format to its '.EXT' form, raising 400 if unsupported."""
+    supported_formats = ['.FCSTD', '.STL', '.STEP', '.OBJ', '.GLTF']
+    format_upper = format.upper()
+    if not format_upper.startswith('.'):
+        format_upper = '.' + format_upper
+    
+    if format_upper not in supported_formats:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported format. Supported formats: {supported_formats}"
+        )
+    
+    return format_upper
+
+
+def _match_output_file(output_files: List[Dict[str, Any]], format_upper: str) -> Optional[Dict[str, Any]]:
+    """Pick the output file for a format, falling back from STL to OBJ."""
+    matching_file = None
+    
+    # First, try to find exact format match
+    for file in output_files:
+        if file["format"].upper() == format_upper:
+            matching_file = file
+            break
+    
+    # If STL not found, try OBJ as fallback (both work in Three.js)
+    if not matching_file and format_upper == '.STL':
+        logger.info("STL not found, trying OBJ as fallback")
+        for file in output_files:
+            if file["format"].upper() == '.OBJ':
+                matching_file = file
+                logger.info(f"Using OBJ fallback: {file['filename']}")
+                break
+    
+    return matching_file
+
+
 @router.get("/{project_name}/download/{format}")
 async def download_output_file(
     project_name: str,
@@ -330,69 +410,16 @@ async def download_output_file(
         user_id = current_user["id"]
         
         # Verify project ownership (skip for demo projects)
-        if not project_name.startswith("demo-project-"):
-            # Try to get project by ID first (frontend sends project ID)
-            logger.info(f"Looking up project by ID: {project_name}")
-            project = project_service.get_project_by_id(project_name)
-            if not project:
-                # Fallback: try by name for backward compatibility
-                logger.info(f"Project not found by ID, trying by name: {project_name}")
-                project = db_service.get_project(project_name)
-            
-            if not project:
-                logger.warning(f"Project not found: {project_name}")
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Project not found"
-                )
-            
-            project_owner = project.get("created_by")
-            logger.info(f"Project {project_name} owner: {project_owner}, requesting user: {user_id}")
-            
-            # Handle projects with null owners (legacy projects or data migration issues)
-            if project_owner is None:
-                logger.warning(f"Project {project_name} has null owner, allowing access for user {user_id}")
-                # Allow access for projects with null owners - they may be legacy projects
-            elif project_owner != user_id:
-                logger.warning(f"Project access denied for user {user_id}, project owned by {project_owner}")
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Project not found or access denied"
-                )
-        
-        # Validate format
-        supported_formats = ['.FCSTD', '.STL', '.STEP', '.OBJ', '.GLTF']
-        format_upper = format.upper()
-        if not format_upper.startswith('.'):
-            format_upper = '.' + format_upper
+        _verify_output_access(project_name, user_id)
         
-        if format_upper not in supported_formats:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Unsupported format. Supported formats: {supported_formats}"
-            )
+        format_upper = _normalize_output_format(format)
         
         # Find the output file with matching format
         logger.info(f"Checking output files for project {project_name}, format {format_upper}")
         output_files = await s3_service.check_output_files(project_name, version)
         logger.info(f"Found {len(output_files)} output files: {[f['filename'] for f in output_files]}")
         
-        matching_file = None
-        
-        # First, try to find exact format match
-        for file in output_files:
-            if file["format"].upper() == format_upper:
-                matching_file = file
-                break
-        
-        # If STL not found, try OBJ as fallback (both work in Three.js)
-        if not matching_file and format_upper == '.STL':
-            logger.info("STL not found, trying OBJ as fallback")
-            for file in output_files:
-                if file["format"].upper() == '.OBJ':
-                    matching_file = file
-                    logger.info(f"Using OBJ fallback: {file['filename']}")
-                    break
+        matching_file = _match_output_file(output_files, format_upper)
         
         if not matching_file:
             version_text = f" version {version}" if version else ""
@@ -409,7 +436,8 @@ async def download_output_file(
             project_name=project_name,
             filename=matching_file["filename"],
             version=matching_file.get("version"),
-            expiration=3600  # 1 hour
+            expiration=3600,  # 1 hour
+            etag=matching_file.get("etag")
         )
         
         if not download_url:
@@ -446,6 +474,148 @@ async def download_output_file(
         )
 
 
+@router.get("/{project_name}/stream/{format}")
+async def stream_output_file(
+    project_name: str,
+    format: str,
+    version: Optional[int] = None,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Stream an output file through the backend for clients that cannot reach S3.
+    
+    The S3 body is piped in fixed-size chunks without buffering the file.
+    Single byte ranges are answered with 206 and If-None-Match with 304, and
+    Content-Length/ETag are always sent, so resumable and parallel-chunk
+    downloads work.
+    """
+    try:
+        user_id = current_user["id"]
+        
+        # Verify project ownership (skip for demo projects)
+        _verify_output_access(project_name, user_id)
+        
+        format_upper = _normalize_output_format(format)
+        output_files = await s3_service.check_output_files(project_name, version)
+        matching_file = _match_output_file(output_files, format_upper)
+        
+        if not matching_file:
+            version_text = f" version {version}" if version else ""
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No {format_upper} file found for project {project_name}{version_text}"
+            )
+        
+        etag = matching_file.get("etag")
+        headers = {
+            "Accept-Ranges": "bytes",
+            "Cache-Control": "private, max-age=3600"
+        }
+        if etag:
+            headers["ETag"] = etag
+        
+        # Revalidation can be answered from the listing without touching S3
+        if if_none_match and etag and (
+            if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+        ):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        
+        byte_range = range_header if range_header and BYTE_RANGE_PATTERN.match(range_header.strip()) else None
+        stream = await s3_service.open_object_stream(
+            matching_file["key"],
+            byte_range=byte_range,
+            if_none_match=if_none_match if not etag else None
+        )
+        
+        if stream["status"] == 304:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        if stream["status"] == 404:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"{matching_file['filename']} no longer exists"
+            )
+        if stream["status"] == 416:
+            headers["Content-Range"] = f"bytes */{matching_file['size']}"
+            return Response(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, headers=headers)
+        
+        headers["Content-Length"] = str(stream["content_length"])
+        headers["Content-Disposition"] = f'attachment; filename="{matching_file["filename"]}"'
+        if stream["etag"]:
+            headers["ETag"] = stream["etag"]
+        if stream["content_range"]:
+            headers["Content-Range"] = stream["content_range"]
+        if stream["last_modified"]:
+            headers["Last-Modified"] = format_datetime(stream["last_modified"], usegmt=True)
+        
+        logger.info(f"📤 Streaming {matching_file['key']} ({stream['status']}, {stream['content_length']} bytes)")
+        
+        return StreamingResponse(
+            s3_service.iter_object_body(stream["body"]),
+            status_code=stream["status"],
+            headers=headers,
+            media_type=stream["content_type"] or "application/octet-stream"
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Stream output file error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to stream output file"
+        )
+
+
+@router.get("/{project_name}/bundle/{version}")
+async def download_version_bundle(
+    project_name: str,
+    version: int,
+    include_script: bool = True,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Download every output of a version (plus its source script) as one ZIP.
+    
+    The archive is generated on the fly from S3 bodies and streamed to the
+    client; it is never materialised in memory or on disk.
+    """
+    try:
+        user_id = current_user["id"]
+        
+        # Verify project ownership (skip for demo projects)
+        _verify_output_access(project_name, user_id)
+        
+        entries = await s3_service.get_version_bundle_entries(project_name, version, include_script)
+        
+        if not any(entry["kind"] == "output" for entry in entries):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No output files found for project {project_name} version {version}"
+            )
+        
+        logger.info(f"📦 Streaming bundle of {len(entries)} files for {project_name} v{version}")
+        
+        return StreamingResponse(
+            s3_service.iter_zip_bundle(entries),
+            media_type="application/zip",
+            headers={
+                "Content-Disposition": f'attachment; filename="{project_name}_v{version}.zip"',
+                "Cache-Control": "private, max-age=3600"
+            }
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Bundle download error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to create bundle"
+        )
+
+
 @router.post("/auto-fix-error")
 async def auto_fix_script_error(request_body: dict):
     """
@@ -582,9 +752,19 @@ async def get_project_errors(
 async def get_log_content(
     project_name: str,
     log_filename: str,
+    tail_bytes: Optional[int] = Query(None, ge=1),
+    offset: Optional[int] = Query(None, ge=0),
+    follow: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get the content of a specific log file."""
+    """
+    Get the content of a specific log file.
+    
+    With `tail_bytes` only the end of the log is returned; with `offset` only
+    the bytes from that position on. `follow` reads from `offset` (default 0)
+    and is meant for polling: pass the returned `next_offset` back to receive
+    only what was appended since.
+    """
     try:
         user_id = current_user["id"]
         
@@ -597,6 +777,29 @@ async def get_log_content(
                     detail="Project not found"
                 )
         
+        if follow and offset is None:
+            offset = 0
+        
+        # Partial reads return the offsets needed to continue
+        if tail_bytes is not None or offset is not None:
+            result = await s3_service.read_log_range(project_name, log_filename, offset=offset, tail_bytes=tail_bytes)
+            if result is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Log file not found"
+                )
+            
+            return {
+                "success": True,
+                "project_name": project_name,
+                "log_filename": log_filename,
+                "content": result["content"],
+                "content_type": "text/plain",
+                "offset": result["offset"],
+                "next_offset": result["next_offset"],
+                "size": result["size"]
+            }
+        
         # Get log content from S3
         content = await s3_service.get_log_content(project_name, log_filename)
         
@@ -749,10 +952,10 @@ async def get_project_status(
                     detail="Project not found"
                 )
         
-        # Get latest script version and check status
-        scripts = await s3_service.list_project_scripts(project_name)
+        # One manifest read replaces listing input/ and output/ plus metadata.json
+        manifest = await s3_service.get_project_manifest(project_name)
         
-        if not scripts:
+        if not manifest or not manifest["versions"]:
             status_info = {
                 "status": "no_scripts",
                 "message": "No scripts uploaded yet",
@@ -767,14 +970,12 @@ async def get_project_status(
                 "output_file_count": 0
             }
         
-        latest_script = scripts[0]  # Scripts are sorted by version (descending)
-        latest_version = latest_script["version"]
-        
-        # Check for output files in the latest version folder
-        output_files = await s3_service.check_output_files(project_name, latest_version)
+        latest_version = manifest["latest_version"]
+        latest_entry = manifest["versions"][str(latest_version)]
         
-        # Get metadata if available
-        metadata = await s3_service.get_version_metadata(project_name, latest_version)
+        # Output files and metadata recorded for the latest version
+        output_files = latest_entry["outputs"]
+        metadata = latest_entry["metadata"]
         
         if output_files:
             status_info = {
@@ -798,7 +999,7 @@ async def get_project_status(
             "success": True,
             "project_name": project_name,
             "status_info": status_info,
-            "script_count": len(scripts),
+            "script_count": len(manifest["versions"]),
             "output_file_count": len(output_files),
             "metadata": metadata
         }
@@ -1039,6 +1240,43 @@ async def retry_failed_script(
         )
 
 
+@router.post("/{project_name}/pin/{version}")
+async def pin_script_version(
+    project_name: str,
+    version: int,
+    pinned: bool = True,
+    current_user: dict = Depends(get_current_user)
+):
+    """Pin (or unpin) a version so storage retention never expires it."""
+    try:
+        user_id = current_user["id"]
+        
+        # Verify project ownership (skip for demo projects)
+        _verify_output_access(project_name, user_id)
+        
+        if not await s3_service.set_version_pinned(project_name, version, pinned):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Version {version} not found for project {project_name}"
+            )
+        
+        return {
+            "success": True,
+            "project_name": project_name,
+            "version": version,
+            "pinned": pinned
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Pin script version error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to pin script version"
+        )
+
+
 @router.post("/{project_name}/mark-failed/{version}")
 async def mark_script_failed(
     project_name: str,
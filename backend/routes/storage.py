@@ -0,0 +1,84 @@
+"""
+Download route for presigned URLs issued by the local storage backend.
+With storage_backend="s3" clients download from S3 directly and this route is unused.
+"""
+from fastapi import APIRouter, HTTPException, status, Header, Response, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import logging
+import re
+import time
+from email.utils import format_datetime
+
+from services.s3_service import s3_service
+from services.storage_backend import LocalStorageBackend
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/storage", tags=["storage"])
+
+BYTE_RANGE_PATTERN = re.compile(r"^bytes=(\d+-\d*|-\d+)$")
+
+
+@router.get("/{bucket}/{key:path}")
+async def download_object(
+    bucket: str,
+    key: str,
+    expires: int = Query(...),
+    signature: str = Query(...),
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match")
+):
+    """
+    Serve an object from local storage for a presigned URL.
+    
+    The URL's HMAC signature and expiry replace authentication, like an S3
+    presigned URL. Supports Range and If-None-Match.
+    """
+    backend = s3_service.s3_client
+    if not isinstance(backend, LocalStorageBackend) or bucket != s3_service.aws_bucket_name:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    
+    if not backend.verify_presigned_url(bucket, key, expires, signature):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid or expired signature")
+    
+    try:
+        byte_range = range_header if range_header and BYTE_RANGE_PATTERN.match(range_header.strip()) else None
+        stream = await s3_service.open_object_stream(key, byte_range=byte_range, if_none_match=if_none_match)
+        
+        headers = {
+            "Accept-Ranges": "bytes",
+            "Cache-Control": f"private, max-age={max(0, expires - int(time.time()))}, immutable"
+        }
+        
+        if stream["status"] == 304:
+            headers["ETag"] = stream["etag"]
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        if stream["status"] == 404:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"{key} does not exist")
+        if stream["status"] == 416:
+            return Response(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, headers=headers)
+        
+        headers["Content-Length"] = str(stream["content_length"])
+        headers["Content-Disposition"] = f'attachment; filename="{key.rsplit("/", 1)[-1]}"'
+        if stream["etag"]:
+            headers["ETag"] = stream["etag"]
+        if stream["content_range"]:
+            headers["Content-Range"] = stream["content_range"]
+        if stream["last_modified"]:
+            headers["Last-Modified"] = format_datetime(stream["last_modified"], usegmt=True)
+        
+        return StreamingResponse(
+            s3_service.iter_object_body(stream["body"]),
+            status_code=stream["status"],
+            headers=headers,
+            media_type=stream["content_type"] or "application/octet-stream"
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Local storage download error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to read object"
+        )
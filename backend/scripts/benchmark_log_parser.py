@@ -0,0 +1,133 @@
+"""
+Microbenchmark for S3Service._parse_log_content on ~10 MB worker logs.
+Compares the single-pass parser against the previous line-by-line parser
+and checks that both return the same error information.
+
+Usage: python scripts/benchmark_log_parser.py [size_mb] [repeats]
+"""
+import os
+import random
+import sys
+import time
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.s3_service import s3_service
+
+
+def legacy_parse_log_content(log_content: str) -> dict:
+    """The previous parser: lowercase every line and run the full rule chain."""
+    error_info = {
+        "error_type": "unknown",
+        "error_details": "",
+        "stack_trace": "",
+        "missing_modules": [],
+        "syntax_errors": [],
+        "runtime_errors": []
+    }
+
+    lines = log_content.split('\n')
+
+    for i, line in enumerate(lines):
+        line_lower = line.lower()
+
+        if 'importerror' in line_lower or 'modulenotfounderror' in line_lower:
+            error_info["error_type"] = "import_error"
+            error_info["error_details"] = line.strip()
+            if 'cadquery' in line_lower:
+                error_info["missing_modules"].append("cadquery")
+            elif 'cq' in line_lower:
+                error_info["missing_modules"].append("cadquery")
+            elif 'importgui' in line_lower:
+                error_info["missing_modules"].append("importgui")
+        elif 'importgui' in line_lower or 'gui' in line_lower:
+            error_info["error_type"] = "gui_error"
+            error_info["error_details"] = line.strip()
+            error_info["missing_modules"].append("importgui")
+        elif 'syntaxerror' in line_lower:
+            error_info["error_type"] = "syntax_error"
+            error_info["syntax_errors"].append(line.strip())
+        elif 'attributeerror' in line_lower:
+            error_info["error_type"] = "attribute_error"
+            error_info["runtime_errors"].append(line.strip())
+        elif 'error:' in line_lower or 'exception:' in line_lower:
+            error_info["runtime_errors"].append(line.strip())
+        elif 'freecad' in line_lower and ('error' in line_lower or 'exception' in line_lower):
+            error_info["error_type"] = "freecad_error"
+            error_info["runtime_errors"].append(line.strip())
+        elif 'traceback' in line_lower:
+            stack_lines = []
+            for j in range(i, min(i + 10, len(lines))):
+                if lines[j].strip():
+                    stack_lines.append(lines[j])
+                else:
+                    break
+            error_info["stack_trace"] = '\n'.join(stack_lines)
+
+    return error_info
+
+
+def generate_log(size_mb: float, seed: int = 42) -> str:
+    """Build a FreeCAD-style log: mostly repeated progress/warning noise, a few errors, a traceback at the end."""
+    rng = random.Random(seed)
+    noise = [
+        "FreeCAD 0.21.2, Libs: 0.21.2R33771 (Git)",
+        "Exporting STEP file with tolerance 0.01",
+        "Warning: shape tolerance exceeds 1e-07, fixing face {n}",
+        "Mesh: {n} facets written",
+        "Recompute document MyHeadlessModel ({n} objects)",
+        "Sketch{n}: fully constrained",
+        "Part::Feature Pad{n} touched",
+    ]
+    rare = [
+        "Exception: Recompute failed for Pad{n}",
+        "FreeCAD Part error in fillet {n}",
+        "QtGui not available in console mode",
+    ]
+    lines = []
+    size = 0
+    target = int(size_mb * 1024 * 1024)
+    while size < target:
+        template = rng.choice(rare) if rng.random() < 0.001 else rng.choice(noise)
+        line = template.format(n=rng.randint(1, 10_000))
+        lines.append(line)
+        size += len(line) + 1
+
+    lines += [
+        "",
+        "Traceback (most recent call last):",
+        '  File "/home/ubuntu/freecad_worker/input/project_v3.py", line 12, in <module>',
+        "    import cadquery as cq",
+        "ModuleNotFoundError: No module named 'cadquery'",
+        "",
+    ]
+    return '\n'.join(lines)
+
+
+def bench(func, text: str, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    text = generate_log(size_mb)
+    print(f"Log size: {len(text) / 1024 / 1024:.1f} MB, {text.count(chr(10)) + 1} lines")
+
+    assert s3_service._parse_log_content(text) == legacy_parse_log_content(text), "parsers disagree"
+
+    legacy = bench(legacy_parse_log_content, text, repeats)
+    single_pass = bench(s3_service._parse_log_content, text, repeats)
+    print(f"line-by-line parser: {legacy * 1000:8.1f} ms")
+    print(f"single-pass parser:  {single_pass * 1000:8.1f} ms  ({legacy / single_pass:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,11 +10,11 @@ from datetime import datetime, timezone
 from typing import Dict, Any, Optional
 import requests
 import json
-import boto3
 from botocore.exceptions import ClientError, NoCredentialsError
 from google import genai
 from openai import OpenAI
 from config.settings import settings
+from services.storage_client import get_s3_client
 
 logger = logging.getLogger(__name__)
 
@@ -442,11 +442,10 @@ except Exception as e:
         """Initialize AWS S3 client."""
         if all([self.aws_access_key_id, self.aws_secret_access_key, self.aws_bucket_name]):
             try:
-                self.s3_client = boto3.client(
-                    's3',
-                    aws_access_key_id=self.aws_access_key_id,
-                    aws_secret_access_key=self.aws_secret_access_key,
-                    region_name=self.aws_region
+                self.s3_client = get_s3_client(
+                    self.aws_access_key_id,
+                    self.aws_secret_access_key,
+                    self.aws_region
                 )
                 logger.info("✅ AWS S3 client initialized successfully")
             except Exception as e:
@@ -721,6 +720,7 @@ except Exception as e:
                     "uploaded_by": user_id,
                     "generated_by": "cadscribe-ai",
                     "confidence": s3_result.get('metadata', {}).get('confidence'),
+                    "script_hash": s3_result.get('script_hash'),
                     "generation_source": "ai_service"
                 }
             }
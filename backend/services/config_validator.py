@@ -6,11 +6,12 @@ import logging
 import os
 from typing import Dict, List, Any, Optional
 from dataclasses import dataclass
-import boto3
 from botocore.exceptions import ClientError, NoCredentialsError
 from pymongo import MongoClient
 from pymongo.errors import ServerSelectionTimeoutError
 
+from services.storage_client import get_s3_client
+
 logger = logging.getLogger(__name__)
 
 
@@ -204,12 +205,11 @@ class ConfigValidator:
             return
         
         try:
-            # Create S3 client
-            s3_client = boto3.client(
-                's3',
-                aws_access_key_id=aws_access_key_id,
-                aws_secret_access_key=aws_secret_access_key,
-                region_name=aws_region
+            # Use the shared S3 client
+            s3_client = get_s3_client(
+                aws_access_key_id,
+                aws_secret_access_key,
+                aws_region
             )
             
             # Test bucket access
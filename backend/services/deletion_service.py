@@ -0,0 +1,178 @@
+"""
+Background project deletion.
+Removes a project's database documents and purges its S3 objects, tracking
+progress so the API can return immediately and be polled for status.
+
+Job status is stored in MongoDB (deletion_jobs), so any API process can
+report on a job started by another one. Without a database, jobs are only
+known to the process that runs them.
+"""
+import asyncio
+import copy
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from services.project_service import project_service
+from services.s3_service import s3_service
+
+logger = logging.getLogger(__name__)
+
+
+class ProjectDeletionService:
+    """Runs project deletions as background jobs and keeps their progress."""
+    
+    def __init__(self, max_jobs: int = 200, progress_interval: float = 5.0, stale_after: float = 900.0):
+        self.max_jobs = max_jobs
+        self.progress_interval = progress_interval
+        self.stale_after = stale_after
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._project_jobs: Dict[str, str] = {}
+    
+    def _save(self, job: Dict[str, Any]) -> None:
+        """Store a snapshot of the job in MongoDB; failures are logged, not raised."""
+        job["updated_at"] = datetime.now(timezone.utc).isoformat()
+        try:
+            project_service.save_deletion_job(job)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not store deletion job {job['job_id']}: {e}")
+    
+    def create_job(self, project_id: str, user_id: str, s3_project_name: Optional[str]) -> Dict[str, Any]:
+        """
+        Register a queued deletion job for a project.
+        
+        Args:
+            project_id: Database project ID
+            user_id: Owner requesting the deletion
+            s3_project_name: S3 project name recorded on the project, or None to
+                delete only the database documents
+        """
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "project_id": project_id,
+            "user_id": user_id,
+            "s3_project_name": s3_project_name,
+            "status": "queued",
+            "stage": None,
+            "database_deleted": False,
+            "objects_deleted": 0,
+            "object_errors": 0,
+            "prefixes": {},
+            "error": None,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "updated_at": None,
+            "completed_at": None
+        }
+        
+        self._jobs[job["job_id"]] = job
+        self._project_jobs[project_id] = job["job_id"]
+        
+        # Forget the oldest jobs
+        while len(self._jobs) > self.max_jobs:
+            _, old_job = self._jobs.popitem(last=False)
+            if self._project_jobs.get(old_job["project_id"]) == old_job["job_id"]:
+                del self._project_jobs[old_job["project_id"]]
+        
+        self._save(job)
+        return job
+    
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a deletion job started by this process by ID."""
+        return self._jobs.get(job_id)
+    
+    def get_project_job(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the most recent deletion job for a project.
+        
+        Jobs running in this process are returned live; others are read from
+        MongoDB.
+        """
+        local_job = self._jobs.get(self._project_jobs.get(project_id, ""))
+        try:
+            stored_job = project_service.get_latest_deletion_job(project_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not read deletion jobs for {project_id}: {e}")
+            stored_job = None
+        
+        if stored_job and (not local_job or stored_job["created_at"] > local_job["created_at"]):
+            return stored_job
+        return local_job
+    
+    def is_active(self, project_id: str) -> bool:
+        """
+        Whether a deletion for the project is queued or running. A job from
+        another process that has not reported progress for `stale_after`
+        seconds is assumed to have died with its process.
+        """
+        job = self.get_project_job(project_id)
+        if not job or job["status"] not in ("queued", "running"):
+            return False
+        if job["job_id"] in self._jobs:
+            return True
+        
+        updated_at = datetime.fromisoformat(job.get("updated_at") or job["created_at"])
+        return (datetime.now(timezone.utc) - updated_at).total_seconds() < self.stale_after
+    
+    async def run_job(self, job_id: str) -> None:
+        """
+        Execute a deletion job: database documents first, so the project
+        disappears for the user straight away, then the project's S3 prefixes.
+        """
+        job = self._jobs.get(job_id)
+        if not job:
+            return
+        
+        job["status"] = "running"
+        last_saved = time.monotonic()
+        progress_saves = []
+        
+        def _on_batch(prefix: str, deleted: int, errors: int) -> None:
+            nonlocal last_saved
+            progress = job["prefixes"].setdefault(prefix, {"deleted": 0, "errors": 0})
+            progress["deleted"] += deleted
+            progress["errors"] += errors
+            job["objects_deleted"] += deleted
+            job["object_errors"] += errors
+            
+            if time.monotonic() - last_saved >= self.progress_interval:
+                last_saved = time.monotonic()
+                progress_saves.append(asyncio.ensure_future(asyncio.to_thread(self._save, copy.deepcopy(job))))
+        
+        try:
+            job["stage"] = "database"
+            await asyncio.to_thread(self._save, job)
+            s3_project_names = [job["s3_project_name"]] if job["s3_project_name"] else []
+            job["database_deleted"] = await asyncio.to_thread(
+                project_service.delete_project, job["project_id"], s3_project_names
+            )
+            
+            if job["s3_project_name"]:
+                job["stage"] = "storage"
+                await asyncio.to_thread(self._save, job)
+                result = await s3_service.purge_project(job["s3_project_name"], on_batch=_on_batch)
+                if result.get("error"):
+                    raise RuntimeError(result["error"])
+            else:
+                logger.warning(f"⚠️ Project {job['project_id']} has no recorded S3 project name, S3 objects were kept")
+            
+            job["status"] = "completed" if job["database_deleted"] and not job["object_errors"] else "completed_with_errors"
+            logger.info(f"✅ Deleted project {job['project_id']}: {job['objects_deleted']} S3 objects removed")
+        
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+            logger.error(f"❌ Project deletion {job_id} failed: {e}")
+        
+        finally:
+            job["stage"] = None
+            job["completed_at"] = datetime.now(timezone.utc).isoformat()
+            # Progress snapshots must not overwrite the final status
+            await asyncio.gather(*progress_saves)
+            await asyncio.to_thread(self._save, job)
+
+
+# Global deletion service instance
+deletion_service = ProjectDeletionService()
@@ -0,0 +1,276 @@
+"""
+Script processing job queue.
+The API enqueues a job whenever a script is written to input/ and the FreeCAD
+worker blocks on dequeue, so new scripts start within milliseconds instead of
+waiting for the worker's next S3 scan.
+
+Two implementations:
+    SQLiteJobQueue  durable queue in a local SQLite file (single node)
+    SQSJobQueue     Amazon SQS queue with long polling (API and worker on different hosts)
+
+This module does not import the backend settings, so the standalone worker can
+import it as well; create_job_queue builds a queue from plain options.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import closing
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class Job:
+    """A dequeued job; pass it back to ack or nack."""
+    job_id: str
+    payload: Dict[str, Any]
+    attempts: int = 1
+    receipt: Optional[str] = field(default=None, repr=False)
+
+
+class JobQueue(ABC):
+    """
+    At-least-once job queue.
+    
+    A dequeued job is leased for `visibility_timeout` seconds; if the consumer
+    neither acks nor nacks it in time (e.g. the worker crashed) it is delivered
+    again. Consumers must therefore be idempotent.
+    """
+    
+    @abstractmethod
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        """Add a job and return its ID."""
+    
+    @abstractmethod
+    def dequeue(self, timeout: float = 20.0) -> Optional[Job]:
+        """Block until a job is available or `timeout` seconds pass (then return None)."""
+    
+    @abstractmethod
+    def ack(self, job: Job) -> None:
+        """Mark a job as done so it is never delivered again."""
+    
+    @abstractmethod
+    def nack(self, job: Job, delay: float = 0.0) -> None:
+        """Give a job back, to be delivered again after `delay` seconds."""
+    
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Approximate queue depth."""
+
+
+class SQLiteJobQueue(JobQueue):
+    """
+    Durable queue in a SQLite database shared by the processes on one host.
+    
+    Producers in the same process wake a blocked dequeue immediately; other
+    processes are noticed by polling the (local, WAL-mode) database. An idle
+    poll is a plain read that takes no write lock, and the interval doubles
+    from `poll_interval` up to `max_poll_interval` while the queue stays
+    empty. Jobs that fail to complete `max_attempts` times are kept with
+    status "dead".
+    """
+    
+    def __init__(self, path: str, visibility_timeout: float = 900.0,
+                 poll_interval: float = 0.05, max_poll_interval: float = 1.0,
+                 max_attempts: int = 5):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.max_attempts = max_attempts
+        self._wakeup = threading.Condition()
+        
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " payload TEXT NOT NULL,"
+                " status TEXT NOT NULL DEFAULT 'queued',"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " available_at REAL NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at)")
+    
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+    
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, payload, available_at, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, json.dumps(payload), now, now)
+            )
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+    
+    def _next_available(self, conn: sqlite3.Connection, now: float) -> Optional[tuple]:
+        """The oldest job that can be leased at `now`, as (id, payload, attempts)."""
+        return conn.execute(
+            "SELECT id, payload, attempts FROM jobs"
+            " WHERE status IN ('queued', 'running') AND available_at <= ?"
+            " ORDER BY available_at, created_at LIMIT 1",
+            (now,)
+        ).fetchone()
+    
+    def _claim(self) -> Optional[Job]:
+        """Lease the oldest available job (queued, or running with an expired lease)."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            # Only take the write lock when there is something to lease
+            if self._next_available(conn, now) is None:
+                return None
+            
+            conn.execute("BEGIN IMMEDIATE")
+            while True:
+                row = self._next_available(conn, now)
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                
+                job_id, payload, attempts = row
+                if attempts >= self.max_attempts:
+                    conn.execute("UPDATE jobs SET status = 'dead' WHERE id = ?", (job_id,))
+                    continue
+                
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, available_at = ? WHERE id = ?",
+                    (now + self.visibility_timeout, job_id)
+                )
+                conn.execute("COMMIT")
+                return Job(job_id=job_id, payload=json.loads(payload), attempts=attempts + 1)
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+    
+    def dequeue(self, timeout: float = 20.0) -> Optional[Job]:
+        deadline = time.monotonic() + timeout
+        interval = self.poll_interval
+        while True:
+            job = self._claim()
+            if job:
+                return job
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            with self._wakeup:
+                notified = self._wakeup.wait(min(interval, remaining))
+            # Back off while idle; a local producer resets the interval
+            interval = self.poll_interval if notified else min(interval * 2, self.max_poll_interval)
+    
+    def ack(self, job: Job) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job.job_id,))
+    
+    def nack(self, job: Job, delay: float = 0.0) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', available_at = ? WHERE id = ?",
+                (time.time() + delay, job.job_id)
+            )
+        if delay <= 0:
+            with self._wakeup:
+                self._wakeup.notify()
+    
+    def stats(self) -> Dict[str, Any]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {"queued": 0, "running": 0, "dead": 0}
+        counts.update(dict(rows))
+        return {"backend": "sqlite", **counts}
+
+
+class SQSJobQueue(JobQueue):
+    """
+    Amazon SQS queue. Dequeue uses long polling (up to 20 s per request), so an
+    idle worker makes three requests a minute and a new job is received as soon
+    as it is sent. Redelivery limits are configured on the queue (redrive policy).
+    """
+    
+    def __init__(self, queue_url: str, client=None, region_name: Optional[str] = None,
+                 visibility_timeout: float = 900.0):
+        if client is None:
+            import boto3
+            client = boto3.client("sqs", region_name=region_name)
+        self.client = client
+        self.queue_url = queue_url
+        self.visibility_timeout = visibility_timeout
+    
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        response = self.client.send_message(QueueUrl=self.queue_url, MessageBody=json.dumps(payload))
+        return response["MessageId"]
+    
+    def dequeue(self, timeout: float = 20.0) -> Optional[Job]:
+        response = self.client.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=1,
+            WaitTimeSeconds=max(0, min(20, int(timeout))),
+            VisibilityTimeout=int(self.visibility_timeout),
+            AttributeNames=["ApproximateReceiveCount"]
+        )
+        messages = response.get("Messages", [])
+        if not messages:
+            return None
+        
+        message = messages[0]
+        return Job(
+            job_id=message["MessageId"],
+            payload=json.loads(message["Body"]),
+            attempts=int(message.get("Attributes", {}).get("ApproximateReceiveCount", 1)),
+            receipt=message["ReceiptHandle"]
+        )
+    
+    def ack(self, job: Job) -> None:
+        self.client.delete_message(QueueUrl=self.queue_url, ReceiptHandle=job.receipt)
+    
+    def nack(self, job: Job, delay: float = 0.0) -> None:
+        self.client.change_message_visibility(
+            QueueUrl=self.queue_url,
+            ReceiptHandle=job.receipt,
+            VisibilityTimeout=int(delay)
+        )
+    
+    def stats(self) -> Dict[str, Any]:
+        attributes = self.client.get_queue_attributes(
+            QueueUrl=self.queue_url,
+            AttributeNames=["ApproximateNumberOfMessages", "ApproximateNumberOfMessagesNotVisible"]
+        )["Attributes"]
+        return {
+            "backend": "sqs",
+            "queued": int(attributes.get("ApproximateNumberOfMessages", 0)),
+            "running": int(attributes.get("ApproximateNumberOfMessagesNotVisible", 0))
+        }
+
+
+def create_job_queue(backend: str, sqlite_path: Optional[str] = None, sqs_queue_url: Optional[str] = None,
+                     region_name: Optional[str] = None, visibility_timeout: float = 900.0) -> Optional[JobQueue]:
+    """
+    Build the configured queue: "sqlite", "sqs", or "" / "none" for no queue
+    (the worker then falls back to scanning S3).
+    """
+    backend = (backend or "").lower()
+    if backend in ("", "none"):
+        return None
+    if backend == "sqlite":
+        return SQLiteJobQueue(sqlite_path or "job_queue.db", visibility_timeout=visibility_timeout)
+    if backend == "sqs":
+        if not sqs_queue_url:
+            raise ValueError("The sqs job queue needs a queue URL")
+        return SQSJobQueue(sqs_queue_url, region_name=region_name, visibility_timeout=visibility_timeout)
+    raise ValueError(f"Unknown job queue backend: {backend}")
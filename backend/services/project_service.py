@@ -3,9 +3,10 @@ Project-centric database service for the new MongoDB schema.
 Handles all CRUD operations for projects, messages, files, and logs.
 """
 import logging
+import re
 import uuid
 from typing import Optional, Dict, Any, List
-from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo import MongoClient, ASCENDING, DESCENDING, ReturnDocument
 from pymongo.database import Database
 from pymongo.collection import Collection
 from pymongo.errors import (
@@ -32,6 +33,8 @@ class Collections:
     MESSAGES = "messages"
     FILES = "files"
     LOGS = "logs"
+    VERSION_COUNTERS = "version_counters"
+    DELETION_JOBS = "deletion_jobs"
     # Legacy collection for migration
     CHAT_MESSAGES = "chat_messages"
 
@@ -229,8 +232,18 @@ class ProjectService:
             logger.error(f"Failed to update project {project_id}: {e}")
             return False
     
-    def delete_project(self, project_id: str) -> bool:
-        """Delete a project and all associated data."""
+    def delete_project(self, project_id: str, s3_project_names: Optional[List[str]] = None) -> bool:
+        """
+        Delete a project and all associated data.
+        
+        Each collection is cleared with a single delete_many matching any of
+        the ID fields the project may be referenced by.
+        
+        Args:
+            project_id: Project ID
+            s3_project_names: S3 project names whose version counters should
+                be dropped as well
+        """
         try:
             if self.db is None:
                 raise ConnectionFailure("Database not connected")
@@ -242,46 +255,90 @@ class ProjectService:
                 return False
             
             # Use multiple field strategies for deletion
-            delete_queries = [
+            id_queries = [
                 {"id": project_id},
                 {"project_id": project_id}
             ]
             
             # Try ObjectId if it looks like one
-            try:
-                from bson import ObjectId
-                if len(project_id) == 24:
-                    delete_queries.append({"_id": ObjectId(project_id)})
-            except:
-                pass
-            
-            # Delete associated messages
-            for query in delete_queries:
-                self.db[Collections.MESSAGES].delete_many(query)
+            if ObjectId.is_valid(project_id):
+                id_queries.append({"_id": ObjectId(project_id)})
             
-            # Delete associated files  
-            for query in delete_queries:
-                self.db[Collections.FILES].delete_many(query)
+            query = {"$or": id_queries}
             
-            # Delete associated logs
-            for query in delete_queries:
-                self.db[Collections.LOGS].delete_many(query)
+            deleted = {
+                collection: self.db[collection].delete_many(query).deleted_count
+                for collection in (Collections.MESSAGES, Collections.FILES, Collections.LOGS, Collections.PROJECTS)
+            }
             
-            # Delete the project - try all query methods
-            deleted_count = 0
-            for query in delete_queries:
-                result = self.db[Collections.PROJECTS].delete_one(query)
-                deleted_count += result.deleted_count
-                if result.deleted_count > 0:
-                    logger.info(f"✅ Project deleted using query: {query}")
-                    break
+            if s3_project_names:
+                deleted[Collections.VERSION_COUNTERS] = self.db[Collections.VERSION_COUNTERS].delete_many(
+                    {"_id": {"$in": s3_project_names}}
+                ).deleted_count
             
-            return deleted_count > 0
+            logger.info(f"✅ Deleted project {project_id} documents: {deleted}")
+            return deleted[Collections.PROJECTS] > 0
             
         except Exception as e:
             logger.error(f"Failed to delete project: {e}")
             return False
     
+    # Version allocation
+    def allocate_script_version(self, s3_project_name: str) -> Optional[int]:
+        """
+        Atomically allocate the next script version for an S3 project.
+        
+        Returns:
+            The allocated version, or None if the project has no counter yet
+            and must be seeded with seed_script_version first.
+        """
+        if self.db is None:
+            raise ConnectionFailure("Database not connected")
+        
+        counter = self.db[Collections.VERSION_COUNTERS].find_one_and_update(
+            {"_id": s3_project_name},
+            {"$inc": {"seq": 1}, "$set": {"updated_at": get_current_time()}},
+            return_document=ReturnDocument.AFTER
+        )
+        return counter["seq"] if counter else None
+    
+    def seed_script_version(self, s3_project_name: str, latest_version: int) -> None:
+        """
+        Create the version counter for a project whose versions predate it.
+        
+        Uses $max so concurrent seeders converge on the same value and a
+        counter that has already moved past latest_version is left alone.
+        """
+        if self.db is None:
+            raise ConnectionFailure("Database not connected")
+        
+        self.db[Collections.VERSION_COUNTERS].update_one(
+            {"_id": s3_project_name},
+            {"$max": {"seq": latest_version}, "$setOnInsert": {"created_at": get_current_time()}},
+            upsert=True
+        )
+        logger.info(f"Seeded version counter for {s3_project_name} at v{latest_version}")
+    
+    # Deletion jobs
+    def save_deletion_job(self, job: Dict[str, Any]) -> None:
+        """Insert or replace a project deletion job, keyed by its job ID."""
+        if self.db is None:
+            raise ConnectionFailure("Database not connected")
+        
+        self.db[Collections.DELETION_JOBS].replace_one({"_id": job["job_id"]}, dict(job), upsert=True)
+    
+    def get_latest_deletion_job(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """Get the most recent deletion job for a project, from any API process."""
+        if self.db is None:
+            raise ConnectionFailure("Database not connected")
+        
+        job = self.db[Collections.DELETION_JOBS].find_one(
+            {"project_id": project_id},
+            {"_id": 0},
+            sort=[("created_at", DESCENDING)]
+        )
+        return job
+    
     # Message operations
     def create_message(self, message_data: Dict[str, Any]) -> str:
         """Create a new message."""
@@ -409,6 +466,21 @@ class ProjectService:
             logger.error(f"Failed to get latest file: {e}")
             return None
     
+    def purge_file_records(self, s3_paths: List[str], dry_run: bool = False) -> int:
+        """
+        Delete file records pointing at S3 objects that no longer exist.
+        
+        Returns:
+            Number of records deleted (or that would be deleted in a dry run)
+        """
+        if self.db is None or not s3_paths:
+            return 0
+        
+        query = {"s3_path": {"$in": s3_paths}}
+        if dry_run:
+            return self.db[Collections.FILES].count_documents(query)
+        return self.db[Collections.FILES].delete_many(query).deleted_count
+    
     # Log operations
     def create_log_record(self, log_data: Dict[str, Any]) -> str:
         """Create a new log record."""
@@ -448,6 +520,30 @@ class ProjectService:
             logger.error(f"Failed to get project logs: {e}")
             return []
     
+    def purge_log_records(self, before: datetime, dry_run: bool = False,
+                          s3_project_name: Optional[str] = None) -> int:
+        """
+        Delete log records older than a cutoff.
+        
+        Args:
+            before: Records with an earlier timestamp are deleted
+            dry_run: Only count the records
+            s3_project_name: Only delete records of logs stored under
+                logs/{s3_project_name}/
+        
+        Returns:
+            Number of records deleted (or that would be deleted in a dry run)
+        """
+        if self.db is None:
+            return 0
+        
+        query = {"timestamp": {"$lt": before}}
+        if s3_project_name:
+            query["s3_log_path"] = {"$regex": f"^s3://[^/]+/logs/{re.escape(s3_project_name)}/"}
+        if dry_run:
+            return self.db[Collections.LOGS].count_documents(query)
+        return self.db[Collections.LOGS].delete_many(query).deleted_count
+    
     # Comprehensive project data operations
     def get_project_with_data(self, project_id: str, include_messages: bool = True, 
                              include_files: bool = True, include_logs: bool = True) -> Optional[Dict[str, Any]]:
@@ -0,0 +1,252 @@
+"""
+Storage retention for project scripts, outputs and logs.
+Expires old versions and logs according to a configurable policy so prefix
+listings stay short, with a dry-run mode that reports what would be reclaimed.
+"""
+import asyncio
+import logging
+import re
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone, timedelta
+from typing import Any, Dict, List, Optional
+
+from config.settings import settings
+from services.project_service import project_service
+from services.s3_service import s3_service
+
+logger = logging.getLogger(__name__)
+
+SCRIPT_VERSION_PATTERN = re.compile(r'_v(\d+)\.py$')
+OUTPUT_VERSION_PATTERN = re.compile(r'^output/[^/]+/v(\d+)/')
+
+
+@dataclass
+class RetentionPolicy:
+    """Which versions and logs a retention run keeps."""
+    keep_last_versions: int
+    keep_completed_versions: int
+    log_max_age_days: int
+    
+    @classmethod
+    def from_settings(cls) -> "RetentionPolicy":
+        """Policy configured through the retention_* settings."""
+        return cls(
+            keep_last_versions=settings.retention_keep_last_versions,
+            keep_completed_versions=settings.retention_keep_completed_versions,
+            log_max_age_days=settings.retention_log_max_age_days
+        )
+
+
+class RetentionService:
+    """Plans and applies the retention policy as background jobs."""
+    
+    def __init__(self, max_jobs: int = 50):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    
+    async def plan_project(self, project_name: str, policy: RetentionPolicy,
+                           now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Work out what the policy would remove from one project.
+        
+        Kept versions are the newest `keep_last_versions` (at least one), the
+        newest `keep_completed_versions` that processed successfully, and any
+        pinned version. Logs older than `log_max_age_days` are expired, except
+        the newest log.
+        
+        Returns:
+            Plan with the expired versions and logs, the keys to delete and
+            the bytes they take up
+        """
+        now = now or datetime.now(timezone.utc)
+        # Planning must not write anything, so dry runs stay side-effect free
+        manifest = await s3_service.get_project_manifest(project_name, read_only=True) or {"versions": {}}
+        entries = manifest["versions"]
+        
+        scripts: Dict[int, Dict[str, Any]] = {}
+        async for obj in s3_service.iter_objects(f"input/{project_name}/"):
+            match = SCRIPT_VERSION_PATTERN.search(obj['Key'])
+            if match:
+                scripts[int(match.group(1))] = obj
+        
+        outputs: Dict[int, List[Dict[str, Any]]] = {}
+        async for obj in s3_service.iter_objects(f"output/{project_name}/"):
+            match = OUTPUT_VERSION_PATTERN.match(obj['Key'])
+            if match:
+                outputs.setdefault(int(match.group(1)), []).append(obj)
+        
+        versions = sorted(set(scripts) | set(outputs), reverse=True)
+        completed = [v for v in versions if entries.get(str(v), {}).get("status") == "processed"]
+        keep = set(versions[:max(1, policy.keep_last_versions)])
+        keep.update(completed[:policy.keep_completed_versions])
+        keep.update(v for v in versions if entries.get(str(v), {}).get("pinned"))
+        expired_versions = [v for v in versions if v not in keep]
+        
+        objects = []
+        for version in expired_versions:
+            if version in scripts:
+                objects.append(scripts[version])
+            objects.extend(outputs.get(version, []))
+        
+        # Markers and error records of expired versions are removed too; they
+        # may not exist, so they are not counted as reclaimed
+        marker_keys = [
+            key
+            for version in expired_versions
+            for key in (
+                f"processed/{project_name}/{project_name}_v{version}.py.done",
+                f"errors/{project_name}/{project_name}_v{version}_error.json"
+            )
+        ]
+        
+        logs = [obj async for obj in s3_service.iter_objects(f"logs/{project_name}/")]
+        logs.sort(key=lambda obj: obj['LastModified'], reverse=True)
+        cutoff = now - timedelta(days=policy.log_max_age_days)
+        expired_logs = [obj for obj in logs[1:] if obj['LastModified'] < cutoff]
+        
+        return {
+            "project_name": project_name,
+            "versions": len(versions),
+            "kept_versions": sorted(keep & set(versions), reverse=True),
+            "expired_versions": expired_versions,
+            "expired_logs": len(expired_logs),
+            "keys": [obj['Key'] for obj in objects + expired_logs],
+            "marker_keys": marker_keys,
+            "bytes": sum(obj['Size'] for obj in objects + expired_logs)
+        }
+    
+    async def apply_plan(self, plan: Dict[str, Any]) -> Dict[str, int]:
+        """Delete everything a plan expires and drop it from the project's manifest."""
+        project_name = plan["project_name"]
+        result = await s3_service.delete_keys(plan["keys"] + plan["marker_keys"])
+        
+        expired_versions = plan["expired_versions"]
+        expired_logs = plan["expired_logs"]
+        
+        def _record_retention(manifest: Dict[str, Any]) -> None:
+            for version in expired_versions:
+                manifest["versions"].pop(str(version), None)
+            manifest["log_count"] = max(0, (manifest.get("log_count") or 0) - expired_logs)
+        
+        if expired_versions or expired_logs:
+            await s3_service.update_manifest(project_name, _record_retention)
+        
+        if expired_versions:
+            def _drop_failures(index: Dict[str, Any]) -> None:
+                for version in expired_versions:
+                    index["failures"].pop(f"{project_name}/v{version}", None)
+            
+            await s3_service.update_failure_index(_drop_failures)
+        
+        return result
+    
+    def create_job(self, policy: RetentionPolicy, dry_run: bool = True,
+                   project_name: Optional[str] = None) -> Dict[str, Any]:
+        """Register a queued retention job over one project or the whole bucket."""
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "dry_run": dry_run,
+            "project_name": project_name,
+            "policy": asdict(policy),
+            "status": "queued",
+            "projects_scanned": 0,
+            "versions_expired": 0,
+            "logs_expired": 0,
+            "keys_reclaimed": 0,
+            "bytes_reclaimed": 0,
+            "file_records": 0,
+            "log_records": 0,
+            "delete_errors": 0,
+            "projects": [],
+            "error": None,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "completed_at": None
+        }
+        
+        self._jobs[job["job_id"]] = job
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+        
+        return job
+    
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a retention job by ID."""
+        return self._jobs.get(job_id)
+    
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """Get every retained job summary, newest first."""
+        return [
+            {key: value for key, value in job.items() if key != "projects"}
+            for job in reversed(self._jobs.values())
+        ]
+    
+    async def run_job(self, job_id: str) -> None:
+        """
+        Execute a retention job: plan each project, then (unless dry-running)
+        delete the expired S3 objects and the matching file/log records.
+        """
+        job = self._jobs.get(job_id)
+        if not job:
+            return
+        
+        job["status"] = "running"
+        policy = RetentionPolicy(**job["policy"])
+        now = datetime.now(timezone.utc)
+        expired_inputs: List[str] = []
+        
+        try:
+            if job["project_name"]:
+                project_names = [job["project_name"]]
+            else:
+                project_names = [name async for name in s3_service.iter_project_names()]
+            
+            for project_name in project_names:
+                plan = await self.plan_project(project_name, policy, now)
+                job["projects_scanned"] += 1
+                
+                if not plan["keys"] and not plan["expired_versions"]:
+                    continue
+                
+                if not job["dry_run"]:
+                    result = await self.apply_plan(plan)
+                    job["delete_errors"] += result["errors"]
+                
+                expired_inputs.extend(key for key in plan["keys"] if key.startswith("input/"))
+                job["versions_expired"] += len(plan["expired_versions"])
+                job["logs_expired"] += plan["expired_logs"]
+                job["keys_reclaimed"] += len(plan["keys"])
+                job["bytes_reclaimed"] += plan["bytes"]
+                job["projects"].append({
+                    key: value for key, value in plan.items() if key not in ("keys", "marker_keys")
+                })
+            
+            s3_paths = [f"s3://{s3_service.aws_bucket_name}/{key}" for key in expired_inputs]
+            job["file_records"] = await asyncio.to_thread(
+                project_service.purge_file_records, s3_paths, job["dry_run"]
+            )
+            job["log_records"] = await asyncio.to_thread(
+                project_service.purge_log_records,
+                now - timedelta(days=policy.log_max_age_days),
+                job["dry_run"],
+                job["project_name"]
+            )
+            
+            job["status"] = "completed" if not job["delete_errors"] else "completed_with_errors"
+            logger.info(
+                f"🧹 Retention {'dry run' if job['dry_run'] else 'run'} finished: "
+                f"{job['keys_reclaimed']} keys, {job['bytes_reclaimed']} bytes over {job['projects_scanned']} projects"
+            )
+        
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+            logger.error(f"❌ Retention job {job_id} failed: {e}")
+        
+        finally:
+            job["completed_at"] = datetime.now(timezone.utc).isoformat()
+
+
+# Global retention service instance
+retention_service = RetentionService()
@@ -4,17 +4,54 @@ Handles the complete AI-to-S3 script flow with output retrieval.
 """
 import logging
 import re
+import io
+import copy
 import asyncio
 import json
 import hashlib
+import heapq
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Dict, Any, Optional, List, Tuple
-import boto3
+from functools import partial
+from typing import Dict, Any, Optional, List, Tuple, Callable, AsyncIterator, Iterator
 from botocore.exceptions import ClientError, NoCredentialsError
 from config.settings import settings
+from services.storage_client import get_storage_backend, get_job_queue, local_storage_enabled
+from services.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Bucket-wide rollup of failed scripts, maintained alongside errors/
+FAILURE_INDEX_KEY = "manifests/failure_index.json"
+FAILURE_INDEX_MESSAGE_LENGTH = 200
+ERROR_TYPE_PATTERN = re.compile(r"\b([A-Z]\w*(?:Error|Exception))\b")
+
+# Every log line a parsing rule can match contains one of these words
+LOG_TRIGGER_WORDS = ("gui", "error", "exception", "traceback")
+LOG_TRIGGER_PATTERN = re.compile("|".join(LOG_TRIGGER_WORDS), re.IGNORECASE)
+
+
+class _ZipStreamSink(io.RawIOBase):
+    """Write-only, non-seekable sink that holds zipfile output until drained."""
+    
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
 
 class S3Service:
     """S3 service for managing CAD scripts with automatic versioning."""
@@ -28,6 +65,15 @@ class S3Service:
         
         # Initialize S3 client
         self._init_s3_client()
+        self._init_job_queue()
+        
+        # Dedicated, bounded executor for blocking boto3 calls so a slow S3
+        # request never stalls the event loop serving other routes
+        self.call_timeout = settings.s3_call_timeout_seconds
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.s3_executor_max_workers,
+            thread_name_prefix="s3-io"
+        )
         
         # Performance tracking
         self.performance_metrics = {
@@ -35,18 +81,50 @@ class S3Service:
             "upload_failures": 0,
             "downloads": 0,
             "download_failures": 0,
-            "version_checks": 0
+            "version_checks": 0,
+            "call_timeouts": 0,
+            "manifest_reads": 0,
+            "manifest_conflicts": 0,
+            "failure_index_reads": 0,
+            "failure_index_rebuilds": 0,
+            "dedup_hits": 0,
+            "log_analysis_hits": 0,
+            "log_analysis_misses": 0,
+            "jobs_enqueued": 0,
+            "job_enqueue_failures": 0
         }
+        
+        # Serializes manifest read-modify-write cycles within this process
+        self._manifest_locks: Dict[str, asyncio.Lock] = {}
+        self._failure_index_lock = asyncio.Lock()
+        
+        # Short-lived cache for listings and metadata, keyed by
+        # (kind, project_name, ...) and invalidated on every project write
+        self._cache = TTLCache(max_entries=settings.s3_cache_max_entries)
+        self._cache_generations: Dict[str, int] = {}
+        
+        # Presigned URLs keyed by (key, ETag, expiration); see generate_download_url
+        self._presign_cache = TTLCache(max_entries=settings.s3_cache_max_entries)
+        
+        # Parsed log analyses keyed by (key, ETag); logs never change in place
+        self._log_analysis_cache = TTLCache(max_entries=256, default_ttl=24 * 3600)
     
     def _init_s3_client(self):
-        """Initialize AWS S3 client."""
-        if all([self.aws_access_key_id, self.aws_secret_access_key, self.aws_bucket_name]):
+        """Initialize the storage backend (S3, or local disk when configured)."""
+        if local_storage_enabled():
+            self.aws_bucket_name = self.aws_bucket_name or "local"
+            try:
+                self.s3_client = get_storage_backend()
+                logger.info(f"✅ Local storage initialized at {settings.local_storage_root}")
+            except Exception as e:
+                logger.error(f"❌ Failed to initialize local storage: {e}")
+                self.s3_client = None
+        elif all([self.aws_access_key_id, self.aws_secret_access_key, self.aws_bucket_name]):
             try:
-                self.s3_client = boto3.client(
-                    's3',
-                    aws_access_key_id=self.aws_access_key_id,
-                    aws_secret_access_key=self.aws_secret_access_key,
-                    region_name=self.aws_region
+                self.s3_client = get_storage_backend(
+                    self.aws_access_key_id,
+                    self.aws_secret_access_key,
+                    self.aws_region
                 )
                 logger.info("✅ AWS S3 client initialized successfully")
             except Exception as e:
@@ -56,45 +134,532 @@ class S3Service:
             logger.warning("⚠️ AWS S3 credentials not fully configured")
             self.s3_client = None
     
-    async def get_next_version(self, project_name: str) -> int:
+    def _init_job_queue(self):
+        """Initialize the queue that hands new scripts to the worker, if configured."""
+        try:
+            self.job_queue = get_job_queue()
+            if self.job_queue:
+                logger.info(f"✅ Script job queue initialized ({settings.job_queue_backend})")
+        except Exception as e:
+            logger.error(f"❌ Failed to initialize job queue, worker will rely on S3 scans: {e}")
+            self.job_queue = None
+    
+    async def _enqueue_script_job(self, project_name: str, version: int, reason: str) -> None:
         """
-        Get the next version number for a project by checking existing files.
-        Returns 1 if no files exist, otherwise returns highest version + 1.
+        Tell the worker a script is ready to process. Failures are logged, not
+        raised: the script is already in S3 and the worker's rescan finds it.
         """
-        if not self.s3_client or not self.aws_bucket_name:
-            logger.warning("S3 not configured, returning version 1")
-            return 1
+        if not self.job_queue:
+            return
         
+        payload = {
+            "project": project_name,
+            "key": f"input/{project_name}/{project_name}_v{version}.py",
+            "version": version,
+            "reason": reason,
+            "enqueued_at": datetime.now(timezone.utc).isoformat()
+        }
         try:
-            self.performance_metrics["version_checks"] += 1
-            
-            # List objects in the input directory for this project
-            prefix = f"input/{project_name}/"
-            
-            response = self.s3_client.list_objects_v2(
+            await self._run_blocking(self.job_queue.enqueue, payload)
+            self.performance_metrics["jobs_enqueued"] += 1
+        except Exception as e:
+            self.performance_metrics["job_enqueue_failures"] += 1
+            logger.warning(f"⚠️ Could not enqueue {project_name} v{version}, worker will pick it up on rescan: {e}")
+    
+    async def get_job_queue_stats(self) -> Optional[Dict[str, Any]]:
+        """Job counts by status from the configured job queue, or None without one."""
+        if not self.job_queue:
+            return None
+        return await self._run_blocking(self.job_queue.stats)
+    
+    async def _request_worker_rescan(self, project_name: str) -> None:
+        """
+        Flag a project whose script was rewritten under an existing version.
+        
+        The worker's incremental scans only look for new version numbers; an
+        empty rescan/{project_name} object makes it list the whole project on
+        its next scan. Failures are logged, not raised: the periodic full
+        rescan still picks the script up.
+        """
+        try:
+            await self._s3_call(
+                'put_object',
                 Bucket=self.aws_bucket_name,
-                Prefix=prefix
+                Key=f"rescan/{project_name}",
+                Body=b''
             )
+        except Exception as e:
+            logger.warning(f"⚠️ Could not flag {project_name} for a worker rescan: {e}")
+    
+    async def _run_blocking(self, func: Callable, *args, timeout: float = None, **kwargs) -> Any:
+        """
+        Run a blocking callable on the S3 executor with a per-call timeout.
+        
+        Raises:
+            asyncio.TimeoutError: If the call does not finish within the timeout.
+                The worker thread is left to finish on its own.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(future, timeout or self.call_timeout)
+        except asyncio.TimeoutError:
+            self.performance_metrics["call_timeouts"] += 1
+            logger.error(f"❌ S3 call {getattr(func, '__name__', func)} timed out after {timeout or self.call_timeout}s")
+            raise
+    
+    async def _s3_call(self, operation: str, **kwargs) -> Any:
+        """Invoke a boto3 S3 client operation off the event loop."""
+        return await self._run_blocking(getattr(self.s3_client, operation), **kwargs)
+    
+    def _cache_generation(self, project_name: str) -> int:
+        return self._cache_generations.get(project_name, 0)
+    
+    def _cache_store(self, key: Tuple, value: Any, ttl: float, generation: int) -> None:
+        """Cache a lookup result unless the project was written since the lookup began."""
+        if self._cache_generation(key[1]) == generation:
+            self._cache.set(key, value, ttl)
+    
+    def _invalidate_project_cache(self, project_name: str) -> None:
+        """Drop cached lookups for a project after one of its objects changed."""
+        self._cache_generations[project_name] = self._cache_generation(project_name) + 1
+        self._cache.invalidate_matching(lambda key: key[1] == project_name)
+    
+    async def _get_object_body(self, key: str) -> bytes:
+        """Fetch an object and read its full body in a single executor hop."""
+        def _fetch() -> bytes:
+            response = self.s3_client.get_object(Bucket=self.aws_bucket_name, Key=key)
+            return response['Body'].read()
+        
+        return await self._run_blocking(_fetch)
+    
+    async def _get_text_body(self, key: str) -> bytes:
+        """
+        Fetch an object's full body, transparently gunzipping objects stored
+        with Content-Encoding: gzip (such as worker logs). The compressed body
+        is decompressed chunk by chunk as it streams in.
+        """
+        def _fetch() -> bytes:
+            response = self.s3_client.get_object(Bucket=self.aws_bucket_name, Key=key)
+            body = response['Body']
+            try:
+                if response.get('ContentEncoding') != 'gzip':
+                    return body.read()
+                
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                parts = [
+                    decompressor.decompress(chunk)
+                    for chunk in body.iter_chunks(chunk_size=settings.s3_stream_chunk_size)
+                ]
+                parts.append(decompressor.flush())
+                return b"".join(parts)
+            finally:
+                body.close()
+        
+        return await self._run_blocking(_fetch)
+    
+    async def _iter_object_pages(self, prefix: str, start_after: str = None,
+                                 page_size: int = 1000) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Lazily yield pages of objects under a prefix, following continuation tokens.
+        
+        The next page is only requested once the caller asks for it, so breaking
+        out of the loop stops further list calls.
+        """
+        params = {
+            "Bucket": self.aws_bucket_name,
+            "Prefix": prefix,
+            "MaxKeys": page_size
+        }
+        if start_after:
+            params["StartAfter"] = start_after
+        
+        while True:
+            response = await self._s3_call('list_objects_v2', **params)
+            contents = response.get('Contents', [])
+            if contents:
+                yield contents
+            
+            if not response.get('IsTruncated'):
+                break
+            params["ContinuationToken"] = response['NextContinuationToken']
+    
+    async def iter_project_names(self) -> AsyncIterator[str]:
+        """Lazily yield the name of every project that has scripts under input/."""
+        params = {
+            "Bucket": self.aws_bucket_name,
+            "Prefix": "input/",
+            "Delimiter": "/"
+        }
+        
+        while True:
+            response = await self._s3_call('list_objects_v2', **params)
+            for common_prefix in response.get('CommonPrefixes', []):
+                yield common_prefix['Prefix'][len("input/"):].rstrip('/')
+            
+            if not response.get('IsTruncated'):
+                break
+            params["ContinuationToken"] = response['NextContinuationToken']
+    
+    async def iter_objects(self, prefix: str, start_after: str = None) -> AsyncIterator[Dict[str, Any]]:
+        """Lazily yield every object under a prefix, one page in memory at a time."""
+        async for page in self._iter_object_pages(prefix, start_after=start_after):
+            for obj in page:
+                yield obj
+    
+    async def _newest_matches(self, prefix: str, pattern: "re.Pattern",
+                              limit: Optional[int] = None) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Stream a prefix and return (version, object) pairs whose key matches
+        pattern, newest first.
+        
+        With a limit only the `limit` highest versions are held in memory at
+        any time, regardless of how many keys the prefix contains.
+        """
+        heap: List[Tuple[int, int, Dict[str, Any]]] = []
+        seen = 0
+        
+        async for obj in self.iter_objects(prefix):
+            match = pattern.search(obj['Key'])
+            if not match:
+                continue
+            
+            entry = (int(match.group(1)), seen, obj)
+            seen += 1
+            if limit is None:
+                heap.append(entry)
+            elif len(heap) < limit:
+                heapq.heappush(heap, entry)
+            elif entry[0] > heap[0][0]:
+                heapq.heapreplace(heap, entry)
+        
+        heap.sort(key=lambda entry: entry[0], reverse=True)
+        return [(version, obj) for version, _, obj in heap]
+    
+    # ===============================================
+    #               PROJECT MANIFEST
+    # ===============================================
+    def _manifest_key(self, project_name: str) -> str:
+        return f"manifests/{project_name}/manifest.json"
+    
+    def _output_entry(self, obj: Dict[str, Any], version: Optional[int]) -> Dict[str, Any]:
+        """Describe an output object in the shape returned by check_output_files."""
+        filename = obj['Key'].split('/')[-1]
+        last_modified = obj['LastModified']
+        return {
+            "filename": filename,
+            "key": obj['Key'],
+            "format": '.' + filename.split('.')[-1].upper(),
+            "size": obj['Size'],
+            "version": version,
+            "last_modified": last_modified.isoformat() if isinstance(last_modified, datetime) else last_modified,
+            "etag": obj.get('ETag'),
+            "download_url": None
+        }
+    
+    def _manifest_version(self, manifest: Dict[str, Any], version: int) -> Dict[str, Any]:
+        """Get (or create) the entry for a version inside a manifest."""
+        entry = manifest["versions"].setdefault(str(version), {
+            "version": version,
+            "status": "pending",
+            "script_key": f"input/{manifest['project_name']}/{manifest['project_name']}_v{version}.py",
+            "script_hash": None,
+            "uploaded_at": None,
+            "processed_at": None,
+            "outputs": [],
+            "metadata": None,
+            "error": None,
+            "pinned": False,
+            "timings": None
+        })
+        manifest["latest_version"] = max(manifest.get("latest_version") or 0, version)
+        return entry
+    
+    async def _read_json_object(self, key: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Fetch a JSON document and its ETag, or (None, None) if it does not exist."""
+        def _fetch() -> Tuple[Dict[str, Any], str]:
+            response = self.s3_client.get_object(Bucket=self.aws_bucket_name, Key=key)
+            return json.loads(response['Body'].read().decode('utf-8')), response['ETag']
+        
+        try:
+            return await self._run_blocking(_fetch)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None, None
+            raise
+    
+    async def _write_json_object(self, key: str, document: Dict[str, Any], etag: Optional[str]) -> bool:
+        """
+        Store a JSON document only if nobody else replaced it since it was read.
+        
+        Returns:
+            True if written, False if the precondition failed and the caller
+            should re-read and try again.
+        """
+        document["updated_at"] = datetime.now(timezone.utc).isoformat()
+        conditions = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+        
+        try:
+            await self._s3_call(
+                'put_object',
+                Bucket=self.aws_bucket_name,
+                Key=key,
+                Body=json.dumps(document, separators=(',', ':')).encode('utf-8'),
+                ContentType='application/json',
+                **conditions
+            )
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                return False
+            raise
+    
+    async def _read_manifest(self, project_name: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Fetch the stored manifest and its ETag, or (None, None) if there is none."""
+        return await self._read_json_object(self._manifest_key(project_name))
+    
+    async def _write_manifest(self, manifest: Dict[str, Any], etag: Optional[str]) -> bool:
+        """Store a manifest only if nobody else replaced it since it was read."""
+        return await self._write_json_object(self._manifest_key(manifest["project_name"]), manifest, etag)
+    
+    async def _build_manifest(self, project_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Reconstruct a manifest from the input/, output/, processed/, errors/
+        and logs/ prefixes. Used for projects that predate the manifest.
+        
+        Returns:
+            The rebuilt manifest, or None if the project has no scripts.
+        """
+        manifest = {
+            "project_name": project_name,
+            "manifest_version": 1,
+            "latest_version": None,
+            "latest_log": None,
+            "log_count": 0,
+            "versions": {}
+        }
+        
+        script_pattern = re.compile(rf"{re.escape(project_name)}_v(\d+)\.py$")
+        async for obj in self.iter_objects(f"input/{project_name}/"):
+            match = script_pattern.search(obj['Key'])
+            if match:
+                entry = self._manifest_version(manifest, int(match.group(1)))
+                entry["script_key"] = obj['Key']
+                entry["uploaded_at"] = obj['LastModified'].isoformat()
+        
+        if not manifest["versions"]:
+            return None
+        
+        supported_extensions = ('.FCSTD', '.STL', '.STEP', '.IGES', '.OBJ', '.GLTF')
+        output_pattern = re.compile(r'/v(\d+)/([^/]+)$')
+        metadata_versions = []
+        async for obj in self.iter_objects(f"output/{project_name}/"):
+            match = output_pattern.search(obj['Key'])
+            if not match or str(int(match.group(1))) not in manifest["versions"]:
+                continue
+            version, filename = int(match.group(1)), match.group(2)
+            if filename == 'metadata.json':
+                metadata_versions.append(version)
+            elif filename.upper().endswith(supported_extensions):
+                manifest["versions"][str(version)]["outputs"].append(self._output_entry(obj, version))
+        
+        processed_pattern = re.compile(rf"{re.escape(project_name)}_v(\d+)\.py\.done$")
+        async for obj in self.iter_objects(f"processed/{project_name}/"):
+            match = processed_pattern.search(obj['Key'])
+            if match and match.group(1) in manifest["versions"]:
+                entry = manifest["versions"][match.group(1)]
+                entry["status"] = "processed"
+                entry["processed_at"] = obj['LastModified'].isoformat()
+        
+        error_pattern = re.compile(rf"{re.escape(project_name)}_v(\d+)_error\.json$")
+        async for obj in self.iter_objects(f"errors/{project_name}/"):
+            match = error_pattern.search(obj['Key'])
+            if match and match.group(1) in manifest["versions"]:
+                entry = manifest["versions"][match.group(1)]
+                if entry["status"] != "processed":
+                    entry["status"] = "failed"
+                entry["error"] = {"error_file": obj['Key'], "failed_at": obj['LastModified'].isoformat()}
+        
+        log_pattern = re.compile(rf"{re.escape(project_name)}_info_(\d{{8}}_\d{{6}})\.log$")
+        async for obj in self.iter_objects(f"logs/{project_name}/"):
+            match = log_pattern.search(obj['Key'])
+            if match:
+                manifest["log_count"] += 1
+                latest_log = manifest["latest_log"]
+                if not latest_log or (match.group(1), obj['Key']) > (latest_log["timestamp"], latest_log["key"]):
+                    manifest["latest_log"] = {
+                        "filename": obj['Key'].split('/')[-1],
+                        "key": obj['Key'],
+                        "timestamp": match.group(1),
+                        "size": obj['Size'],
+                        "last_modified": obj['LastModified'].isoformat()
+                    }
+        
+        metadata_results = await asyncio.gather(
+            *[self.get_version_metadata(project_name, version) for version in metadata_versions]
+        )
+        for version, metadata in zip(metadata_versions, metadata_results):
+            entry = manifest["versions"][str(version)]
+            entry["metadata"] = metadata
+            if metadata:
+                entry["script_hash"] = metadata.get("script_hash")
+        
+        logger.info(f"🔨 Rebuilt manifest for {project_name} ({len(manifest['versions'])} versions)")
+        return manifest
+    
+    async def update_manifest(self, project_name: str, mutate: Callable[[Dict[str, Any]], None],
+                              max_attempts: int = 5) -> bool:
+        """
+        Apply a change to a project's manifest with optimistic concurrency.
+        
+        The manifest is read, passed to `mutate` and written back with an
+        If-Match precondition, retrying on conflicts with concurrent writers
+        (other API instances or the FreeCAD worker). Writers inside this
+        process are serialized per project to avoid needless retries.
+        
+        Returns:
+            True if the change was stored, False otherwise. Failures are logged
+            and never raised: the manifest is an index that readers can rebuild.
+        """
+        if not self.s3_client or not self.aws_bucket_name:
+            return False
+        
+        lock = self._manifest_locks.setdefault(project_name, asyncio.Lock())
+        try:
+            async with lock:
+                for _ in range(max_attempts):
+                    manifest, etag = await self._read_manifest(project_name)
+                    if manifest is None:
+                        manifest = await self._build_manifest(project_name) or {
+                            "project_name": project_name,
+                            "manifest_version": 1,
+                            "latest_version": None,
+                            "latest_log": None,
+                            "log_count": 0,
+                            "versions": {}
+                        }
+                    
+                    mutate(manifest)
+                    if await self._write_manifest(manifest, etag):
+                        self._invalidate_project_cache(project_name)
+                        return True
+                    
+                    self.performance_metrics["manifest_conflicts"] += 1
+                    logger.info(f"🔁 Manifest for {project_name} changed concurrently, retrying")
             
-            if 'Contents' not in response:
-                logger.info(f"No existing files for project {project_name}, starting with version 1")
-                return 1
-            
-            # Extract version numbers from existing files
-            version_pattern = re.compile(rf"{re.escape(project_name)}_v(\d+)\.py$")
-            versions = []
-            
-            for obj in response['Contents']:
-                key = obj['Key']
-                match = version_pattern.search(key)
-                if match:
-                    versions.append(int(match.group(1)))
-            
-            if not versions:
-                logger.info(f"No versioned files found for project {project_name}, starting with version 1")
-                return 1
+            logger.warning(f"⚠️ Gave up updating manifest for {project_name} after {max_attempts} attempts")
+            return False
+        
+        except Exception as e:
+            logger.error(f"❌ Error updating manifest for {project_name}: {e}")
+            return False
+    
+    async def get_project_manifest(self, project_name: str, read_only: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Get the manifest describing every version of a project in one GET.
+        
+        Projects without a stored manifest are rebuilt from their S3 prefixes
+        and the result is stored. If the newest version is still pending, its
+        output folder is listed once so results the worker wrote without
+        updating the manifest are picked up.
+        
+        Args:
+            project_name: Name of the project
+            read_only: Never write to S3: a missing manifest is rebuilt but not
+                stored, and pending outputs are not refreshed (used by dry runs)
+        
+        Returns:
+            Manifest dictionary, or None if the project has no scripts
+        """
+        if not self.s3_client or not self.aws_bucket_name:
+            logger.warning("S3 not configured")
+            return None
+        
+        cache_key = ("manifest", project_name)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+        generation = self._cache_generation(project_name)
+        
+        try:
+            self.performance_metrics["manifest_reads"] += 1
+            manifest, etag = await self._read_manifest(project_name)
+            
+            if manifest is None:
+                manifest = await self._build_manifest(project_name)
+                if manifest is None or read_only:
+                    return manifest
+                await self._write_manifest(manifest, None)
+                self._cache_store(cache_key, manifest, settings.s3_listing_cache_ttl_seconds, generation)
+                return manifest
+            
+            latest = manifest["versions"].get(str(manifest.get("latest_version")))
+            if latest and latest["status"] == "pending" and not latest["outputs"] and not read_only:
+                outputs = await self.check_output_files(project_name, latest["version"])
+                if outputs:
+                    latest["outputs"] = outputs
+                    
+                    def _record_outputs(stored: Dict[str, Any]) -> None:
+                        self._manifest_version(stored, latest["version"])["outputs"] = outputs
+                    
+                    await self.update_manifest(project_name, _record_outputs)
+                    generation = self._cache_generation(project_name)
             
-            next_version = max(versions) + 1
+            self._cache_store(cache_key, manifest, settings.s3_listing_cache_ttl_seconds, generation)
+            return manifest
+        
+        except Exception as e:
+            logger.error(f"❌ Error getting manifest for {project_name}: {e}")
+            return None
+    
+    async def set_version_pinned(self, project_name: str, version: int, pinned: bool = True) -> bool:
+        """
+        Pin (or unpin) a version so the retention policy never expires it.
+        
+        Returns:
+            True if the manifest was updated, False if the version does not exist
+            or the manifest could not be written
+        """
+        manifest = await self.get_project_manifest(project_name)
+        if not manifest or str(version) not in manifest["versions"]:
+            return False
+        
+        def _record_pin(stored: Dict[str, Any]) -> None:
+            self._manifest_version(stored, version)["pinned"] = pinned
+        
+        return await self.update_manifest(project_name, _record_pin)
+    
+    async def get_next_version(self, project_name: str) -> int:
+        """
+        Allocate the next version number for a project.
+        
+        Versions come from an atomic counter in MongoDB, so concurrent uploads
+        never share a version and no S3 listing is needed. Legacy projects
+        without a counter are seeded once from an S3 scan; if the database is
+        unavailable the scan alone is used (highest version + 1).
+        """
+        if not self.s3_client or not self.aws_bucket_name:
+            logger.warning("S3 not configured, returning version 1")
+            return 1
+        
+        try:
+            # Import project service here to avoid circular imports
+            from services.project_service import project_service
+            
+            version = await self._run_blocking(project_service.allocate_script_version, project_name)
+            if version is None:
+                latest_version = await self._scan_latest_version(project_name)
+                await self._run_blocking(project_service.seed_script_version, project_name, latest_version)
+                version = await self._run_blocking(project_service.allocate_script_version, project_name)
+            
+            if version is not None:
+                logger.info(f"Next version for project {project_name}: v{version}")
+                return version
+        except Exception as e:
+            logger.warning(f"⚠️ Version counter unavailable for {project_name}, scanning S3: {e}")
+        
+        try:
+            next_version = await self._scan_latest_version(project_name) + 1
             logger.info(f"Next version for project {project_name}: v{next_version}")
             return next_version
             
@@ -105,6 +670,22 @@ class S3Service:
             logger.error(f"❌ Error getting next version: {e}")
             return 1
     
+    async def _scan_latest_version(self, project_name: str) -> int:
+        """Return the highest script version stored under input/ (0 if none)."""
+        self.performance_metrics["version_checks"] += 1
+        
+        # Stream the input directory for this project, keeping only the max
+        prefix = f"input/{project_name}/"
+        version_pattern = re.compile(rf"{re.escape(project_name)}_v(\d+)\.py$")
+        latest_version = 0
+        
+        async for obj in self.iter_objects(prefix):
+            match = version_pattern.search(obj['Key'])
+            if match:
+                latest_version = max(latest_version, int(match.group(1)))
+        
+        return latest_version
+    
     async def upload_script(self, code: str, project_name: str, user_id: str = None) -> Dict[str, Any]:
         """
         Upload Python script to S3 with automatic versioning.
@@ -145,8 +726,20 @@ class S3Service:
             if user_id:
                 metadata["user_id"] = user_id
             
+            script_hash = await self.generate_script_hash(code)
+            metadata["script_hash"] = script_hash
+            
+            # Byte-identical to a version that already processed: reuse its
+            # outputs. The processed marker goes in before the script so the
+            # worker never picks the new version up.
+            duplicate = await self._find_processed_duplicate(project_name, script_hash)
+            reused_outputs = []
+            if duplicate:
+                reused_outputs = await self._reuse_version_outputs(project_name, duplicate["version"], version)
+            
             # Upload to S3
-            self.s3_client.put_object(
+            await self._s3_call(
+                'put_object',
                 Bucket=self.aws_bucket_name,
                 Key=filename,
                 Body=code.encode('utf-8'),
@@ -157,16 +750,53 @@ class S3Service:
             
             s3_path = f"s3://{self.aws_bucket_name}/{filename}"
             self.performance_metrics["uploads"] += 1
+            self._invalidate_project_cache(project_name)
             
             logger.info(f"✅ Script uploaded to S3: {s3_path}")
             
+            version_metadata = None
+            outputs = []
+            if reused_outputs:
+                self.performance_metrics["dedup_hits"] += 1
+                logger.info(f"♻️ {project_name} v{version} is identical to v{duplicate['version']}, reused its outputs")
+                version_metadata = await self._put_version_metadata(
+                    project_name, version, reused_outputs, processing_time=0.0,
+                    worker_id="deduplicated", script_hash=script_hash
+                )
+                outputs = await self.check_output_files(project_name, version)
+            
+            # Record the new version in the project manifest
+            def _record_upload(manifest: Dict[str, Any]) -> None:
+                entry = self._manifest_version(manifest, version)
+                entry.update({
+                    "status": "pending",
+                    "script_key": filename,
+                    "script_hash": script_hash,
+                    "uploaded_at": current_time
+                })
+                if reused_outputs:
+                    entry.update({
+                        "status": "processed",
+                        "processed_at": current_time,
+                        "outputs": outputs,
+                        "metadata": version_metadata,
+                        "deduplicated_from": duplicate["version"]
+                    })
+            
+            await self.update_manifest(project_name, _record_upload)
+            
+            if not reused_outputs:
+                await self._enqueue_script_job(project_name, version, "upload")
+            
             return {
                 "success": True,
                 "s3_path": s3_path,
                 "filename": filename,
                 "version": version,
                 "metadata": metadata,
-                "upload_time": current_time
+                "upload_time": current_time,
+                "script_hash": script_hash,
+                "deduplicated_from": duplicate["version"] if reused_outputs else None
             }
             
         except ClientError as e:
@@ -188,57 +818,58 @@ class S3Service:
                 "version": None
             }
     
-    async def list_project_scripts(self, project_name: str) -> List[Dict[str, Any]]:
+    async def list_project_scripts(self, project_name: str, limit: Optional[int] = None,
+                                   include_metadata: bool = True,
+                                   max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
         """
-        List all script versions for a project.
+        List script versions for a project, newest first.
+        
+        Args:
+            project_name: Name of the project
+            limit: Only return the newest `limit` versions (None for all)
+            include_metadata: Fetch each script's user metadata with head_object.
+                Callers that only need versions should pass False, which makes
+                the call a plain listing.
+            max_concurrency: Maximum head_object calls in flight at once
+                (defaults to settings.s3_metadata_concurrency)
         
         Returns:
             List of script information including version, upload time, and metadata
+            (metadata is None when include_metadata is False)
         """
         if not self.s3_client or not self.aws_bucket_name:
             logger.warning("S3 not configured")
             return []
         
+        cache_key = ("scripts", project_name, limit, include_metadata)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+        generation = self._cache_generation(project_name)
+        
         try:
             prefix = f"input/{project_name}/"
-            
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.aws_bucket_name,
-                Prefix=prefix
-            )
-            
-            if 'Contents' not in response:
-                return []
-            
-            scripts = []
             version_pattern = re.compile(rf"{re.escape(project_name)}_v(\d+)\.py$")
             
-            for obj in response['Contents']:
-                key = obj['Key']
-                match = version_pattern.search(key)
-                if match:
-                    version = int(match.group(1))
-                    
-                    # Get object metadata
-                    try:
-                        head_response = self.s3_client.head_object(
-                            Bucket=self.aws_bucket_name,
-                            Key=key
-                        )
-                        metadata = head_response.get('Metadata', {})
-                    except:
-                        metadata = {}
-                    
-                    scripts.append({
-                        "version": version,
-                        "key": key,
-                        "size": obj['Size'],
-                        "last_modified": obj['LastModified'].isoformat(),
-                        "metadata": metadata
-                    })
+            matches = await self._newest_matches(prefix, version_pattern, limit)
             
-            # Sort by version number (descending)
-            scripts.sort(key=lambda x: x['version'], reverse=True)
+            metadata_by_key = {}
+            if include_metadata and matches:
+                metadata_by_key = await self._fetch_user_metadata(
+                    [obj['Key'] for _, obj in matches], max_concurrency
+                )
+            
+            scripts = [
+                {
+                    "version": version,
+                    "key": obj['Key'],
+                    "size": obj['Size'],
+                    "last_modified": obj['LastModified'].isoformat(),
+                    "metadata": metadata_by_key.get(obj['Key']) if include_metadata else None
+                }
+                for version, obj in matches
+            ]
+            self._cache_store(cache_key, scripts, settings.s3_listing_cache_ttl_seconds, generation)
             return scripts
             
         except ClientError as e:
@@ -248,6 +879,93 @@ class S3Service:
             logger.error(f"❌ Error listing scripts: {e}")
             return []
     
+    async def _fetch_user_metadata(self, keys: List[str],
+                                   max_concurrency: Optional[int] = None) -> Dict[str, Dict[str, str]]:
+        """
+        Fetch user metadata for many objects with a bounded number of
+        concurrent head_object calls. Objects that cannot be read map to {}.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or settings.s3_metadata_concurrency)
+        
+        async def _head(key: str) -> Dict[str, str]:
+            async with semaphore:
+                try:
+                    response = await self._s3_call('head_object', Bucket=self.aws_bucket_name, Key=key)
+                    return response.get('Metadata', {})
+                except Exception:
+                    return {}
+        
+        results = await asyncio.gather(*[_head(key) for key in keys])
+        return dict(zip(keys, results))
+    
+    async def _find_processed_duplicate(self, project_name: str, script_hash: str) -> Optional[Dict[str, Any]]:
+        """Newest successfully processed version of a project whose script has this hash."""
+        manifest = await self.get_project_manifest(project_name)
+        if not manifest:
+            return None
+        
+        matches = [
+            entry for entry in manifest["versions"].values()
+            if entry.get("script_hash") == script_hash and entry["status"] == "processed" and entry["outputs"]
+        ]
+        return max(matches, key=lambda entry: entry["version"]) if matches else None
+    
+    async def _reuse_version_outputs(self, project_name: str, source_version: int,
+                                     target_version: int) -> List[str]:
+        """
+        Server-side copy a version's outputs to a new version and mark the new
+        version processed.
+        
+        Returns:
+            Filenames copied, or [] if nothing could be reused (any partial copy
+            is cleaned up so the worker processes the version normally)
+        """
+        source_prefix = f"output/{project_name}/v{source_version}/"
+        target_prefix = f"output/{project_name}/v{target_version}/"
+        
+        try:
+            keys = [
+                obj['Key'] async for obj in self.iter_objects(source_prefix)
+                if not obj['Key'].endswith('/metadata.json')
+            ]
+            if not keys:
+                return []
+            
+            semaphore = asyncio.Semaphore(settings.s3_copy_concurrency)
+            
+            async def _copy(key: str) -> None:
+                async with semaphore:
+                    await self._s3_call(
+                        'copy_object',
+                        Bucket=self.aws_bucket_name,
+                        Key=target_prefix + key[len(source_prefix):],
+                        CopySource={'Bucket': self.aws_bucket_name, 'Key': key}
+                    )
+            
+            await asyncio.gather(*[_copy(key) for key in keys])
+            
+            await self._s3_call(
+                'put_object',
+                Bucket=self.aws_bucket_name,
+                Key=f"processed/{project_name}/{project_name}_v{target_version}.py.done",
+                Body=b'',
+                Metadata={
+                    "project_id": project_name,
+                    "version": str(target_version),
+                    "processed_at": datetime.now(timezone.utc).isoformat(),
+                    "service": "cadscribe-ai",
+                    "output_files_count": str(len(keys)),
+                    "deduplicated_from": str(source_version)
+                }
+            )
+            
+            return [key[len(source_prefix):] for key in keys]
+        
+        except Exception as e:
+            logger.warning(f"⚠️ Could not reuse outputs of {project_name} v{source_version}: {e}")
+            await self._clear_version_outputs(project_name, target_version)
+            return []
+    
     async def get_script_content(self, project_name: str, version: int) -> Optional[str]:
         """
         Get the content of a specific script version.
@@ -266,12 +984,7 @@ class S3Service:
         try:
             key = f"input/{project_name}/{project_name}_v{version}.py"
             
-            response = self.s3_client.get_object(
-                Bucket=self.aws_bucket_name,
-                Key=key
-            )
-            
-            content = response['Body'].read().decode('utf-8')
+            content = (await self._get_object_body(key)).decode('utf-8')
             self.performance_metrics["downloads"] += 1
             
             logger.info(f"✅ Retrieved script content: {key}")
@@ -305,6 +1018,12 @@ class S3Service:
             logger.warning("S3 not configured")
             return []
         
+        cache_key = ("outputs", project_name, version)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+        generation = self._cache_generation(project_name)
+        
         try:
             if version:
                 # Check specific version folder
@@ -313,19 +1032,11 @@ class S3Service:
                 # Check all version folders for latest
                 prefix = f"output/{project_name}/"
             
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.aws_bucket_name,
-                Prefix=prefix
-            )
-            
-            if 'Contents' not in response:
-                return []
-            
             output_files = []
             supported_extensions = ['.FCStd', '.STL', '.STEP', '.IGES', '.OBJ', '.GLTF']
             version_pattern = re.compile(r'/v(\d+)/')
             
-            for obj in response['Contents']:
+            async for obj in self.iter_objects(prefix):
                 key = obj['Key']
                 filename = key.split('/')[-1]
                 
@@ -339,18 +1050,7 @@ class S3Service:
                 
                 # Check if it's a supported output format
                 if any(filename.upper().endswith(ext.upper()) for ext in supported_extensions):
-                    # Get file extension
-                    extension = '.' + filename.split('.')[-1].upper()
-                    
-                    output_files.append({
-                        "filename": filename,
-                        "key": key,
-                        "format": extension,
-                        "size": obj['Size'],
-                        "version": file_version,
-                        "last_modified": obj['LastModified'].isoformat(),
-                        "download_url": None  # Will be generated on request
-                    })
+                    output_files.append(self._output_entry(obj, file_version))
             
             # Sort by version (descending) if no specific version requested
             if not version:
@@ -358,6 +1058,7 @@ class S3Service:
             
             logger.info(f"Found {len(output_files)} output files for project {project_name}" + 
                        (f" version {version}" if version else ""))
+            self._cache_store(cache_key, output_files, settings.s3_listing_cache_ttl_seconds, generation)
             return output_files
             
         except ClientError as e:
@@ -374,16 +1075,25 @@ class S3Service:
         """
         return await self.check_output_files(project_name, version)
     
-    async def generate_download_url(self, project_name: str, filename: str, version: int = None, expiration: int = 3600) -> Optional[str]:
+    async def generate_download_url(self, project_name: str, filename: str, version: int = None,
+                                    expiration: int = 3600, etag: Optional[str] = None) -> Optional[str]:
         """
         Generate a pre-signed URL for downloading an output file.
         Now supports versioned output folders.
         
+        URLs are cached per object key, ETag and expiration and reissued only
+        once they are within settings.s3_presign_refresh_margin_seconds of
+        expiring, so repeated requests return the same URL and browsers can
+        cache the (immutable) versioned output behind it. A changed object has
+        a new ETag and therefore gets a new URL.
+        
         Args:
             project_name: Name of the project
             filename: Name of the file to download
             version: Version number for the file
             expiration: URL expiration time in seconds (default: 1 hour)
+            etag: ETag of the object if the caller got it from a recent
+                listing; skips the existence probe
             
         Returns:
             Pre-signed URL or None if error
@@ -403,58 +1113,197 @@ class S3Service:
                     logger.warning(f"File not found: {filename} in project {project_name}")
                     return None
                 key = matching_files[0]['key']
+                etag = etag or matching_files[0].get('etag')
             
-            # Check if file exists
-            try:
-                self.s3_client.head_object(Bucket=self.aws_bucket_name, Key=key)
-            except ClientError as e:
-                if e.response['Error']['Code'] == 'NoSuchKey':
-                    logger.warning(f"File not found: {key}")
-                    return None
-                raise
+            # Probe for existence (and the ETag) only if no listing vouched for the key
+            if not etag:
+                try:
+                    head_response = await self._s3_call('head_object', Bucket=self.aws_bucket_name, Key=key)
+                    etag = head_response.get('ETag')
+                except ClientError as e:
+                    if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                        logger.warning(f"File not found: {key}")
+                        return None
+                    raise
             
-            # Generate pre-signed URL with retry logic (always fresh)
-            import time
-            timestamp = int(time.time())
+            cache_key = ("presign", key, etag, expiration)
+            url = self._presign_cache.get(cache_key)
+            if url:
+                return url
             
+            # Signing is local (no network call), so it runs inline
             try:
                 url = self.s3_client.generate_presigned_url(
                     'get_object',
                     Params={
-                        'Bucket': self.aws_bucket_name, 
+                        'Bucket': self.aws_bucket_name,
                         'Key': key,
-                        'ResponseCacheControl': 'no-cache',  # Prevent caching
-                        'ResponseExpires': f'timestamp-{timestamp}'  # Ensure uniqueness
+                        'ResponseCacheControl': f'private, max-age={expiration}, immutable'
                     },
                     ExpiresIn=expiration
                 )
+            except Exception as e:
+                # Signing is local, so a new client would fail the same way
+                logger.error(f"Failed to generate pre-signed URL: {e}")
+                raise
+            
+            reuse_for = expiration - settings.s3_presign_refresh_margin_seconds
+            if reuse_for > 0:
+                self._presign_cache.set(cache_key, url, reuse_for)
+            
+            logger.info(f"Generated download URL for {filename} (expires in {expiration}s)")
+            logger.debug(f"Pre-signed URL: {url[:100]}...")  # Log first 100 chars for debugging
+            return url
+            
+        except ClientError as e:
+            logger.error(f"❌ S3 error generating download URL: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"❌ Error generating download URL: {e}")
+            return None
+    
+    async def open_object_stream(self, key: str, byte_range: Optional[str] = None,
+                                 if_none_match: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Start a GET for an object without reading its body.
+        
+        Args:
+            key: S3 object key
+            byte_range: HTTP Range header value (e.g. "bytes=0-1048575")
+            if_none_match: ETag the client already holds
+        
+        Returns:
+            Dict with "status" (200, 206, 304, 404 or 416) and, for 200/206, the
+            response headers plus "body", the unread botocore stream to pass
+            to iter_object_body
+        """
+        params = {"Bucket": self.aws_bucket_name, "Key": key}
+        if byte_range:
+            params["Range"] = byte_range
+        if if_none_match:
+            params["IfNoneMatch"] = if_none_match
+        
+        try:
+            response = await self._s3_call('get_object', **params)
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if code in ('304', 'NotModified'):
+                return {"status": 304, "etag": if_none_match}
+            if code == 'InvalidRange':
+                return {"status": 416}
+            if code in ('NoSuchKey', '404'):
+                return {"status": 404}
+            raise
+        
+        self.performance_metrics["downloads"] += 1
+        return {
+            "status": 206 if response.get('ContentRange') else 200,
+            "content_length": response['ContentLength'],
+            "content_range": response.get('ContentRange'),
+            "content_type": response.get('ContentType'),
+            "etag": response.get('ETag'),
+            "last_modified": response.get('LastModified'),
+            "body": response['Body']
+        }
+    
+    async def iter_object_body(self, body: Any, chunk_size: Optional[int] = None) -> AsyncIterator[bytes]:
+        """
+        Yield an S3 response body in fixed-size chunks, reading each chunk on
+        the S3 executor so only one chunk is held in memory at a time.
+        The body is closed when iteration ends or the consumer goes away.
+        """
+        chunk_size = chunk_size or settings.s3_stream_chunk_size
+        try:
+            while True:
+                chunk = await self._run_blocking(body.read, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+    
+    async def get_version_bundle_entries(self, project_name: str, version: int,
+                                         include_script: bool = True) -> List[Dict[str, Any]]:
+        """
+        List the objects that make up a version bundle: everything under
+        output/{project}/v{version}/ plus, optionally, the source script.
+        
+        Returns:
+            List of entries with key, arcname (path inside the archive), size,
+            last_modified and kind ("output" or "script")
+        """
+        if not self.s3_client or not self.aws_bucket_name:
+            logger.warning("S3 not configured")
+            return []
+        
+        prefix = f"output/{project_name}/v{version}/"
+        entries = [
+            {
+                "key": obj['Key'],
+                "arcname": obj['Key'][len(prefix):],
+                "size": obj['Size'],
+                "last_modified": obj['LastModified'],
+                "kind": "output"
+            }
+            async for obj in self.iter_objects(prefix)
+        ]
+        
+        if include_script and entries:
+            script_key = f"input/{project_name}/{project_name}_v{version}.py"
+            try:
+                head_response = await self._s3_call('head_object', Bucket=self.aws_bucket_name, Key=script_key)
+                entries.append({
+                    "key": script_key,
+                    "arcname": script_key.split('/')[-1],
+                    "size": head_response['ContentLength'],
+                    "last_modified": head_response['LastModified'],
+                    "kind": "script"
+                })
+            except ClientError:
+                logger.warning(f"Script not found for bundle: {script_key}")
+        
+        return entries
+    
+    async def iter_zip_bundle(self, entries: List[Dict[str, Any]]) -> AsyncIterator[bytes]:
+        """
+        Stream a ZIP archive of the given S3 objects as it is built.
+        
+        Each object is piped chunk by chunk from S3 into the archive and the
+        archive bytes are yielded as soon as they are produced, so memory use
+        stays at roughly one chunk regardless of archive size and nothing is
+        written to disk. FCStd files are already ZIP containers and are
+        stored; everything else is deflated off the event loop.
+        """
+        sink = _ZipStreamSink()
+        
+        with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for entry in entries:
+                info = zipfile.ZipInfo(entry["arcname"], date_time=entry["last_modified"].timetuple()[:6])
+                info.file_size = entry["size"]
+                info.compress_type = (
+                    zipfile.ZIP_STORED if entry["arcname"].lower().endswith('.fcstd') else zipfile.ZIP_DEFLATED
+                )
+                
+                stream = await self.open_object_stream(entry["key"])
+                if stream["status"] != 200:
+                    logger.warning(f"Skipping {entry['key']} in bundle (status {stream['status']})")
+                    continue
                 
-                logger.info(f"Generated fresh download URL for {filename} (expires in {expiration}s, ts: {timestamp})")
-                logger.debug(f"Pre-signed URL: {url[:100]}...")  # Log first 100 chars for debugging
-                return url
+                with archive.open(info, mode='w') as member:
+                    async for chunk in self.iter_object_body(stream["body"]):
+                        await asyncio.to_thread(member.write, chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
                 
-            except Exception as e:
-                logger.error(f"Failed to generate pre-signed URL: {e}")
-                # Retry once with fresh S3 client
-                try:
-                    self._init_s3_client()
-                    url = self.s3_client.generate_presigned_url(
-                        'get_object',
-                        Params={'Bucket': self.aws_bucket_name, 'Key': key},
-                        ExpiresIn=expiration
-                    )
-                    logger.info(f"Generated download URL on retry for {filename}")
-                    return url
-                except Exception as retry_error:
-                    logger.error(f"Retry also failed: {retry_error}")
-                    raise
-            
-        except ClientError as e:
-            logger.error(f"❌ S3 error generating download URL: {e}")
-            return None
-        except Exception as e:
-            logger.error(f"❌ Error generating download URL: {e}")
-            return None
+                data = sink.drain()
+                if data:
+                    yield data
+        
+        # Central directory written on close
+        data = sink.drain()
+        if data:
+            yield data
     
     async def generate_script_hash(self, code: str) -> str:
         """Generate SHA256 hash of script content for metadata."""
@@ -481,10 +1330,54 @@ class S3Service:
             logger.warning("S3 not configured")
             return False
         
+        metadata = await self._put_version_metadata(
+            project_name, version, output_files, processing_time, worker_id, log_file
+        )
+        if metadata is None:
+            return False
+        
+        def _record_metadata(manifest: Dict[str, Any]) -> None:
+            entry = self._manifest_version(manifest, version)
+            entry["metadata"] = metadata
+            entry["script_hash"] = metadata["script_hash"]
+        
+        await self.update_manifest(project_name, _record_metadata)
+        return True
+    
+    async def _get_script_hash(self, project_name: str, version: int) -> Optional[str]:
+        """
+        Look up the SHA-256 recorded for a script at upload time.
+        
+        Checked in order: the project manifest, then the input object's
+        metadata. Only scripts uploaded before hashes were recorded fall back
+        to downloading and hashing the script.
+        """
+        manifest = await self.get_project_manifest(project_name)
+        entry = (manifest or {}).get("versions", {}).get(str(version)) or {}
+        if entry.get("script_hash"):
+            return entry["script_hash"]
+        
+        script_key = f"input/{project_name}/{project_name}_v{version}.py"
+        try:
+            head_response = await self._s3_call('head_object', Bucket=self.aws_bucket_name, Key=script_key)
+        except ClientError:
+            return None
+        
+        script_hash = head_response.get('Metadata', {}).get('script_hash')
+        if script_hash:
+            return script_hash
+        
+        script_content = await self.get_script_content(project_name, version)
+        return await self.generate_script_hash(script_content) if script_content else None
+    
+    async def _put_version_metadata(self, project_name: str, version: int,
+                                    output_files: List[str], processing_time: float = None,
+                                    worker_id: str = None, log_file: str = None,
+                                    script_hash: str = None) -> Optional[Dict[str, Any]]:
+        """Write metadata.json for a version and return its contents (None on failure)."""
         try:
-            # Get script content to generate hash
-            script_content = await self.get_script_content(project_name, version)
-            script_hash = await self.generate_script_hash(script_content) if script_content else None
+            if script_hash is None:
+                script_hash = await self._get_script_hash(project_name, version)
             
             # Create metadata
             metadata = {
@@ -502,7 +1395,8 @@ class S3Service:
             # Upload metadata.json to versioned output folder
             key = f"output/{project_name}/v{version}/metadata.json"
             
-            self.s3_client.put_object(
+            await self._s3_call(
+                'put_object',
                 Bucket=self.aws_bucket_name,
                 Key=key,
                 Body=json.dumps(metadata, indent=2).encode('utf-8'),
@@ -511,14 +1405,15 @@ class S3Service:
             )
             
             logger.info(f"✅ Created metadata for {project_name} v{version}: {key}")
-            return True
+            self._invalidate_project_cache(project_name)
+            return metadata
             
         except ClientError as e:
             logger.error(f"❌ S3 error creating metadata: {e}")
-            return False
+            return None
         except Exception as e:
             logger.error(f"❌ Error creating metadata: {e}")
-            return False
+            return None
     
     async def get_version_metadata(self, project_name: str, version: int) -> Optional[Dict[str, Any]]:
         """
@@ -535,18 +1430,20 @@ class S3Service:
             logger.warning("S3 not configured")
             return None
         
+        cache_key = ("metadata", project_name, version)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+        generation = self._cache_generation(project_name)
+        
         try:
             key = f"output/{project_name}/v{version}/metadata.json"
             
-            response = self.s3_client.get_object(
-                Bucket=self.aws_bucket_name,
-                Key=key
-            )
-            
-            content = response['Body'].read().decode('utf-8')
+            content = (await self._get_object_body(key)).decode('utf-8')
             metadata = json.loads(content)
             
             logger.info(f"✅ Retrieved metadata for {project_name} v{version}")
+            self._cache_store(cache_key, metadata, settings.s3_metadata_cache_ttl_seconds, generation)
             return metadata
             
         except ClientError as e:
@@ -583,8 +1480,9 @@ class S3Service:
         
         try:
             # Create metadata.json if output files are provided
+            version_metadata = None
             if output_files:
-                await self.create_version_metadata(
+                version_metadata = await self._put_version_metadata(
                     project_name, version, output_files, 
                     processing_time, worker_id, log_file
                 )
@@ -602,7 +1500,8 @@ class S3Service:
                 "worker_id": worker_id or "unknown"
             }
             
-            self.s3_client.put_object(
+            await self._s3_call(
+                'put_object',
                 Bucket=self.aws_bucket_name,
                 Key=key,
                 Body=b'',
@@ -610,6 +1509,24 @@ class S3Service:
             )
             
             logger.info(f"✅ Marked script as processed: {key}")
+            self._invalidate_project_cache(project_name)
+            
+            # Record the outcome in the project manifest
+            outputs = await self.check_output_files(project_name, version) if output_files else []
+            
+            def _record_processed(manifest: Dict[str, Any]) -> None:
+                entry = self._manifest_version(manifest, version)
+                entry.update({
+                    "status": "processed",
+                    "processed_at": metadata["processed_at"],
+                    "outputs": outputs,
+                    "error": None
+                })
+                if version_metadata:
+                    entry["metadata"] = version_metadata
+                    entry["script_hash"] = version_metadata["script_hash"]
+            
+            await self.update_manifest(project_name, _record_processed)
             return True
             
         except ClientError as e:
@@ -619,6 +1536,30 @@ class S3Service:
             logger.error(f"❌ Error marking script processed: {e}")
             return False
     
+    async def list_processed_scripts(self, project_name: str) -> List[Dict[str, Any]]:
+        """
+        List the .done markers the worker has written for a project.
+        
+        Returns:
+            List of processed marker keys with their processing timestamps
+        """
+        if not self.s3_client or not self.aws_bucket_name:
+            return []
+        
+        try:
+            return [
+                {
+                    "key": obj['Key'],
+                    "processed_at": obj['LastModified'].isoformat()
+                }
+                async for obj in self.iter_objects(f"processed/{project_name}/")
+                if obj['Key'].endswith('.py.done')
+            ]
+            
+        except Exception as e:
+            logger.warning(f"Error checking processed scripts: {e}")
+            return []
+    
     async def get_project_logs(self, project_name: str, limit: int = 10) -> List[Dict[str, Any]]:
         """
         Get recent log files for a project.
@@ -636,36 +1577,35 @@ class S3Service:
         
         try:
             prefix = f"logs/{project_name}/"
-            
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.aws_bucket_name,
-                Prefix=prefix
-            )
-            
-            if 'Contents' not in response:
-                return []
-            
-            log_files = []
             log_pattern = re.compile(rf"{re.escape(project_name)}_info_(\d{{8}}_\d{{6}})\.log$")
             
-            for obj in response['Contents']:
+            # Keep only the `limit` most recent logs while streaming the prefix
+            newest: List[Tuple[str, str, Dict[str, Any]]] = []
+            
+            async for obj in self.iter_objects(prefix):
                 key = obj['Key']
                 filename = key.split('/')[-1]
                 match = log_pattern.search(filename)
                 if match:
-                    timestamp_str = match.group(1)
-                    
-                    log_files.append({
-                        "filename": filename,
-                        "key": key,
-                        "timestamp": timestamp_str,
-                        "size": obj['Size'],
-                        "last_modified": obj['LastModified'].isoformat()
-                    })
+                    entry = (match.group(1), key, obj)
+                    if len(newest) < limit:
+                        heapq.heappush(newest, entry)
+                    elif entry[:2] > newest[0][:2]:
+                        heapq.heapreplace(newest, entry)
             
             # Sort by timestamp (most recent first)
-            log_files.sort(key=lambda x: x['timestamp'], reverse=True)
-            return log_files[:limit]
+            newest.sort(key=lambda entry: entry[:2], reverse=True)
+            return [
+                {
+                    "filename": key.split('/')[-1],
+                    "key": key,
+                    "timestamp": timestamp_str,
+                    "size": obj['Size'],
+                    "last_modified": obj['LastModified'].isoformat(),
+                    "etag": obj.get('ETag')
+                }
+                for timestamp_str, key, obj in newest
+            ]
             
         except ClientError as e:
             logger.error(f"❌ S3 error getting project logs: {e}")
@@ -674,13 +1614,16 @@ class S3Service:
             logger.error(f"❌ Error getting project logs: {e}")
             return []
     
-    async def get_log_content(self, project_name: str, log_filename: str) -> Optional[str]:
+    async def get_log_content(self, project_name: str, log_filename: str,
+                              tail_bytes: int = None, offset: int = None) -> Optional[str]:
         """
         Get the content of a specific log file.
         
         Args:
             project_name: Name of the project
             log_filename: Name of the log file
+            tail_bytes: Only return the last N bytes of the log
+            offset: Only return the log from this byte offset onwards
             
         Returns:
             Log content as string, or None if not found
@@ -689,15 +1632,14 @@ class S3Service:
             logger.warning("S3 not configured")
             return None
         
+        if tail_bytes is not None or offset is not None:
+            result = await self.read_log_range(project_name, log_filename, offset=offset, tail_bytes=tail_bytes)
+            return result["content"] if result else None
+        
         try:
             key = f"logs/{project_name}/{log_filename}"
             
-            response = self.s3_client.get_object(
-                Bucket=self.aws_bucket_name,
-                Key=key
-            )
-            
-            content = response['Body'].read().decode('utf-8')
+            content = (await self._get_text_body(key)).decode('utf-8')
             logger.info(f"✅ Retrieved log content: {key}")
             return content
             
@@ -711,6 +1653,110 @@ class S3Service:
             logger.error(f"❌ Error getting log content: {e}")
             return None
     
+    async def read_log_range(self, project_name: str, log_filename: str,
+                             offset: int = None, tail_bytes: int = None) -> Optional[Dict[str, Any]]:
+        """
+        Read part of a log: everything from `offset`, limited to the last
+        `tail_bytes` when given.
+        
+        Offsets are positions in the uncompressed log. Plain-text logs are read
+        with a ranged GET. Gzip logs are decompressed as they stream in, keeping
+        at most `tail_bytes` in memory. When the object metadata records the
+        uncompressed size, reading from an offset at or past the end costs only
+        a HEAD, which keeps "follow" polling cheap.
+        
+        Returns:
+            Dictionary with content, offset (where content starts), next_offset
+            (pass back to read only newer bytes) and size, or None if not found
+        """
+        if not self.s3_client or not self.aws_bucket_name:
+            logger.warning("S3 not configured")
+            return None
+        
+        key = f"logs/{project_name}/{log_filename}"
+        
+        try:
+            head_response = await self._s3_call('head_object', Bucket=self.aws_bucket_name, Key=key)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                logger.warning(f"Log file not found: {key}")
+                return None
+            raise
+        
+        compressed = head_response.get('ContentEncoding') == 'gzip'
+        uncompressed_size = head_response.get('Metadata', {}).get('uncompressed-size')
+        size = int(uncompressed_size) if compressed and uncompressed_size else (
+            None if compressed else head_response['ContentLength']
+        )
+        
+        def _result(start: int, data: bytes, total: int) -> Dict[str, Any]:
+            # A tail can begin mid-character; skip to the next UTF-8 boundary
+            skipped = 0
+            while skipped < len(data) and start > 0 and data[skipped] & 0xC0 == 0x80:
+                skipped += 1
+            start, data = start + skipped, data[skipped:]
+            return {
+                "content": data.decode('utf-8', errors='replace'),
+                "offset": start,
+                "next_offset": start + len(data),
+                "size": total,
+                "compressed": compressed
+            }
+        
+        # Nothing new since the caller's offset
+        if offset is not None and size is not None and offset >= size:
+            return _result(size, b"", size)
+        
+        if not compressed:
+            start = offset or 0
+            if tail_bytes is not None:
+                start = max(start, size - tail_bytes)
+            stream = await self.open_object_stream(key, byte_range=f"bytes={start}-")
+            if stream["status"] == 416:
+                return _result(size, b"", size)
+            if stream["status"] == 404:
+                # Deleted since the HEAD
+                logger.warning(f"Log file not found: {key}")
+                return None
+            data = b"".join([chunk async for chunk in self.iter_object_body(stream["body"])])
+            return _result(start, data, size)
+        
+        def _fetch_decompressed() -> Tuple[int, bytes, int]:
+            response = self.s3_client.get_object(Bucket=self.aws_bucket_name, Key=key)
+            body = response['Body']
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            kept = bytearray()
+            position = 0
+            skip = offset or 0
+            
+            def _consume(data: bytes) -> None:
+                nonlocal position
+                chunk_start = position
+                position += len(data)
+                if position <= skip:
+                    return
+                kept.extend(data[max(0, skip - chunk_start):])
+                if tail_bytes is not None and len(kept) > tail_bytes:
+                    del kept[:len(kept) - tail_bytes]
+            
+            try:
+                for chunk in body.iter_chunks(chunk_size=settings.s3_stream_chunk_size):
+                    _consume(decompressor.decompress(chunk))
+                _consume(decompressor.flush())
+            finally:
+                body.close()
+            
+            return position - len(kept), bytes(kept), position
+        
+        try:
+            start, data, total = await self._run_blocking(_fetch_decompressed)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                logger.warning(f"Log file not found: {key}")
+                return None
+            raise
+        return _result(start, data, total)
+    
     async def auto_fix_failed_script(self, project_name: str, version: int, 
                                     error_message: str = None, log_file: str = None) -> bool:
         """
@@ -735,11 +1781,7 @@ class S3Service:
             script_key = f"input/{project_name}/{project_name}_v{version}.py"
             
             try:
-                response = self.s3_client.get_object(
-                    Bucket=self.aws_bucket_name,
-                    Key=script_key
-                )
-                original_code = response['Body'].read().decode('utf-8')
+                original_code = (await self._get_object_body(script_key)).decode('utf-8')
             except ClientError:
                 logger.error(f"❌ Could not retrieve original script: {script_key}")
                 return False
@@ -755,7 +1797,8 @@ class S3Service:
             )
             
             # Replace the broken script with corrected version
-            self.s3_client.put_object(
+            await self._s3_call(
+                'put_object',
                 Bucket=self.aws_bucket_name,
                 Key=script_key,
                 Body=corrected_code,
@@ -771,7 +1814,8 @@ class S3Service:
             # Remove processed marker so EC2 worker will reprocess
             processed_key = f"processed/{project_name}/{project_name}_v{version}.py.done"
             try:
-                self.s3_client.delete_object(
+                await self._s3_call(
+                    'delete_object',
                     Bucket=self.aws_bucket_name,
                     Key=processed_key
                 )
@@ -782,6 +1826,21 @@ class S3Service:
             # Clear any existing output files
             await self._clear_version_outputs(project_name, version)
             
+            script_hash = await self.generate_script_hash(corrected_code)
+            
+            def _record_auto_fix(manifest: Dict[str, Any]) -> None:
+                self._manifest_version(manifest, version).update({
+                    "status": "pending",
+                    "script_hash": script_hash,
+                    "processed_at": None,
+                    "outputs": [],
+                    "metadata": None
+                })
+            
+            await self.update_manifest(project_name, _record_auto_fix)
+            await self._request_worker_rescan(project_name)
+            await self._enqueue_script_job(project_name, version, "auto_fix")
+            
             # Log the auto-fix
             fix_log = {
                 "project_name": project_name,
@@ -794,7 +1853,8 @@ class S3Service:
             }
             
             fix_log_key = f"logs/{project_name}/{project_name}_autofix_v{version}_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.json"
-            self.s3_client.put_object(
+            await self._s3_call(
+                'put_object',
                 Bucket=self.aws_bucket_name,
                 Key=fix_log_key,
                 Body=json.dumps(fix_log, indent=2),
@@ -847,11 +1907,10 @@ class S3Service:
             
             # If specific log file provided, use it
             if specific_log_file:
-                log_content = await self.get_log_content(project_name, specific_log_file)
-                if log_content:
-                    error_info = self._parse_log_content(log_content)
+                parsed_info = await self._analyze_log_file(project_name, specific_log_file)
+                if parsed_info:
                     logger.info(f"📋 Analyzed specific log file: {specific_log_file}")
-                    return error_info
+                    return parsed_info
             
             # Otherwise, get recent log files for this project
             recent_logs = await self.get_project_logs(project_name, limit=5)
@@ -861,9 +1920,8 @@ class S3Service:
                 
                 # Look for logs related to this version
                 if f"v{version}" in log_filename or f"_{version}_" in log_filename:
-                    log_content = await self.get_log_content(project_name, log_filename)
-                    if log_content:
-                        parsed_info = self._parse_log_content(log_content)
+                    parsed_info = await self._analyze_log_file(project_name, log_filename, log_entry.get("etag"))
+                    if parsed_info:
                         # Merge error information
                         error_info.update(parsed_info)
                         logger.info(f"📋 Analyzed log file: {log_filename}")
@@ -875,8 +1933,89 @@ class S3Service:
             logger.error(f"❌ Error analyzing logs: {e}")
             return {"error_type": "log_analysis_failed", "error_details": str(e)}
     
+    async def _analyze_log_file(self, project_name: str, log_filename: str,
+                                etag: str = None) -> Optional[dict]:
+        """
+        Parse one log file, memoised by its ETag so repeated analyses of an
+        unchanged log skip both the download and the parse.
+        
+        Args:
+            project_name: Name of the project
+            log_filename: Name of the log file
+            etag: The log's ETag if already known from a listing (saves a HEAD)
+        
+        Returns:
+            Parsed error information, or None if the log is missing or empty
+        """
+        key = f"logs/{project_name}/{log_filename}"
+        
+        if etag is None:
+            try:
+                etag = (await self._s3_call('head_object', Bucket=self.aws_bucket_name, Key=key))['ETag']
+            except ClientError:
+                return None
+        
+        cached = self._log_analysis_cache.get((key, etag))
+        if cached is not None:
+            self.performance_metrics["log_analysis_hits"] += 1
+            return copy.deepcopy(cached)
+        
+        self.performance_metrics["log_analysis_misses"] += 1
+        log_content = await self.get_log_content(project_name, log_filename)
+        if not log_content:
+            return None
+        
+        error_info = await asyncio.to_thread(self._parse_log_content, log_content)
+        self._log_analysis_cache.set((key, etag), error_info)
+        return copy.deepcopy(error_info)
+    
+    @staticmethod
+    def _iter_log_trigger_lines(log_content: str) -> Iterator[Tuple[int, int]]:
+        """
+        Yield (start, end) of each line containing a trigger word, in order.
+        
+        The text is lowercased once and one str.find cursor per trigger word
+        jumps from hit to hit, so lines without a trigger are never visited
+        individually. If lowercasing changes the text's length (rare Unicode),
+        the case-insensitive pattern is used instead.
+        """
+        length = len(log_content)
+        lowered = log_content.lower()
+        
+        if len(lowered) != length:
+            position = 0
+            while True:
+                match = LOG_TRIGGER_PATTERN.search(log_content, position)
+                if not match:
+                    return
+                line_end = log_content.find('\n', match.end())
+                line_end = length if line_end == -1 else line_end
+                yield log_content.rfind('\n', 0, match.start()) + 1, line_end
+                position = line_end + 1
+        
+        cursors = {word: lowered.find(word) for word in LOG_TRIGGER_WORDS}
+        while True:
+            hits = [hit for hit in cursors.values() if hit != -1]
+            if not hits:
+                return
+            hit = min(hits)
+            line_end = lowered.find('\n', hit)
+            line_end = length if line_end == -1 else line_end
+            yield lowered.rfind('\n', 0, hit) + 1, line_end
+            
+            position = line_end + 1
+            for word, word_hit in cursors.items():
+                if word_hit != -1 and word_hit < position:
+                    cursors[word] = lowered.find(word, position)
+    
     def _parse_log_content(self, log_content: str) -> dict:
-        """Parse log content to extract error information."""
+        """
+        Parse log content to extract error information.
+        
+        Single pass over the text: only lines that contain a trigger word are
+        lowercased and run through the rules. Rule order and results are the
+        same as checking every line.
+        """
         error_info = {
             "error_type": "unknown",
             "error_details": "",
@@ -886,9 +2025,10 @@ class S3Service:
             "runtime_errors": []
         }
         
-        lines = log_content.split('\n')
+        length = len(log_content)
         
-        for i, line in enumerate(lines):
+        for line_start, line_end in self._iter_log_trigger_lines(log_content):
+            line = log_content[line_start:line_end]
             line_lower = line.lower()
             
             # Check for import errors
@@ -929,15 +2069,19 @@ class S3Service:
                 error_info["error_type"] = "freecad_error"
                 error_info["runtime_errors"].append(line.strip())
                 
-            # Capture stack trace
+            # Capture stack trace: this line and up to 9 more, until a blank line
             elif 'traceback' in line_lower:
-                # Get next few lines for stack trace
                 stack_lines = []
-                for j in range(i, min(i + 10, len(lines))):
-                    if lines[j].strip():
-                        stack_lines.append(lines[j])
-                    else:
+                cursor = line_start
+                for _ in range(10):
+                    stack_end = log_content.find('\n', cursor)
+                    if stack_end == -1:
+                        stack_end = length
+                    stack_line = log_content[cursor:stack_end]
+                    if not stack_line.strip():
                         break
+                    stack_lines.append(stack_line)
+                    cursor = stack_end + 1
                 error_info["stack_trace"] = '\n'.join(stack_lines)
         
         return error_info
@@ -1200,7 +2344,8 @@ except Exception as e:
             # Store error metadata
             error_key = f"errors/{project_name}/{project_name}_v{version}_error.json"
             
-            self.s3_client.put_object(
+            await self._s3_call(
+                'put_object',
                 Bucket=self.aws_bucket_name,
                 Key=error_key,
                 Body=json.dumps(error_data, indent=2),
@@ -1208,6 +2353,24 @@ except Exception as e:
             )
             
             logger.info(f"✅ Marked script as failed: {project_name} v{version}")
+            self._invalidate_project_cache(project_name)
+            
+            def _record_failure(manifest: Dict[str, Any]) -> None:
+                entry = self._manifest_version(manifest, version)
+                entry["status"] = "failed"
+                entry["error"] = {
+                    "error_file": error_key,
+                    "error_message": error_message,
+                    "retry_count": retry_count,
+                    "failed_at": error_data["failed_at"]
+                }
+            
+            await self.update_manifest(project_name, _record_failure)
+            
+            failure = self._failure_entry(error_data, error_key)
+            await self.update_failure_index(
+                lambda index: index["failures"].__setitem__(f"{project_name}/v{version}", failure)
+            )
             return True
             
         except Exception as e:
@@ -1237,11 +2400,7 @@ except Exception as e:
             error_key = f"errors/{project_name}/{project_name}_v{version}_error.json"
             
             try:
-                error_response = self.s3_client.get_object(
-                    Bucket=self.aws_bucket_name,
-                    Key=error_key
-                )
-                error_data = json.loads(error_response['Body'].read().decode('utf-8'))
+                error_data = json.loads((await self._get_object_body(error_key)).decode('utf-8'))
                 logger.info(f"📋 Found error record for {project_name} v{version}")
             except ClientError:
                 logger.warning(f"⚠️ No error record found for {project_name} v{version}")
@@ -1250,7 +2409,8 @@ except Exception as e:
             # Replace the script file
             script_key = f"input/{project_name}/{project_name}_v{version}.py"
             
-            self.s3_client.put_object(
+            await self._s3_call(
+                'put_object',
                 Bucket=self.aws_bucket_name,
                 Key=script_key,
                 Body=new_code,
@@ -1265,7 +2425,8 @@ except Exception as e:
             # Remove processed marker if it exists
             processed_key = f"processed/{project_name}/{project_name}_v{version}.py.done"
             try:
-                self.s3_client.delete_object(
+                await self._s3_call(
+                    'delete_object',
                     Bucket=self.aws_bucket_name,
                     Key=processed_key
                 )
@@ -1276,7 +2437,8 @@ except Exception as e:
             # Remove error record
             if error_data:
                 try:
-                    self.s3_client.delete_object(
+                    await self._s3_call(
+                        'delete_object',
                         Bucket=self.aws_bucket_name,
                         Key=error_key
                     )
@@ -1286,6 +2448,28 @@ except Exception as e:
             
             # Clear any existing output files for this version
             await self._clear_version_outputs(project_name, version)
+            self._invalidate_project_cache(project_name)
+            
+            script_hash = await self.generate_script_hash(new_code)
+            
+            def _record_replacement(manifest: Dict[str, Any]) -> None:
+                self._manifest_version(manifest, version).update({
+                    "status": "pending",
+                    "script_hash": script_hash,
+                    "processed_at": None,
+                    "outputs": [],
+                    "metadata": None,
+                    "error": None
+                })
+            
+            await self.update_manifest(project_name, _record_replacement)
+            await self._request_worker_rescan(project_name)
+            await self._enqueue_script_job(project_name, version, "replace")
+            
+            if error_data:
+                await self.update_failure_index(
+                    lambda index: index["failures"].pop(f"{project_name}/v{version}", None)
+                )
             
             logger.info(f"✅ Successfully replaced script: {project_name} v{version}")
             
@@ -1302,41 +2486,313 @@ except Exception as e:
             logger.error(f"❌ Error replacing failed script: {e}")
             return {"success": False, "error": str(e)}
     
+    async def _delete_key_batches(self, batches: AsyncIterator[Tuple[str, List[str]]],
+                                  semaphore: asyncio.Semaphore,
+                                  on_batch: Optional[Callable[[str, int, int], None]] = None) -> Dict[str, int]:
+        """
+        Delete (label, keys) batches of up to 1000 keys (the delete_objects
+        limit) as they arrive, with up to the semaphore's worth in flight.
+        
+        Returns:
+            Counts of deleted objects and objects that failed to delete
+        """
+        result = {"deleted": 0, "errors": 0}
+        tasks = []
+        
+        async def _delete_batch(label: str, keys: List[str]) -> None:
+            try:
+                response = await self._s3_call(
+                    'delete_objects',
+                    Bucket=self.aws_bucket_name,
+                    Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True}
+                )
+                errors = len(response.get('Errors', []))
+            except Exception as e:
+                logger.error(f"❌ Error deleting batch under {label}: {e}")
+                errors = len(keys)
+            finally:
+                semaphore.release()
+            
+            result["deleted"] += len(keys) - errors
+            result["errors"] += errors
+            if on_batch:
+                on_batch(label, len(keys) - errors, errors)
+        
+        async for label, keys in batches:
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(_delete_batch(label, keys)))
+        
+        await asyncio.gather(*tasks)
+        return result
+    
+    async def _delete_prefix(self, prefix: str, semaphore: asyncio.Semaphore,
+                             on_batch: Optional[Callable[[str, int, int], None]] = None) -> Dict[str, int]:
+        """Delete every object under a prefix, one listing page per batch."""
+        async def _pages() -> AsyncIterator[Tuple[str, List[str]]]:
+            async for page in self._iter_object_pages(prefix):
+                yield prefix, [obj['Key'] for obj in page]
+        
+        return await self._delete_key_batches(_pages(), semaphore, on_batch)
+    
+    async def delete_keys(self, keys: List[str]) -> Dict[str, int]:
+        """Delete a list of keys in parallel batches of up to 1000."""
+        async def _chunks() -> AsyncIterator[Tuple[str, List[str]]]:
+            for start in range(0, len(keys), 1000):
+                yield "keys", keys[start:start + 1000]
+        
+        return await self._delete_key_batches(_chunks(), asyncio.Semaphore(settings.s3_delete_concurrency))
+    
     async def _clear_version_outputs(self, project_name: str, version: int) -> bool:
         """Clear all output files for a specific version."""
         try:
             if not self.s3_client:
                 return False
             
-            # List all files in the version output folder
-            output_prefix = f"output/{project_name}/v{version}/"
-            
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.aws_bucket_name,
-                Prefix=output_prefix
+            result = await self._delete_prefix(
+                f"output/{project_name}/v{version}/",
+                asyncio.Semaphore(settings.s3_delete_concurrency)
             )
             
-            if 'Contents' in response:
-                # Delete all files in the version folder
-                objects_to_delete = [{'Key': obj['Key']} for obj in response['Contents']]
+            if result["deleted"]:
+                logger.info(f"🗑️ Cleared {result['deleted']} output files for {project_name} v{version}")
+                self._invalidate_project_cache(project_name)
                 
-                if objects_to_delete:
-                    self.s3_client.delete_objects(
-                        Bucket=self.aws_bucket_name,
-                        Delete={'Objects': objects_to_delete}
-                    )
-                    logger.info(f"🗑️ Cleared {len(objects_to_delete)} output files for {project_name} v{version}")
+                # Readers trust the manifest's output list, so drop the deleted files from it
+                def _record_cleared(manifest: Dict[str, Any]) -> None:
+                    entry = self._manifest_version(manifest, version)
+                    entry["outputs"] = []
+                    entry["metadata"] = None
+                    if entry["status"] == "processed":
+                        entry["status"] = "pending"
+                        entry["processed_at"] = None
+                
+                await self.update_manifest(project_name, _record_cleared)
             
-            return True
+            return result["errors"] == 0
             
         except Exception as e:
             logger.error(f"❌ Error clearing version outputs: {e}")
             return False
     
+    async def purge_project(self, project_name: str,
+                            on_batch: Optional[Callable[[str, int, int], None]] = None) -> Dict[str, Any]:
+        """
+        Delete every S3 object belonging to a project: scripts, outputs, logs,
+        processed markers, error records and the manifest.
+        
+        All prefixes are purged concurrently in batches of up to 1000 keys.
+        
+        Args:
+            project_name: S3 project name
+            on_batch: Optional callback(prefix, deleted, errors) invoked after
+                each batch, for progress reporting
+        
+        Returns:
+            Dictionary with per-prefix and total counts
+        """
+        if not self.s3_client or not self.aws_bucket_name:
+            logger.warning("S3 not configured")
+            return {"success": False, "error": "S3 not configured"}
+        
+        try:
+            prefixes = [
+                f"{root}/{project_name}/"
+                for root in ("input", "output", "logs", "processed", "errors", "manifests")
+            ]
+            semaphore = asyncio.Semaphore(settings.s3_delete_concurrency)
+            results = await asyncio.gather(*[self._delete_prefix(prefix, semaphore, on_batch) for prefix in prefixes])
+            by_prefix = dict(zip(prefixes, results))
+            
+            self._invalidate_project_cache(project_name)
+            self._manifest_locks.pop(project_name, None)
+            
+            if by_prefix[f"errors/{project_name}/"]["deleted"]:
+                def _drop_project(index: Dict[str, Any]) -> None:
+                    for key in [key for key, entry in index["failures"].items() if entry["project_name"] == project_name]:
+                        del index["failures"][key]
+                
+                await self.update_failure_index(_drop_project)
+            
+            deleted = sum(result["deleted"] for result in results)
+            errors = sum(result["errors"] for result in results)
+            logger.info(f"🗑️ Purged {deleted} objects for {project_name} ({errors} errors)")
+            
+            return {
+                "success": errors == 0,
+                "project_name": project_name,
+                "deleted": deleted,
+                "errors": errors,
+                "prefixes": by_prefix
+            }
+        
+        except Exception as e:
+            logger.error(f"❌ Error purging project {project_name}: {e}")
+            return {"success": False, "project_name": project_name, "error": str(e)}
+    
+    @staticmethod
+    def _classify_error(error_message: Optional[str]) -> str:
+        """Derive a short error type (e.g. "AttributeError") from an error message."""
+        if not error_message:
+            return "UnknownError"
+        match = ERROR_TYPE_PATTERN.search(error_message)
+        if match:
+            return match.group(1)
+        if "timed out" in error_message.lower() or "timeout" in error_message.lower():
+            return "Timeout"
+        return "ProcessingError"
+    
+    def _failure_entry(self, error_data: Dict[str, Any], error_key: str) -> Dict[str, Any]:
+        """
+        Failure-index entry for one error record. Long error messages are cut
+        to FAILURE_INDEX_MESSAGE_LENGTH characters and flagged, so the index
+        stays small; get_failed_scripts loads the full message from error_file.
+        """
+        error_message = error_data.get("error_message") or ""
+        return {
+            "project_name": error_data.get("project_name"),
+            "version": error_data.get("version"),
+            "retry_count": error_data.get("retry_count", 0),
+            "error_type": self._classify_error(error_message),
+            "error_message": error_message[:FAILURE_INDEX_MESSAGE_LENGTH],
+            "error_message_truncated": len(error_message) > FAILURE_INDEX_MESSAGE_LENGTH,
+            "failed_at": error_data.get("failed_at"),
+            "error_file": error_key
+        }
+    
+    async def _load_full_error_messages(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Replace truncated index messages with the full message from each
+        entry's error record, with a bounded number of concurrent GETs.
+        Entries written before the truncation flag existed are checked by length.
+        """
+        semaphore = asyncio.Semaphore(settings.s3_metadata_concurrency)
+        
+        async def _load(entry: Dict[str, Any]) -> Dict[str, Any]:
+            truncated = entry.get("error_message_truncated")
+            if truncated is None:
+                truncated = len(entry.get("error_message") or "") >= FAILURE_INDEX_MESSAGE_LENGTH
+            if not truncated:
+                return entry
+            
+            async with semaphore:
+                try:
+                    error_data = json.loads((await self._get_object_body(entry["error_file"])).decode('utf-8'))
+                    return {**entry, "error_message": error_data.get("error_message"), "error_message_truncated": False}
+                except Exception as e:
+                    logger.error(f"❌ Error reading error file {entry['error_file']}: {e}")
+                    return entry
+        
+        return await asyncio.gather(*[_load(entry) for entry in entries])
+    
+    async def _scan_error_records(self, prefix: str = "errors/",
+                                  max_concurrency: Optional[int] = None,
+                                  full_messages: bool = False) -> List[Dict[str, Any]]:
+        """
+        Read every error record under a prefix with a bounded number of
+        concurrent GETs. Unreadable records are logged and skipped.
+        
+        Returns:
+            List of failure entries, with complete error messages if
+            full_messages is set (otherwise truncated as in the index)
+        """
+        keys = [obj['Key'] async for obj in self.iter_objects(prefix) if obj['Key'].endswith('_error.json')]
+        semaphore = asyncio.Semaphore(max_concurrency or settings.s3_metadata_concurrency)
+        
+        async def _read(key: str) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                try:
+                    error_data = json.loads((await self._get_object_body(key)).decode('utf-8'))
+                    entry = self._failure_entry(error_data, key)
+                    if full_messages:
+                        entry.update(error_message=error_data.get("error_message"), error_message_truncated=False)
+                    return entry
+                except Exception as e:
+                    logger.error(f"❌ Error reading error file {key}: {e}")
+                    return None
+        
+        results = await asyncio.gather(*[_read(key) for key in keys])
+        return [entry for entry in results if entry is not None]
+    
+    async def _build_failure_index(self) -> Dict[str, Any]:
+        """Reconstruct the failure index from every record under errors/."""
+        self.performance_metrics["failure_index_rebuilds"] += 1
+        entries = await self._scan_error_records()
+        
+        logger.info(f"🔨 Rebuilt failure index ({len(entries)} failures)")
+        return {
+            "index_version": 1,
+            "failures": {f"{entry['project_name']}/v{entry['version']}": entry for entry in entries}
+        }
+    
+    async def update_failure_index(self, mutate: Callable[[Dict[str, Any]], None],
+                                   max_attempts: int = 5) -> bool:
+        """
+        Apply a change to the bucket-wide failure index with optimistic concurrency.
+        
+        Works like `update_manifest`: read, mutate, conditional write, retry on
+        conflict. A missing index is rebuilt from errors/ first.
+        
+        Returns:
+            True if the change was stored, False otherwise. Failures are logged
+            and never raised: readers fall back to scanning errors/.
+        """
+        if not self.s3_client or not self.aws_bucket_name:
+            return False
+        
+        try:
+            async with self._failure_index_lock:
+                for _ in range(max_attempts):
+                    index, etag = await self._read_json_object(FAILURE_INDEX_KEY)
+                    if index is None:
+                        index = await self._build_failure_index()
+                    
+                    mutate(index)
+                    if await self._write_json_object(FAILURE_INDEX_KEY, index, etag):
+                        return True
+                    
+                    logger.info("🔁 Failure index changed concurrently, retrying")
+            
+            logger.warning(f"⚠️ Gave up updating failure index after {max_attempts} attempts")
+            return False
+        
+        except Exception as e:
+            logger.error(f"❌ Error updating failure index: {e}")
+            return False
+    
+    async def get_failure_index(self) -> Optional[Dict[str, Any]]:
+        """
+        Get the rolled-up index of every failed script in one GET.
+        
+        A missing index is rebuilt from errors/ and stored.
+        
+        Returns:
+            Index dictionary keyed by "{project}/v{version}", or None on error
+        """
+        if not self.s3_client or not self.aws_bucket_name:
+            logger.warning("S3 not configured")
+            return None
+        
+        try:
+            self.performance_metrics["failure_index_reads"] += 1
+            index, _ = await self._read_json_object(FAILURE_INDEX_KEY)
+            if index is None:
+                index = await self._build_failure_index()
+                await self._write_json_object(FAILURE_INDEX_KEY, index, None)
+            return index
+        
+        except Exception as e:
+            logger.error(f"❌ Error getting failure index: {e}")
+            return None
+    
     async def get_failed_scripts(self, project_name: str = None) -> List[Dict[str, Any]]:
         """
         Get list of failed scripts, optionally filtered by project.
         
+        Served from the failure index; only entries whose message was
+        truncated there have their error record fetched for the full message.
+        If the index cannot be read, the error records are fetched
+        concurrently instead.
+        
         Args:
             project_name: Optional project name filter
             
@@ -1348,42 +2804,23 @@ except Exception as e:
                 logger.error("❌ S3 client not initialized")
                 return []
             
-            # List error files
-            prefix = f"errors/{project_name}/" if project_name else "errors/"
-            
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.aws_bucket_name,
-                Prefix=prefix
-            )
+            index = await self.get_failure_index()
+            if index is not None:
+                entries = await self._load_full_error_messages([
+                    entry for entry in index["failures"].values()
+                    if not project_name or entry["project_name"] == project_name
+                ])
+            else:
+                prefix = f"errors/{project_name}/" if project_name else "errors/"
+                entries = await self._scan_error_records(prefix, full_messages=True)
             
-            failed_scripts = []
-            
-            if 'Contents' in response:
-                for obj in response['Contents']:
-                    if obj['Key'].endswith('_error.json'):
-                        try:
-                            # Get error details
-                            error_response = self.s3_client.get_object(
-                                Bucket=self.aws_bucket_name,
-                                Key=obj['Key']
-                            )
-                            error_data = json.loads(error_response['Body'].read().decode('utf-8'))
-                            
-                            failed_scripts.append({
-                                "project_name": error_data.get("project_name"),
-                                "version": error_data.get("version"),
-                                "error_message": error_data.get("error_message"),
-                                "retry_count": error_data.get("retry_count", 0),
-                                "failed_at": error_data.get("failed_at"),
-                                "can_retry": error_data.get("retry_count", 0) < 3,
-                                "error_file": obj['Key']
-                            })
-                            
-                        except Exception as e:
-                            logger.error(f"❌ Error reading error file {obj['Key']}: {e}")
-                            continue
-            
-            return failed_scripts
+            return [
+                {
+                    **entry,
+                    "can_retry": entry["retry_count"] < 3
+                }
+                for entry in sorted(entries, key=lambda entry: entry.get("failed_at") or "", reverse=True)
+            ]
             
         except Exception as e:
             logger.error(f"❌ Error getting failed scripts: {e}")
@@ -1409,11 +2846,7 @@ except Exception as e:
             error_key = f"errors/{project_name}/{project_name}_v{version}_error.json"
             
             try:
-                error_response = self.s3_client.get_object(
-                    Bucket=self.aws_bucket_name,
-                    Key=error_key
-                )
-                error_data = json.loads(error_response['Body'].read().decode('utf-8'))
+                error_data = json.loads((await self._get_object_body(error_key)).decode('utf-8'))
                 
                 # Check retry limit
                 retry_count = error_data.get("retry_count", 0)
@@ -1430,7 +2863,8 @@ except Exception as e:
             # Remove processed marker
             processed_key = f"processed/{project_name}/{project_name}_v{version}.py.done"
             try:
-                self.s3_client.delete_object(
+                await self._s3_call(
+                    'delete_object',
                     Bucket=self.aws_bucket_name,
                     Key=processed_key
                 )
@@ -1442,12 +2876,34 @@ except Exception as e:
             error_data["retry_count"] = retry_count + 1
             error_data["retry_attempted_at"] = datetime.now(timezone.utc).isoformat()
             
-            self.s3_client.put_object(
+            await self._s3_call(
+                'put_object',
                 Bucket=self.aws_bucket_name,
                 Key=error_key,
                 Body=json.dumps(error_data, indent=2),
                 ContentType='application/json'
             )
+            self._invalidate_project_cache(project_name)
+            
+            def _record_retry(manifest: Dict[str, Any]) -> None:
+                entry = self._manifest_version(manifest, version)
+                entry["status"] = "pending"
+                entry["processed_at"] = None
+                entry["error"] = {
+                    "error_file": error_key,
+                    "error_message": error_data.get("error_message"),
+                    "retry_count": retry_count + 1,
+                    "failed_at": error_data.get("failed_at")
+                }
+            
+            await self.update_manifest(project_name, _record_retry)
+            await self._request_worker_rescan(project_name)
+            await self._enqueue_script_job(project_name, version, "retry")
+            
+            failure = self._failure_entry(error_data, error_key)
+            await self.update_failure_index(
+                lambda index: index["failures"].__setitem__(f"{project_name}/v{version}", failure)
+            )
             
             logger.info(f"🔄 Initiated retry for {project_name} v{version} (attempt {retry_count + 1})")
             
@@ -1463,12 +2919,35 @@ except Exception as e:
             logger.error(f"❌ Error retrying failed script: {e}")
             return {"success": False, "error": str(e)}
 
+    async def check_connectivity(self) -> Dict[str, Any]:
+        """Test bucket access and object listing without blocking the event loop."""
+        connectivity = {
+            "can_connect": False,
+            "can_list_objects": False,
+            "error": None
+        }
+        
+        try:
+            if self.s3_client and self.aws_bucket_name:
+                await self._s3_call('head_bucket', Bucket=self.aws_bucket_name)
+                connectivity["can_connect"] = True
+                
+                await self._s3_call('list_objects_v2', Bucket=self.aws_bucket_name, MaxKeys=1)
+                connectivity["can_list_objects"] = True
+        except Exception as e:
+            connectivity["error"] = str(e)
+        
+        return connectivity
+    
     def get_performance_metrics(self) -> Dict[str, Any]:
         """Get performance metrics for monitoring."""
         return {
             "s3_operations": self.performance_metrics,
+            "cache": self._cache.get_stats(),
+            "presign_cache": self._presign_cache.get_stats(),
             "bucket_name": self.aws_bucket_name,
             "region": self.aws_region,
+            "storage_backend": settings.storage_backend,
             "configured": self.s3_client is not None
         }
 
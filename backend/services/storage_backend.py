@@ -0,0 +1,566 @@
+"""
+Pluggable object storage backends.
+S3Service and the FreeCAD worker talk to storage through the subset of the
+boto3 S3 client API defined by StorageBackend, so the same code runs against
+S3 or against a local directory (offline load tests, single-node deployments).
+
+This module only depends on botocore, so the standalone worker can import it.
+"""
+import hashlib
+import hmac
+import json
+import mmap
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+from botocore.exceptions import ClientError
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within the process
+    fcntl = None
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class StorageBackend(ABC):
+    """
+    Object storage operations used by the application, named and shaped like
+    the boto3 S3 client methods (same keyword arguments, response dicts and
+    ClientError codes), so callers can switch backends without changes.
+    """
+    
+    @abstractmethod
+    def list_objects_v2(self, **kwargs) -> Dict[str, Any]:
+        """List keys under Prefix, paginated with MaxKeys/ContinuationToken/StartAfter."""
+    
+    @abstractmethod
+    def get_object(self, **kwargs) -> Dict[str, Any]:
+        """Get an object; supports Range and IfNoneMatch."""
+    
+    @abstractmethod
+    def put_object(self, **kwargs) -> Dict[str, Any]:
+        """Write an object; supports IfMatch and IfNoneMatch="*" conditional writes."""
+    
+    @abstractmethod
+    def head_object(self, **kwargs) -> Dict[str, Any]:
+        """Get an object's size, ETag, content headers and user metadata."""
+    
+    @abstractmethod
+    def delete_object(self, **kwargs) -> Dict[str, Any]:
+        """Delete one object (deleting a missing key succeeds)."""
+    
+    @abstractmethod
+    def delete_objects(self, **kwargs) -> Dict[str, Any]:
+        """Delete a batch of objects."""
+    
+    @abstractmethod
+    def copy_object(self, **kwargs) -> Dict[str, Any]:
+        """Copy an object within storage."""
+    
+    @abstractmethod
+    def head_bucket(self, **kwargs) -> Dict[str, Any]:
+        """Check that the bucket is reachable."""
+    
+    @abstractmethod
+    def generate_presigned_url(self, ClientMethod: str, Params: Dict[str, Any],
+                               ExpiresIn: int = 3600) -> str:
+        """Create a time-limited URL for an operation (only get_object is required)."""
+    
+    @abstractmethod
+    def download_file(self, Bucket: str, Key: str, Filename: str) -> None:
+        """Download an object to a local file."""
+    
+    @abstractmethod
+    def upload_file(self, Filename: str, Bucket: str, Key: str,
+                    ExtraArgs: Optional[Dict[str, Any]] = None) -> None:
+        """Upload a local file as an object."""
+
+
+class S3StorageBackend(StorageBackend):
+    """StorageBackend over a boto3 S3 client."""
+    
+    def __init__(self, client):
+        self.client = client
+    
+    def list_objects_v2(self, **kwargs) -> Dict[str, Any]:
+        return self.client.list_objects_v2(**kwargs)
+    
+    def get_object(self, **kwargs) -> Dict[str, Any]:
+        return self.client.get_object(**kwargs)
+    
+    def put_object(self, **kwargs) -> Dict[str, Any]:
+        return self.client.put_object(**kwargs)
+    
+    def head_object(self, **kwargs) -> Dict[str, Any]:
+        return self.client.head_object(**kwargs)
+    
+    def delete_object(self, **kwargs) -> Dict[str, Any]:
+        return self.client.delete_object(**kwargs)
+    
+    def delete_objects(self, **kwargs) -> Dict[str, Any]:
+        return self.client.delete_objects(**kwargs)
+    
+    def copy_object(self, **kwargs) -> Dict[str, Any]:
+        return self.client.copy_object(**kwargs)
+    
+    def head_bucket(self, **kwargs) -> Dict[str, Any]:
+        return self.client.head_bucket(**kwargs)
+    
+    def generate_presigned_url(self, ClientMethod: str, Params: Dict[str, Any],
+                               ExpiresIn: int = 3600) -> str:
+        return self.client.generate_presigned_url(ClientMethod, Params=Params, ExpiresIn=ExpiresIn)
+    
+    def download_file(self, Bucket: str, Key: str, Filename: str) -> None:
+        self.client.download_file(Bucket, Key, Filename)
+    
+    def upload_file(self, Filename: str, Bucket: str, Key: str,
+                    ExtraArgs: Optional[Dict[str, Any]] = None) -> None:
+        self.client.upload_file(Filename, Bucket, Key, ExtraArgs=ExtraArgs)
+
+
+class _MappedBody:
+    """
+    Streaming body over a memory-mapped file, compatible with the parts of
+    botocore's StreamingBody the application uses (read, iter_chunks, close).
+    
+    The mapping pins the file that was current when the GET started, so an
+    object replaced mid-read is still read consistently.
+    """
+    
+    def __init__(self, path: Path, start: int = 0, end: Optional[int] = None):
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._position = start
+        self._end = size if end is None else min(end, size)
+    
+    def read(self, amt: Optional[int] = None) -> bytes:
+        if self._map is None or self._position >= self._end:
+            return b""
+        stop = self._end if amt is None else min(self._end, self._position + amt)
+        data = self._map[self._position:stop]
+        self._position = stop
+        return data
+    
+    def iter_chunks(self, chunk_size: int = 1024) -> Iterator[bytes]:
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+class LocalStorageBackend(StorageBackend):
+    """
+    StorageBackend over a local directory.
+    
+    Layout under `root`:
+        <bucket>/<key>            object data
+        .meta/<bucket>/<sha1>     JSON sidecar (ETag, content headers, metadata)
+        .tmp/                     staging area for atomic writes
+    
+    Writes are staged in .tmp and moved into place with os.replace, so readers
+    never see a partial object. Writers take a process lock plus an flock on
+    `.lock` so conditional writes (IfMatch/IfNoneMatch) are compare-and-swap
+    across the API and worker processes. Keys ending in "/" are not supported.
+    
+    Presigned URLs point at `url_base` (the API's storage route) and carry an
+    HMAC-SHA256 signature made with `signing_key`; without a `url_base` they are
+    plain file:// URLs.
+    """
+    
+    def __init__(self, root: str, url_base: Optional[str] = None, signing_key: Optional[str] = None):
+        self.root = Path(root).resolve()
+        self.url_base = url_base.rstrip('/') if url_base else None
+        self._signing_key = (signing_key or "").encode('utf-8')
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        (self.root / ".tmp").mkdir(parents=True, exist_ok=True)
+    
+    # ------------------------------------------------------------------
+    # Paths, errors and locking
+    # ------------------------------------------------------------------
+    
+    @staticmethod
+    def _error(code: str, message: str, operation: str, status: int) -> ClientError:
+        return ClientError(
+            {"Error": {"Code": code, "Message": message}, "ResponseMetadata": {"HTTPStatusCode": status}},
+            operation
+        )
+    
+    def _bucket_path(self, bucket: str) -> Path:
+        if not bucket or bucket.startswith('.') or '/' in bucket or '\\' in bucket:
+            raise self._error("InvalidBucketName", f"Invalid bucket name: {bucket!r}", "Bucket", 400)
+        return self.root / bucket
+    
+    def _object_path(self, bucket: str, key: str, operation: str) -> Path:
+        parts = key.split('/') if key else []
+        if not parts or any(part in ('', '.', '..') for part in parts) or '\\' in key:
+            raise self._error("InvalidArgument", f"Unsupported key for local storage: {key!r}", operation, 400)
+        return self._bucket_path(bucket).joinpath(*parts)
+    
+    def _meta_path(self, bucket: str, key: str) -> Path:
+        return self.root / ".meta" / bucket / hashlib.sha1(key.encode('utf-8')).hexdigest()
+    
+    @contextmanager
+    def _write_lock(self):
+        """Serialize writers within the process (RLock) and across processes (flock)."""
+        with self._lock:
+            self._lock_depth += 1
+            handle = None
+            try:
+                if fcntl and self._lock_depth == 1:
+                    handle = open(self.root / ".lock", "a")
+                    fcntl.flock(handle, fcntl.LOCK_EX)
+                yield
+            finally:
+                if handle:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+                    handle.close()
+                self._lock_depth -= 1
+    
+    def _atomic_write(self, path: Path, data: bytes = None, source: Optional[Path] = None) -> None:
+        """Stage the content in .tmp and rename it over `path`."""
+        staged = self.root / ".tmp" / uuid.uuid4().hex
+        try:
+            if source is not None:
+                shutil.copyfile(source, staged)
+            else:
+                with open(staged, "wb") as f:
+                    f.write(data)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(staged, path)
+        finally:
+            if staged.exists():
+                staged.unlink()
+    
+    def _read_meta(self, bucket: str, key: str, path: Optional[Path] = None) -> Dict[str, Any]:
+        try:
+            with open(self._meta_path(bucket, key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            pass
+        
+        # Files placed in the tree by hand have no sidecar; derive the ETag
+        if path is None or not path.is_file():
+            return {}
+        digest = hashlib.md5()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return {"ETag": f'"{digest.hexdigest()}"'}
+    
+    def _stat(self, bucket: str, key: str, operation: str, missing_code: str = "NoSuchKey") -> Tuple[Path, os.stat_result, Dict[str, Any]]:
+        path = self._object_path(bucket, key, operation)
+        try:
+            stat = path.stat()
+        except (FileNotFoundError, NotADirectoryError):
+            stat = None
+        if stat is None or not path.is_file():
+            raise self._error(missing_code, "The specified key does not exist.", operation, 404)
+        return path, stat, self._read_meta(bucket, key, path)
+    
+    @staticmethod
+    def _last_modified(stat: os.stat_result) -> datetime:
+        return datetime.fromtimestamp(int(stat.st_mtime), tz=timezone.utc)
+    
+    def _store(self, bucket: str, key: str, path: Path, meta: Dict[str, Any],
+               data: bytes = None, source: Optional[Path] = None) -> None:
+        """Write sidecar and data; callers hold the write lock."""
+        meta_path = self._meta_path(bucket, key)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        self._atomic_write(meta_path, json.dumps(meta).encode('utf-8'))
+        self._atomic_write(path, data, source)
+    
+    def _check_conditions(self, bucket: str, key: str, path: Path, operation: str,
+                          if_match: Optional[str], if_none_match: Optional[str]) -> None:
+        exists = path.is_file()
+        if if_none_match == "*" and exists:
+            raise self._error("PreconditionFailed", "At least one of the pre-conditions you specified did not hold", operation, 412)
+        if if_match is not None:
+            if not exists:
+                raise self._error("NoSuchKey", "The specified key does not exist.", operation, 404)
+            if self._read_meta(bucket, key, path).get("ETag") != if_match:
+                raise self._error("PreconditionFailed", "At least one of the pre-conditions you specified did not hold", operation, 412)
+    
+    def _remove(self, bucket: str, key: str, operation: str) -> None:
+        """Delete data and sidecar, then prune emptied directories; callers hold the write lock."""
+        path = self._object_path(bucket, key, operation)
+        for target in (path, self._meta_path(bucket, key)):
+            try:
+                target.unlink()
+            except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+                pass
+        
+        bucket_path = self._bucket_path(bucket)
+        parent = path.parent
+        while parent != bucket_path and bucket_path in parent.parents:
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+            parent = parent.parent
+    
+    # ------------------------------------------------------------------
+    # Listing
+    # ------------------------------------------------------------------
+    
+    def _walk(self, directory: Path, rel: str, prefix: str, start_after: str,
+              delimiter: Optional[str]) -> Iterator[Tuple[str, str, Optional[Path]]]:
+        """
+        Yield ("key", key, path) and, with a "/" delimiter, ("prefix", prefix, None)
+        in S3 (lexicographic key) order, skipping subtrees outside `prefix` or
+        entirely at or before `start_after`.
+        """
+        try:
+            entries = [(entry.name + '/' if entry.is_dir() else entry.name, entry) for entry in os.scandir(directory)]
+        except (FileNotFoundError, NotADirectoryError):
+            return
+        entries.sort(key=lambda item: item[0])
+        
+        for name, entry in entries:
+            key = rel + name
+            if name.endswith('/'):
+                if not (key.startswith(prefix) or prefix.startswith(key)):
+                    continue
+                if start_after and key < start_after and not start_after.startswith(key):
+                    continue
+                if delimiter == '/' and key.startswith(prefix) and '/' not in key[len(prefix):-1]:
+                    if key > start_after and any(os.scandir(entry.path)):
+                        yield ("prefix", key, None)
+                    continue
+                yield from self._walk(Path(entry.path), key, prefix, start_after, delimiter)
+            elif key.startswith(prefix) and key > start_after:
+                yield ("key", key, Path(entry.path))
+    
+    def list_objects_v2(self, Bucket: str, Prefix: str = "", Delimiter: Optional[str] = None,
+                        MaxKeys: int = 1000, ContinuationToken: Optional[str] = None,
+                        StartAfter: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        bucket_path = self._bucket_path(Bucket)
+        start_after = ContinuationToken or StartAfter or ""
+        base, _, _ = Prefix.rpartition('/')
+        base_rel = base + '/' if base else ''
+        directory = bucket_path.joinpath(*base.split('/')) if base else bucket_path
+        
+        contents: List[Dict[str, Any]] = []
+        common_prefixes: List[Dict[str, str]] = []
+        last_item = None
+        truncated = False
+        
+        for kind, item, path in self._walk(directory, base_rel, Prefix, start_after, Delimiter):
+            if kind == "key" and Delimiter and Delimiter != '/':
+                index = item.find(Delimiter, len(Prefix))
+                if index != -1:
+                    kind, item = "prefix", item[:index + len(Delimiter)]
+                    if item == last_item or (start_after.endswith(Delimiter) and item <= start_after):
+                        continue
+            
+            if len(contents) + len(common_prefixes) >= MaxKeys:
+                truncated = True
+                break
+            
+            if kind == "prefix":
+                common_prefixes.append({"Prefix": item})
+            else:
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                contents.append({
+                    "Key": item,
+                    "LastModified": self._last_modified(stat),
+                    "ETag": self._read_meta(Bucket, item, path).get("ETag", ""),
+                    "Size": stat.st_size,
+                    "StorageClass": "STANDARD"
+                })
+            last_item = item
+        
+        response = {
+            "IsTruncated": truncated,
+            "Name": Bucket,
+            "Prefix": Prefix,
+            "MaxKeys": MaxKeys,
+            "KeyCount": len(contents) + len(common_prefixes)
+        }
+        if contents:
+            response["Contents"] = contents
+        if common_prefixes:
+            response["CommonPrefixes"] = common_prefixes
+        if Delimiter:
+            response["Delimiter"] = Delimiter
+        if truncated:
+            response["NextContinuationToken"] = last_item
+        return response
+    
+    # ------------------------------------------------------------------
+    # Objects
+    # ------------------------------------------------------------------
+    
+    def head_object(self, Bucket: str, Key: str, **kwargs) -> Dict[str, Any]:
+        _, stat, meta = self._stat(Bucket, Key, "HeadObject", missing_code="404")
+        response = {
+            "ContentLength": stat.st_size,
+            "ContentType": meta.get("ContentType", "binary/octet-stream"),
+            "ETag": meta.get("ETag", ""),
+            "LastModified": self._last_modified(stat),
+            "Metadata": dict(meta.get("Metadata", {}))
+        }
+        if meta.get("ContentEncoding"):
+            response["ContentEncoding"] = meta["ContentEncoding"]
+        return response
+    
+    def get_object(self, Bucket: str, Key: str, Range: Optional[str] = None,
+                   IfNoneMatch: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        path, stat, meta = self._stat(Bucket, Key, "GetObject")
+        etag = meta.get("ETag", "")
+        
+        if IfNoneMatch and (IfNoneMatch.strip() == "*" or etag in [tag.strip() for tag in IfNoneMatch.split(',')]):
+            raise self._error("304", "Not Modified", "GetObject", 304)
+        
+        size = stat.st_size
+        start, end = 0, size
+        content_range = None
+        match = RANGE_PATTERN.match(Range.strip()) if Range else None
+        if match and (match.group(1) or match.group(2)):
+            first, last = match.group(1), match.group(2)
+            if first:
+                start = int(first)
+                end = min(size, int(last) + 1) if last else size
+            else:
+                start = max(0, size - int(last))
+            if start >= size or start >= end:
+                raise self._error("InvalidRange", "The requested range is not satisfiable", "GetObject", 416)
+            content_range = f"bytes {start}-{end - 1}/{size}"
+        
+        response = self.head_object(Bucket=Bucket, Key=Key)
+        response.update({
+            "Body": _MappedBody(path, start, end),
+            "ContentLength": end - start,
+            "AcceptRanges": "bytes"
+        })
+        if content_range:
+            response["ContentRange"] = content_range
+        return response
+    
+    def put_object(self, Bucket: str, Key: str, Body: Any = b"", ContentType: Optional[str] = None,
+                   ContentEncoding: Optional[str] = None, Metadata: Optional[Dict[str, str]] = None,
+                   IfMatch: Optional[str] = None, IfNoneMatch: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        if isinstance(Body, str):
+            data = Body.encode('utf-8')
+        elif hasattr(Body, "read"):
+            data = Body.read()
+        else:
+            data = bytes(Body)
+        
+        path = self._object_path(Bucket, Key, "PutObject")
+        meta = {
+            "ETag": f'"{hashlib.md5(data).hexdigest()}"',
+            "ContentType": ContentType or "binary/octet-stream",
+            "ContentEncoding": ContentEncoding,
+            "Metadata": {name.lower(): str(value) for name, value in (Metadata or {}).items()}
+        }
+        
+        with self._write_lock():
+            self._check_conditions(Bucket, Key, path, "PutObject", IfMatch, IfNoneMatch)
+            self._store(Bucket, Key, path, meta, data=data)
+        
+        return {"ETag": meta["ETag"]}
+    
+    def copy_object(self, Bucket: str, Key: str, CopySource: Any, MetadataDirective: str = "COPY",
+                    Metadata: Optional[Dict[str, str]] = None, ContentType: Optional[str] = None,
+                    **kwargs) -> Dict[str, Any]:
+        if isinstance(CopySource, str):
+            source_bucket, _, source_key = CopySource.lstrip('/').partition('/')
+        else:
+            source_bucket, source_key = CopySource["Bucket"], CopySource["Key"]
+        
+        path = self._object_path(Bucket, Key, "CopyObject")
+        with self._write_lock():
+            source_path, _, meta = self._stat(source_bucket, source_key, "CopyObject")
+            meta = dict(meta)
+            if MetadataDirective == "REPLACE":
+                meta["Metadata"] = {name.lower(): str(value) for name, value in (Metadata or {}).items()}
+                meta["ContentType"] = ContentType or "binary/octet-stream"
+            self._store(Bucket, Key, path, meta, source=source_path)
+            stat = path.stat()
+        
+        return {"CopyObjectResult": {"ETag": meta.get("ETag", ""), "LastModified": self._last_modified(stat)}}
+    
+    def delete_object(self, Bucket: str, Key: str, **kwargs) -> Dict[str, Any]:
+        with self._write_lock():
+            self._remove(Bucket, Key, "DeleteObject")
+        return {}
+    
+    def delete_objects(self, Bucket: str, Delete: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        deleted, errors = [], []
+        with self._write_lock():
+            for obj in Delete.get("Objects", []):
+                try:
+                    self._remove(Bucket, obj["Key"], "DeleteObjects")
+                    deleted.append({"Key": obj["Key"]})
+                except ClientError as e:
+                    errors.append({"Key": obj["Key"], "Code": e.response["Error"]["Code"],
+                                   "Message": e.response["Error"]["Message"]})
+        
+        response: Dict[str, Any] = {"Errors": errors} if errors else {}
+        if not Delete.get("Quiet"):
+            response["Deleted"] = deleted
+        return response
+    
+    def head_bucket(self, Bucket: str, **kwargs) -> Dict[str, Any]:
+        self._bucket_path(Bucket).mkdir(parents=True, exist_ok=True)
+        return {}
+    
+    def download_file(self, Bucket: str, Key: str, Filename: str) -> None:
+        source_path, _, _ = self._stat(Bucket, Key, "GetObject", missing_code="404")
+        shutil.copyfile(source_path, Filename)
+    
+    def upload_file(self, Filename: str, Bucket: str, Key: str,
+                    ExtraArgs: Optional[Dict[str, Any]] = None) -> None:
+        with open(Filename, "rb") as f:
+            self.put_object(Bucket=Bucket, Key=Key, Body=f, **(ExtraArgs or {}))
+    
+    # ------------------------------------------------------------------
+    # Presigned URLs
+    # ------------------------------------------------------------------
+    
+    def _signature(self, bucket: str, key: str, expires: int) -> str:
+        return hmac.new(self._signing_key, f"{bucket}/{key}:{expires}".encode('utf-8'), hashlib.sha256).hexdigest()
+    
+    def generate_presigned_url(self, ClientMethod: str, Params: Dict[str, Any],
+                               ExpiresIn: int = 3600) -> str:
+        if ClientMethod != "get_object":
+            raise ValueError(f"Local storage cannot presign {ClientMethod}")
+        
+        bucket, key = Params["Bucket"], Params["Key"]
+        if not self.url_base:
+            return self._object_path(bucket, key, "GetObject").as_uri()
+        
+        expires = int(time.time()) + int(ExpiresIn)
+        return (
+            f"{self.url_base}/{quote(bucket, safe='')}/{quote(key)}"
+            f"?expires={expires}&signature={self._signature(bucket, key, expires)}"
+        )
+    
+    def verify_presigned_url(self, bucket: str, key: str, expires: int, signature: str) -> bool:
+        """Check a URL made by generate_presigned_url: valid signature and not expired."""
+        if not self._signing_key or expires < time.time():
+            return False
+        return hmac.compare_digest(self._signature(bucket, key, expires), signature)
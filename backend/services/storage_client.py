@@ -0,0 +1,143 @@
+"""
+Shared boto3 S3 client factory, storage backend and job queue selection.
+Every subsystem gets the same client (per credential set), so concurrent S3
+traffic shares one tuned connection pool and reuses warm TLS connections.
+"""
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+import boto3
+from botocore.config import Config
+
+from config.settings import settings
+from services.job_queue import JobQueue, SQSJobQueue, create_job_queue
+from services.storage_backend import StorageBackend, S3StorageBackend, LocalStorageBackend
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_session: Optional[boto3.session.Session] = None
+_clients: Dict[Tuple[str, str, str], "boto3.client"] = {}
+
+
+def build_client_config() -> Config:
+    """botocore Config with the pool size, keep-alive, retry and timeout settings."""
+    return Config(
+        max_pool_connections=settings.s3_max_pool_connections,
+        connect_timeout=settings.s3_connect_timeout_seconds,
+        read_timeout=settings.s3_read_timeout_seconds,
+        tcp_keepalive=True,
+        retries={
+            "max_attempts": settings.s3_max_attempts,
+            "mode": "adaptive"
+        }
+    )
+
+
+def get_s3_client(aws_access_key_id: Optional[str] = None,
+                  aws_secret_access_key: Optional[str] = None,
+                  region_name: Optional[str] = None):
+    """
+    Get the shared S3 client for a set of credentials (defaults to settings).
+    
+    Clients are thread-safe and created once per credential set; the
+    underlying session is not, so creation happens under a lock.
+    """
+    global _session
+    
+    cache_key = (
+        aws_access_key_id or settings.aws_access_key_id,
+        aws_secret_access_key or settings.aws_secret_access_key,
+        region_name or settings.aws_region
+    )
+    
+    client = _clients.get(cache_key)
+    if client is not None:
+        return client
+    
+    with _lock:
+        client = _clients.get(cache_key)
+        if client is None:
+            if _session is None:
+                _session = boto3.session.Session()
+            client = _session.client(
+                "s3",
+                aws_access_key_id=cache_key[0] or None,
+                aws_secret_access_key=cache_key[1] or None,
+                region_name=cache_key[2],
+                config=build_client_config()
+            )
+            _clients[cache_key] = client
+            logger.info(
+                f"✅ Created shared S3 client for {cache_key[2]} "
+                f"(pool={settings.s3_max_pool_connections}, retries=adaptive)"
+            )
+    
+    return client
+
+
+def reset_s3_clients() -> None:
+    """Drop cached clients, e.g. after credentials were rotated."""
+    global _session
+    
+    with _lock:
+        _clients.clear()
+        _session = None
+
+
+def local_storage_enabled() -> bool:
+    """Whether objects are kept on local disk instead of S3."""
+    return settings.storage_backend.lower() == "local"
+
+
+def get_storage_backend(aws_access_key_id: Optional[str] = None,
+                        aws_secret_access_key: Optional[str] = None,
+                        region_name: Optional[str] = None) -> StorageBackend:
+    """
+    Get the storage backend selected by settings.storage_backend.
+    
+    "s3" wraps the shared S3 client for the given credentials; "local" stores
+    objects under settings.local_storage_root and signs download URLs for the
+    API's /storage route.
+    """
+    if local_storage_enabled():
+        return LocalStorageBackend(
+            settings.local_storage_root,
+            url_base=settings.local_storage_url,
+            signing_key=settings.secret_key
+        )
+    
+    return S3StorageBackend(get_s3_client(aws_access_key_id, aws_secret_access_key, region_name))
+
+
+def get_job_queue() -> Optional[JobQueue]:
+    """
+    Get the script processing queue selected by settings.job_queue_backend,
+    or None when the worker is left to find new scripts by scanning S3.
+    """
+    backend = settings.job_queue_backend.lower()
+    if backend != "sqs":
+        return create_job_queue(
+            backend,
+            sqlite_path=settings.job_queue_sqlite_path,
+            visibility_timeout=settings.job_queue_visibility_timeout_seconds
+        )
+    
+    global _session
+    with _lock:
+        if _session is None:
+            _session = boto3.session.Session()
+        client = _session.client(
+            "sqs",
+            aws_access_key_id=settings.aws_access_key_id or None,
+            aws_secret_access_key=settings.aws_secret_access_key or None,
+            region_name=settings.aws_region,
+            config=build_client_config()
+        )
+    
+    return SQSJobQueue(
+        settings.job_queue_sqs_url,
+        client=client,
+        visibility_timeout=settings.job_queue_visibility_timeout_seconds
+    )
@@ -0,0 +1,30 @@
+"""
+Tests for the bucket-wide failure index.
+"""
+import asyncio
+
+from services.s3_service import s3_service, FAILURE_INDEX_MESSAGE_LENGTH
+from services.storage_backend import LocalStorageBackend
+
+
+def test_failed_scripts_report_full_messages_truncated_in_index(tmp_path, monkeypatch):
+    """Test that long messages are cut in the index but listed in full."""
+    monkeypatch.setattr(s3_service, "s3_client", LocalStorageBackend(str(tmp_path)))
+    monkeypatch.setattr(s3_service, "aws_bucket_name", "bucket")
+    long_message = "Traceback (most recent call last):\n" + "x" * (FAILURE_INDEX_MESSAGE_LENGTH * 2)
+    
+    async def scenario():
+        assert await s3_service.mark_script_failed("p1", 1, long_message)
+        assert await s3_service.mark_script_failed("p1", 2, "TypeError: short")
+        index = await s3_service.get_failure_index()
+        return index, await s3_service.get_failed_scripts("p1")
+    
+    index, failed = asyncio.run(scenario())
+    
+    entry = index["failures"]["p1/v1"]
+    assert len(entry["error_message"]) == FAILURE_INDEX_MESSAGE_LENGTH
+    assert entry["error_message_truncated"] is True
+    assert {script["version"]: script["error_message"] for script in failed} == {
+        1: long_message,
+        2: "TypeError: short"
+    }
@@ -0,0 +1,54 @@
+"""
+Tests for the SQLite script job queue.
+"""
+import sqlite3
+import time
+
+from services.job_queue import SQLiteJobQueue
+
+
+def test_sqlite_queue_delivers_in_order_and_acks(tmp_path):
+    """Test FIFO delivery, ack and an empty dequeue timing out."""
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.db"))
+    queue.enqueue({"key": "input/p/p_v1.py"})
+    queue.enqueue({"key": "input/p/p_v2.py"})
+    
+    first = queue.dequeue(timeout=1)
+    second = queue.dequeue(timeout=1)
+    assert [first.payload["key"], second.payload["key"]] == ["input/p/p_v1.py", "input/p/p_v2.py"]
+    
+    queue.ack(first)
+    queue.ack(second)
+    assert queue.dequeue(timeout=0.1) is None
+    assert queue.stats()["queued"] == 0
+
+
+def test_sqlite_queue_redelivers_expired_leases(tmp_path):
+    """Test that a job whose lease expires is delivered again, up to max_attempts."""
+    queue = SQLiteJobQueue(str(tmp_path / "jobs.db"), visibility_timeout=0.05, max_attempts=2)
+    queue.enqueue({"key": "input/p/p_v1.py"})
+    
+    job = queue.dequeue(timeout=1)
+    time.sleep(0.1)
+    retried = queue.dequeue(timeout=1)
+    assert retried.job_id == job.job_id
+    assert retried.attempts == 2
+    
+    time.sleep(0.1)
+    assert queue.dequeue(timeout=0.1) is None
+    assert queue.stats()["dead"] == 1
+
+
+def test_sqlite_queue_idle_dequeue_takes_no_write_lock(tmp_path):
+    """Test that polling an empty queue is not blocked by another writer."""
+    path = str(tmp_path / "jobs.db")
+    queue = SQLiteJobQueue(path)
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        started = time.monotonic()
+        assert queue.dequeue(timeout=0.3) is None
+        assert time.monotonic() - started < 1
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
@@ -0,0 +1,42 @@
+"""
+Tests for the single-pass worker log parser.
+"""
+from services.s3_service import s3_service
+
+
+def test_parse_log_content_classifies_lines_and_captures_traceback():
+    """Test rule order, collected errors and the captured stack trace."""
+    log_content = "\n".join([
+        "FreeCAD 0.21.2 starting",
+        "Warning: shape tolerance exceeds 1e-07",
+        "Exception: Recompute failed for Pad001",
+        "Traceback (most recent call last):",
+        '  File "project_v3.py", line 4, in <module>',
+        "AttributeError: module 'Part' has no attribute 'makeBox2'",
+        "",
+        "done"
+    ])
+
+    error_info = s3_service._parse_log_content(log_content)
+
+    assert error_info["error_type"] == "attribute_error"
+    assert error_info["runtime_errors"] == [
+        "Exception: Recompute failed for Pad001",
+        "AttributeError: module 'Part' has no attribute 'makeBox2'"
+    ]
+    assert error_info["stack_trace"] == "\n".join([
+        "Traceback (most recent call last):",
+        '  File "project_v3.py", line 4, in <module>',
+        "AttributeError: module 'Part' has no attribute 'makeBox2'"
+    ])
+
+
+def test_parse_log_content_handles_text_whose_lowercase_changes_length():
+    """Test the case-insensitive fallback used when lowercasing changes offsets."""
+    log_content = "İİİ preamble\nModuleNotFoundError: No module named 'cadquery'\nQtGui missing"
+
+    error_info = s3_service._parse_log_content(log_content)
+
+    assert error_info["error_type"] == "gui_error"
+    assert error_info["error_details"] == "QtGui missing"
+    assert error_info["missing_modules"] == ["cadquery", "importgui"]
@@ -0,0 +1,34 @@
+"""
+Tests for ranged log reads.
+"""
+import asyncio
+import gzip
+
+import pytest
+
+from services.s3_service import s3_service
+from services.storage_backend import LocalStorageBackend
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+def test_log_deleted_after_head_reads_as_missing(tmp_path, monkeypatch, compressed):
+    """Test that a log removed between the HEAD and the GET returns None."""
+    backend = LocalStorageBackend(str(tmp_path))
+    monkeypatch.setattr(s3_service, "s3_client", backend)
+    monkeypatch.setattr(s3_service, "aws_bucket_name", "bucket")
+    key = "logs/p/p_v1.log"
+    if compressed:
+        backend.put_object(Bucket="bucket", Key=key, Body=gzip.compress(b"line\n"), ContentEncoding="gzip")
+    else:
+        backend.put_object(Bucket="bucket", Key=key, Body=b"line\n")
+    
+    head_object = backend.head_object
+    
+    def _head_then_delete(**kwargs):
+        response = head_object(**kwargs)
+        backend.delete_object(Bucket="bucket", Key=key)
+        return response
+    
+    monkeypatch.setattr(backend, "head_object", _head_then_delete)
+    
+    assert asyncio.run(s3_service.read_log_range("p", "p_v1.log")) is None
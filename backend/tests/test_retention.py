@@ -0,0 +1,85 @@
+"""
+Tests for the storage retention planner.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+
+from services.project_service import project_service
+from services.retention_service import retention_service, RetentionPolicy
+from services.s3_service import s3_service
+from services.storage_backend import LocalStorageBackend
+
+DAY = 24 * 3600
+
+
+def _seed_project(tmp_path, monkeypatch, project_name):
+    """Six script versions, a manifest and three logs aged 30, 20 and 10 days."""
+    backend = LocalStorageBackend(str(tmp_path))
+    monkeypatch.setattr(s3_service, "s3_client", backend)
+    monkeypatch.setattr(s3_service, "aws_bucket_name", "bucket")
+    
+    for version in range(1, 7):
+        backend.put_object(Bucket="bucket", Key=f"input/{project_name}/{project_name}_v{version}.py", Body=b"x")
+    for age in (30, 20, 10):
+        key = f"logs/{project_name}/{project_name}_{age}.log"
+        backend.put_object(Bucket="bucket", Key=key, Body=b"log")
+        mtime = time.time() - age * DAY
+        os.utime(os.path.join(str(tmp_path), "bucket", key), (mtime, mtime))
+    
+    states = {1: ("failed", True), 2: ("processed", False), 3: ("processed", False),
+              4: ("failed", False), 5: ("pending", False), 6: ("pending", False)}
+    
+    def _set_states(manifest):
+        for version, (status, pinned) in states.items():
+            entry = s3_service._manifest_version(manifest, version)
+            entry.update(status=status, pinned=pinned)
+    
+    assert asyncio.run(s3_service.update_manifest(project_name, _set_states))
+
+
+def test_plan_keeps_last_completed_and_pinned_versions(tmp_path, monkeypatch):
+    """Test that only versions outside every keep rule expire."""
+    _seed_project(tmp_path, monkeypatch, "keep-rules")
+    policy = RetentionPolicy(keep_last_versions=2, keep_completed_versions=1, log_max_age_days=365)
+    
+    plan = asyncio.run(retention_service.plan_project("keep-rules", policy))
+    
+    # v6, v5: newest two; v3: newest processed; v1: pinned
+    assert plan["kept_versions"] == [6, 5, 3, 1]
+    assert plan["expired_versions"] == [4, 2]
+    assert sorted(plan["keys"]) == ["input/keep-rules/keep-rules_v2.py", "input/keep-rules/keep-rules_v4.py"]
+    assert plan["expired_logs"] == 0
+
+
+def test_plan_expires_logs_past_cutoff_but_keeps_newest(tmp_path, monkeypatch):
+    """Test the log age cutoff, and that the newest log survives it."""
+    _seed_project(tmp_path, monkeypatch, "log-cutoff")
+    now = datetime.now(timezone.utc)
+    
+    policy = RetentionPolicy(keep_last_versions=10, keep_completed_versions=0, log_max_age_days=25)
+    plan = asyncio.run(retention_service.plan_project("log-cutoff", policy, now))
+    assert plan["keys"] == ["logs/log-cutoff/log-cutoff_30.log"]
+    
+    policy = RetentionPolicy(keep_last_versions=10, keep_completed_versions=0, log_max_age_days=5)
+    plan = asyncio.run(retention_service.plan_project("log-cutoff", policy, now))
+    assert sorted(plan["keys"]) == ["logs/log-cutoff/log-cutoff_20.log", "logs/log-cutoff/log-cutoff_30.log"]
+
+
+def test_log_record_purge_is_scoped_to_the_project(monkeypatch):
+    """Test that a project's purge only matches that project's log records."""
+    queries = []
+    
+    class _Collection:
+        def count_documents(self, query):
+            queries.append(query)
+            return 0
+    
+    monkeypatch.setattr(project_service, "db", {"logs": _Collection()})
+    before = datetime.now(timezone.utc)
+    project_service.purge_log_records(before, dry_run=True, s3_project_name="a.b")
+    project_service.purge_log_records(before, dry_run=True)
+    
+    assert queries[0] == {"timestamp": {"$lt": before}, "s3_log_path": {"$regex": r"^s3://[^/]+/logs/a\.b/"}}
+    assert queries[1] == {"timestamp": {"$lt": before}}
@@ -0,0 +1,50 @@
+"""
+Tests for the local-filesystem storage backend.
+"""
+import pytest
+from botocore.exceptions import ClientError
+
+from services.storage_backend import LocalStorageBackend
+
+
+def test_local_backend_lists_in_key_order_across_pages(tmp_path):
+    """Test S3 key ordering, continuation tokens and "/" common prefixes."""
+    backend = LocalStorageBackend(str(tmp_path))
+    keys = ["a-c", "a/b", "a/c/d", "a0", "input/p1/p1_v1.py", "input/p10/p10_v1.py"]
+    for key in keys:
+        backend.put_object(Bucket="bucket", Key=key, Body=key)
+    
+    listed, token = [], None
+    while True:
+        params = {"Bucket": "bucket", "MaxKeys": 2}
+        if token:
+            params["ContinuationToken"] = token
+        response = backend.list_objects_v2(**params)
+        listed += [obj["Key"] for obj in response.get("Contents", [])]
+        if not response["IsTruncated"]:
+            break
+        token = response["NextContinuationToken"]
+    
+    assert listed == sorted(keys)
+    
+    response = backend.list_objects_v2(Bucket="bucket", Prefix="input/", Delimiter="/")
+    assert [prefix["Prefix"] for prefix in response["CommonPrefixes"]] == ["input/p1/", "input/p10/"]
+
+
+def test_local_backend_conditional_writes_and_ranges(tmp_path):
+    """Test IfMatch/IfNoneMatch compare-and-swap and ranged reads."""
+    backend = LocalStorageBackend(str(tmp_path))
+    etag = backend.put_object(Bucket="bucket", Key="manifest.json", Body=b"0123456789", IfNoneMatch="*")["ETag"]
+    
+    with pytest.raises(ClientError) as exc:
+        backend.put_object(Bucket="bucket", Key="manifest.json", Body=b"x", IfNoneMatch="*")
+    assert exc.value.response["Error"]["Code"] == "PreconditionFailed"
+    
+    response = backend.get_object(Bucket="bucket", Key="manifest.json", Range="bytes=-4")
+    assert response["Body"].read() == b"6789"
+    assert response["ContentRange"] == "bytes 6-9/10"
+    
+    backend.put_object(Bucket="bucket", Key="manifest.json", Body=b"updated", IfMatch=etag)
+    with pytest.raises(ClientError) as exc:
+        backend.put_object(Bucket="bucket", Key="manifest.json", Body=b"stale", IfMatch=etag)
+    assert exc.value.response["Error"]["Code"] == "PreconditionFailed"
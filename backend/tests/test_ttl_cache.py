@@ -0,0 +1,50 @@
+"""
+Tests for the TTL + LRU cache used in front of S3 lookups.
+"""
+from services import ttl_cache
+from services.ttl_cache import TTLCache
+
+
+def test_get_returns_cached_value_until_expiry(monkeypatch):
+    """Test that entries are served until their TTL elapses."""
+    now = [100.0]
+    monkeypatch.setattr(ttl_cache.time, "monotonic", lambda: now[0])
+    cache = TTLCache(max_entries=4, default_ttl=10.0)
+    
+    cache.set(("outputs", "project-1", 1), ["a.stl"])
+    assert cache.get(("outputs", "project-1", 1)) == ["a.stl"]
+    
+    now[0] += 10.0
+    assert cache.get(("outputs", "project-1", 1)) is None
+    
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["expirations"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    """Test that the cache stays within max_entries, evicting LRU first."""
+    cache = TTLCache(max_entries=2)
+    
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_invalidate_matching_drops_only_matching_keys():
+    """Test project-scoped invalidation."""
+    cache = TTLCache()
+    cache.set(("outputs", "project-1", None), [])
+    cache.set(("metadata", "project-1", 2), {"version": 2})
+    cache.set(("outputs", "project-2", None), [])
+    
+    assert cache.invalidate_matching(lambda key: key[1] == "project-1") == 2
+    assert cache.get(("metadata", "project-1", 2)) is None
+    assert cache.get(("outputs", "project-2", None)) == []
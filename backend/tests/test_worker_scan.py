@@ -0,0 +1,43 @@
+"""
+Tests for the worker's incremental script scans.
+"""
+import importlib.util
+import json
+import os
+
+import pytest
+
+WORKER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "fixed_worker.py")
+
+
+@pytest.fixture
+def worker(tmp_path, monkeypatch):
+    """fixed_worker loaded against a local storage root."""
+    (tmp_path / "config.json").write_text(json.dumps({
+        "bucket": "bucket",
+        "storage_backend": "local",
+        "local_storage_root": str(tmp_path / "storage")
+    }))
+    monkeypatch.setenv("FREECAD_WORKER_BASE", str(tmp_path))
+    spec = importlib.util.spec_from_file_location("fixed_worker", WORKER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.mark.parametrize("cursor", [1, 9, 99, 1234])
+def test_list_new_scripts_finds_next_versions(worker, cursor):
+    """Test that probing from a cursor finds the next versions across digit boundaries."""
+    for version in range(1, cursor + 3):
+        worker.s3.put_object(Bucket="bucket", Key=f"input/p/p_v{version}.py", Body=b"")
+    
+    assert worker.list_new_scripts("p", cursor) == [f"input/p/p_v{cursor + 1}.py", f"input/p/p_v{cursor + 2}.py"]
+    assert worker.list_new_scripts("p", cursor + 2) == []
+
+
+def test_list_new_scripts_steps_over_a_skipped_version(worker):
+    """Test that one missing version number does not hide the ones after it."""
+    for version in (1, 2, 4, 5):
+        worker.s3.put_object(Bucket="bucket", Key=f"input/p/p_v{version}.py", Body=b"")
+    
+    assert worker.list_new_scripts("p", 2) == ["input/p/p_v4.py", "input/p/p_v5.py"]
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for the S3 execution path.
+
+Fires 50 concurrent /download/{format} requests against the in-process app
+while sampling /api/monitoring/health, and reports health-check latency
+percentiles. S3 latency is simulated with a client whose calls sleep, so the
+benchmark runs without AWS credentials.
+
+Usage:
+    python bench_s3_concurrency.py            # executor-backed S3 calls
+    python bench_s3_concurrency.py --blocking # inline boto3 calls (old behaviour)
+"""
+import sys
+import io
+import os
+import time
+import asyncio
+import argparse
+import statistics
+from datetime import datetime, timezone
+sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+
+import httpx
+from botocore.exceptions import ClientError
+
+from main import app
+from dependencies import get_current_user
+from services.s3_service import s3_service
+from services.project_service import project_service
+
+PROJECT = "project-bench001"
+USER = {"id": "bench-user", "email": "bench@cadscribe.com", "name": "Bench"}
+
+
+class SlowS3Client:
+    """
+    Stand-in for a boto3 S3 client where every call costs real wall time.
+
+    Holds one project with a script and three outputs in memory; objects the
+    service writes (the project manifest) are kept, so manifest-based
+    lookups work as they do against S3.
+    """
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.objects = {f"input/{PROJECT}/{PROJECT}_v1.py": b"import FreeCAD\n"}
+        for ext in (".stl", ".step", ".obj"):
+            self.objects[f"output/{PROJECT}/v1/{PROJECT}{ext}"] = b"x" * 1024
+
+    def _summary(self, key):
+        return {"Key": key, "Size": len(self.objects[key]), "ETag": '"bench"', "LastModified": datetime.now(timezone.utc)}
+
+    def list_objects_v2(self, Prefix="", **kwargs):
+        time.sleep(self.latency)
+        keys = sorted(key for key in self.objects if key.startswith(Prefix))
+        return {"Contents": [self._summary(key) for key in keys], "KeyCount": len(keys), "IsTruncated": False}
+
+    def head_object(self, Key, **kwargs):
+        time.sleep(self.latency)
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject")
+        return {"ContentLength": len(self.objects[Key]), "ETag": '"bench"', "Metadata": {}}
+
+    def get_object(self, Key, **kwargs):
+        time.sleep(self.latency)
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": "Not Found"}}, "GetObject")
+        return {"Body": io.BytesIO(self.objects[Key]), "ETag": '"bench"', "ContentLength": len(self.objects[Key])}
+
+    def put_object(self, Key, Body=b"", **kwargs):
+        time.sleep(self.latency)
+        self.objects[Key] = Body if isinstance(Body, bytes) else Body.encode("utf-8")
+        return {"ETag": '"bench"'}
+
+    def generate_presigned_url(self, operation, Params=None, ExpiresIn=3600):
+        return f"https://example.invalid/{Params['Key']}?expires={ExpiresIn}"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def sample_health(client, stop: asyncio.Event, samples: list, interval: float = 0.01):
+    # Latency is measured from each probe's scheduled start, so time spent with
+    # the event loop blocked is counted instead of silently skipped
+    scheduled = time.perf_counter()
+    while not stop.is_set():
+        response = await client.get("/api/monitoring/health")
+        samples.append((time.perf_counter() - scheduled) * 1000)
+        assert response.status_code == 200
+        scheduled += interval
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+
+
+async def run(concurrency: int, latency: float):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Baseline: health latency with no download traffic
+        idle = []
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_health(client, stop, idle))
+        await asyncio.sleep(1.0)
+        stop.set()
+        await sampler
+
+        # Load: health latency while downloads are in flight
+        loaded = []
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_health(client, stop, loaded))
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.get(f"/api/projects/{PROJECT}/download/stl") for _ in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await sampler
+
+    failures = [r.status_code for r in responses if r.status_code != 200]
+    print(f"downloads: {concurrency} in {elapsed:.2f}s ({len(failures)} failed)")
+    for label, samples in (("idle", idle), ("loaded", loaded)):
+        print(
+            f"health {label:>6}: n={len(samples):4d} "
+            f"p50={statistics.median(samples):7.2f}ms "
+            f"p99={percentile(samples, 99):7.2f}ms "
+            f"max={max(samples):7.2f}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated S3 call latency (s)")
+    parser.add_argument("--blocking", action="store_true", help="run boto3 calls inline on the event loop")
+    args = parser.parse_args()
+
+    s3_service.s3_client = SlowS3Client(args.latency)
+    s3_service.aws_bucket_name = s3_service.aws_bucket_name or "bench-bucket"
+    project_service.get_project_by_id = lambda project_id: {
+        "project_id": project_id, "user_id": USER["id"], "created_by": USER["id"],
+        "latest_s3_input": {"project_name": PROJECT}
+    }
+    app.dependency_overrides[get_current_user] = lambda: USER
+
+    if args.blocking:
+        async def run_inline(func, *call_args, timeout=None, **kwargs):
+            return func(*call_args, **kwargs)
+        s3_service._run_blocking = run_inline
+
+    asyncio.run(run(args.concurrency, args.latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the worker's parallel FreeCAD execution pool.
+
+Uploads a batch of scripts to a local storage backend, runs one scan of
+fixed_worker with different pool sizes and reports scripts per second and
+per-job queue wait. freecadcmd is replaced by a stand-in that burns CPU (or
+sleeps, with --sleep) for a fixed time, so the benchmark runs without FreeCAD
+or AWS. With CPU-bound jobs, scaling is bounded by the number of cores.
+
+Usage:
+    python bench_worker_pool.py                      # 1, 2, 4, ... up to cpu_count
+    python bench_worker_pool.py --pools 1 4 8 --scripts 32 --job-seconds 0.5
+    python bench_worker_pool.py --sleep              # I/O-bound stand-in
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import importlib
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(ROOT, 'backend'))
+
+from services.storage_backend import LocalStorageBackend
+
+FAKE_FREECADCMD = """#!{python}
+import os, sys, time
+deadline = time.process_time() + {seconds} if {cpu} else None
+if {cpu}:
+    while time.process_time() < deadline:
+        sum(i * i for i in range(1000))
+else:
+    time.sleep({seconds})
+with open(os.path.join(os.environ["FREECAD_OUTPUT"], "Model.stl"), "w") as f:
+    f.write("solid bench\\nendsolid bench\\n")
+print("ran", sys.argv[1])
+"""
+
+
+def calibrate_job_seconds(bin_dir):
+    """Wall time of one stand-in run, including interpreter start-up."""
+    output_dir = tempfile.mkdtemp()
+    start = time.perf_counter()
+    subprocess.run([os.path.join(bin_dir, "freecadcmd"), "x.py"], check=True, capture_output=True,
+                   env={**os.environ, "FREECAD_OUTPUT": output_dir})
+    elapsed = time.perf_counter() - start
+    shutil.rmtree(output_dir)
+    return elapsed
+
+
+def run_once(pool_size, scripts, bin_dir):
+    """Process `scripts` scripts with a pool of `pool_size`; returns (seconds, queue waits)."""
+    work_dir = tempfile.mkdtemp(prefix="bench-worker-")
+    storage_root = os.path.join(work_dir, "storage")
+    with open(os.path.join(work_dir, "config.json"), "w") as f:
+        json.dump({
+            "bucket": "local",
+            "storage_backend": "local",
+            "local_storage_root": storage_root,
+            "max_parallel_jobs": pool_size,
+            # The stand-in is not a FreeCAD interpreter; measure the pool itself
+            "warm_interpreters": False
+        }, f)
+
+    storage = LocalStorageBackend(storage_root)
+    for i in range(8):
+        # The worker only records results (and timings) in existing manifests
+        project = f"project-bench{i:03d}"
+        storage.put_object(Bucket="local", Key=f"manifests/{project}/manifest.json",
+                           Body=json.dumps({"versions": {}}).encode("utf-8"))
+    for i in range(scripts):
+        project = f"project-bench{i % 8:03d}"
+        storage.put_object(Bucket="local", Key=f"input/{project}/{project}_v{i // 8 + 1}.py",
+                           Body=b"import FreeCAD\n")
+
+    os.environ["FREECAD_WORKER_BASE"] = work_dir
+    worker = importlib.reload(sys.modules["fixed_worker"]) if "fixed_worker" in sys.modules else importlib.import_module("fixed_worker")
+    worker.log = lambda msg: None
+    worker.init_env()
+
+    start = time.perf_counter()
+    worker.scan_all_projects()
+    worker.wait_for_idle()
+    elapsed = time.perf_counter() - start
+    worker.EXECUTOR.shutdown(wait=True)
+
+    waits = []
+    for i in range(8):
+        project = f"project-bench{i:03d}"
+        try:
+            body = storage.get_object(Bucket="local", Key=f"manifests/{project}/manifest.json")["Body"].read()
+        except Exception:
+            continue
+        for entry in json.loads(body)["versions"].values():
+            waits.append(entry.get("timings", {}).get("queue_wait_seconds", 0.0))
+
+    done = sum(1 for _ in storage.list_objects_v2(Bucket="local", Prefix="processed/").get("Contents", []))
+    shutil.rmtree(work_dir)
+    if done != scripts:
+        raise RuntimeError(f"only {done}/{scripts} scripts were processed")
+    return elapsed, waits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pools", type=int, nargs="+", help="pool sizes to compare")
+    parser.add_argument("--scripts", type=int, default=16)
+    parser.add_argument("--job-seconds", type=float, default=0.5)
+    parser.add_argument("--sleep", action="store_true", help="stand-in sleeps instead of burning CPU")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    pools = args.pools or sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1))) or [1]
+
+    bin_dir = tempfile.mkdtemp(prefix="bench-bin-")
+    fake = os.path.join(bin_dir, "freecadcmd")
+    with open(fake, "w") as f:
+        f.write(FAKE_FREECADCMD.format(python=sys.executable, seconds=args.job_seconds, cpu=not args.sleep))
+    os.chmod(fake, 0o755)
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ["PATH"]
+
+    print(f"{args.scripts} scripts, {'sleeping' if args.sleep else 'CPU-bound'} stand-in "
+          f"(~{calibrate_job_seconds(bin_dir):.2f}s per job), {cores} cores")
+    print(f"{'pool':>5} {'seconds':>9} {'scripts/s':>10} {'speed-up':>9} {'efficiency':>11} {'wait p50':>9} {'wait max':>9}")
+
+    baseline = None
+    for pool_size in pools:
+        elapsed, waits = run_once(pool_size, args.scripts, bin_dir)
+        throughput = args.scripts / elapsed
+        baseline = baseline or throughput
+        speedup = throughput / baseline
+        print(f"{pool_size:>5} {elapsed:>9.2f} {throughput:>10.2f} {speedup:>8.2f}x "
+              f"{speedup / pool_size * pools[0]:>10.0%} {statistics.median(waits):>8.2f}s {max(waits):>8.2f}s")
+
+    shutil.rmtree(bin_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,38 @@ import subprocess
 import tempfile
 import os
 import uuid
+import asyncio
 import logging
 from datetime import datetime, timezone
 from typing import Dict, Any, Optional
 
+try:
+    # freecad_pool.py lives at the repository root; put it on PYTHONPATH to use it
+    from freecad_pool import FreeCADPool
+except ImportError:
+    FreeCADPool = None
+
 logger = logging.getLogger(__name__)
 
+FREECAD_COMMAND = ["freecad", "-c"]
+
+# Warm FreeCAD interpreters, so requests skip FreeCAD start-up
+freecad_pool = None
+if FreeCADPool is not None:
+    freecad_pool = FreeCADPool(
+        size=int(os.environ.get("CAD_POOL_SIZE", os.cpu_count() or 1)),
+        command=FREECAD_COMMAND
+    )
+else:
+    logger.info("freecad_pool not importable, running every script in a fresh FreeCAD process")
+
+def run_freecad(script_path: str, output_dir: str, timeout: float):
+    """Run a script in FreeCAD and return (stdout, stderr, returncode)."""
+    if freecad_pool:
+        return freecad_pool.run(script_path, output_dir, timeout)
+    result = subprocess.run(FREECAD_COMMAND + [script_path], capture_output=True, text=True, timeout=timeout)
+    return result.stdout, result.stderr, result.returncode
+
 app = FastAPI(title="CADSCRIBE CAD Service", version="1.0.0")
 
 # CORS middleware
@@ -74,20 +100,18 @@ async def generate_model(cad_script: CADScript):
                 output_filename = f"model_{file_id}.{cad_script.output_format}"
                 output_path = os.path.join(temp_dir, output_filename)
                 
-                # Run FreeCAD with the script
-                freecad_cmd = ["freecad", "-c", script_path]
+                # Run FreeCAD with the script, on a warm interpreter when available
                 try:
-                    subprocess.run(
-                        freecad_cmd,
-                        capture_output=True,
-                        text=True,
-                        timeout=60,  # Increase timeout for complex models
-                        check=True  # Raise on non-zero exit
+                    _, stderr, returncode = await asyncio.to_thread(
+                        run_freecad,
+                        script_path,
+                        temp_dir,
+                        60  # Increase timeout for complex models
                     )
                 except subprocess.TimeoutExpired:
                     raise HTTPException(status_code=500, detail="CAD generation timed out")
-                except subprocess.CalledProcessError as e:
-                    raise HTTPException(status_code=500, detail=f"FreeCAD error: {e.stderr}")
+                if returncode != 0:
+                    raise HTTPException(status_code=500, detail=f"FreeCAD error: {stderr}")
                 
                 # Move generated file to final location
                 os.makedirs("generated_models", exist_ok=True)
@@ -1,33 +1,85 @@
 #!/usr/bin/env python3
 import os
 import json
+import gzip
 import time
 import shutil
 import boto3
 import subprocess
 import traceback
 import re
+import sys
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
-BASE = "/home/ubuntu/freecad_worker"
+BASE = os.environ.get("FREECAD_WORKER_BASE", "/home/ubuntu/freecad_worker")
 
 # Load configuration
 with open(os.path.join(BASE, "config.json"), "r") as f:
     C = json.load(f)
 
 BUCKET = C["bucket"]
-REGION = C["region"]
+REGION = C.get("region", "us-east-1")
 INPUT_PREFIX = C.get("input_prefix", "input/")
 OUTPUT_PREFIX = C.get("output_prefix", "output/")
 LOGS_PREFIX = C.get("logs_prefix", "logs/")
 PROCESSED_PREFIX = C.get("processed_prefix", "processed/")
+MANIFEST_PREFIX = C.get("manifest_prefix", "manifests/")
+RESCAN_PREFIX = C.get("rescan_prefix", "rescan/")
 CHECK_INTERVAL = int(C.get("check_interval_seconds", 15))
 FREECAD_TIMEOUT = int(C.get("freecad_timeout_seconds", 300))
+MAX_PARALLEL_JOBS = int(C.get("max_parallel_jobs") or os.cpu_count() or 1)
 
 SUPPORTED_FORMATS = [".FCStd", ".STL", ".STEP", ".IGES", ".OBJ", ".GLTF"]
 
-s3 = boto3.client("s3", region_name=REGION)
+# Shared modules (storage backend, job queue) live in the backend package
+BACKEND_PATH = C.get("backend_path", os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+# Storage: "s3", or "local" to share a local directory with a backend running
+# with storage_backend="local" (offline load tests, single-node deployments)
+STORAGE_BACKEND = C.get("storage_backend", "s3")
+
+if STORAGE_BACKEND == "local":
+    sys.path.insert(0, BACKEND_PATH)
+    from services.storage_backend import LocalStorageBackend
+    s3 = LocalStorageBackend(C["local_storage_root"])
+else:
+    s3 = boto3.client(
+        "s3",
+        region_name=REGION,
+        config=Config(
+            max_pool_connections=int(C.get("max_pool_connections", 32)),
+            connect_timeout=5,
+            read_timeout=60,
+            tcp_keepalive=True,
+            retries={"max_attempts": 5, "mode": "adaptive"}
+        )
+    )
+
+# Job queue the API enqueues new scripts on: "sqlite" or "sqs". Without one
+# the worker scans S3 every CHECK_INTERVAL seconds (probing only for scripts
+# newer than its saved cursors, see SCAN CURSORS); with one it blocks on the
+# queue. Either way it lists every script every RESCAN_INTERVAL seconds to
+# catch missed jobs and uploads that skipped a version number.
+JOB_QUEUE_BACKEND = C.get("job_queue", "")
+RESCAN_INTERVAL = int(C.get("rescan_interval_seconds", 600))
+
+job_queue = None
+if JOB_QUEUE_BACKEND:
+    if BACKEND_PATH not in sys.path:
+        sys.path.insert(0, BACKEND_PATH)
+    from services.job_queue import create_job_queue
+    job_queue = create_job_queue(
+        JOB_QUEUE_BACKEND,
+        sqlite_path=C.get("job_queue_path"),
+        sqs_queue_url=C.get("job_queue_url"),
+        region_name=REGION,
+        visibility_timeout=float(C.get("job_queue_visibility_timeout_seconds", FREECAD_TIMEOUT * 3))
+    )
 
 # ===============================================
 #                   UTILITIES
@@ -38,7 +90,7 @@ def log(msg):
 
 def init_env():
     """Initializes the local directory structure."""
-    for d in ["input", "output", "log"]:
+    for d in ["jobs", "log"]:
         os.makedirs(os.path.join(BASE, d), exist_ok=True)
     log("Environment Initialized.")
 
@@ -51,12 +103,26 @@ def get_project_name_from_filename(filename):
     """Extracts project name from filename like 'project-123_v2.py' -> 'project-123'"""
     return filename.replace('.py', '').rsplit('_v', 1)[0]
 
+def iter_pages(**kwargs):
+    """Yields every list_objects_v2 response page, following continuation tokens."""
+    while True:
+        resp = s3.list_objects_v2(Bucket=BUCKET, **kwargs)
+        yield resp
+        if not resp.get("IsTruncated"):
+            return
+        kwargs["ContinuationToken"] = resp["NextContinuationToken"]
+
+def iter_objects(prefix):
+    """Yields every object under a prefix."""
+    for resp in iter_pages(Prefix=prefix):
+        yield from resp.get("Contents", [])
+
 def list_projects():
     """Lists project folders in the S3 input prefix."""
     try:
-        resp = s3.list_objects_v2(Bucket=BUCKET, Prefix=INPUT_PREFIX, Delimiter='/')
-        prefixes = resp.get('CommonPrefixes', [])
-        return [p['Prefix'].split('/')[-2] for p in prefixes]
+        return [p['Prefix'].split('/')[-2]
+                for resp in iter_pages(Prefix=INPUT_PREFIX, Delimiter='/')
+                for p in resp.get('CommonPrefixes', [])]
     except Exception as e:
         log(f"list_projects error: {e}")
         return []
@@ -67,6 +133,11 @@ def mark_processed(project, filename):
     s3.put_object(Bucket=BUCKET, Key=key, Body=b'')
     return
 
+def list_processed(project):
+    """Returns the names of all processed scripts in a project (one listing, no per-file probes)."""
+    prefix = f"{PROCESSED_PREFIX}{project}/"
+    return {obj['Key'][len(prefix):-len(".done")] for obj in iter_objects(prefix) if obj['Key'].endswith(".done")}
+
 def is_processed(project, filename):
     """Checks if a .done file already exists for the given script."""
     key = f"{PROCESSED_PREFIX}{project}/{filename}.done"
@@ -77,23 +148,108 @@ def is_processed(project, filename):
         return False
 
 def upload_log(project, name, data, is_error=False):
-    """Uploads a log file to S3."""
+    """Uploads a log file to S3, gzip-compressed with Content-Encoding: gzip."""
     ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
     typ = "error" if is_error else "info"
     fname = f"{name}_{typ}_{ts}.log"
     local_log = os.path.join(BASE, "log", fname)
     with open(local_log, "w") as f:
         f.write(data)
+    raw = data.encode("utf-8")
+    body = gzip.compress(raw, compresslevel=6)
     s3_key = f"{LOGS_PREFIX}{project}/{fname}"
-    s3.upload_file(local_log, BUCKET, s3_key)
-    log(f"Uploaded log to {s3_key}")
+    s3.put_object(
+        Bucket=BUCKET,
+        Key=s3_key,
+        Body=body,
+        ContentType="text/plain; charset=utf-8",
+        ContentEncoding="gzip",
+        Metadata={"uncompressed-size": str(len(raw))}
+    )
+    log(f"Uploaded log to {s3_key} ({len(raw)} -> {len(body)} bytes)")
+    return {
+        "filename": fname,
+        "key": s3_key,
+        "timestamp": ts,
+        "size": len(body),
+        "uncompressed_size": len(raw),
+        "last_modified": datetime.utcnow().isoformat() + "+00:00"
+    }
+
+def update_manifest(project, version, log_info, **fields):
+    """Records a processing result in the project's manifest.json.
+
+    New entries use the same fields as the API's S3Service._manifest_version.
+    Uses conditional writes so concurrent updates from the API are never
+    overwritten. Projects without a manifest are skipped: the API builds
+    one from the S3 prefixes on first read, which includes this result.
+    """
+    key = f"{MANIFEST_PREFIX}{project}/manifest.json"
+    try:
+        for _ in range(5):
+            try:
+                resp = s3.get_object(Bucket=BUCKET, Key=key)
+                manifest = json.loads(resp["Body"].read().decode("utf-8"))
+                etag = resp["ETag"]
+            except ClientError as e:
+                if e.response["Error"]["Code"] not in ("NoSuchKey", "404"):
+                    log(f"manifest read error for {project}: {e}")
+                return
+
+            entry = manifest["versions"].setdefault(str(version), {
+                "version": version,
+                "status": "pending",
+                "script_key": f"{INPUT_PREFIX}{project}/{project}_v{version}.py",
+                "script_hash": None,
+                "uploaded_at": None,
+                "processed_at": None,
+                "outputs": [],
+                "metadata": None,
+                "error": None,
+                "pinned": False,
+                "timings": None
+            })
+            entry.update(fields)
+            manifest["latest_version"] = max(manifest.get("latest_version") or 0, version)
+            if log_info:
+                manifest["latest_log"] = log_info
+                manifest["log_count"] = manifest.get("log_count", 0) + 1
+            manifest["updated_at"] = datetime.utcnow().isoformat() + "+00:00"
+
+            try:
+                s3.put_object(Bucket=BUCKET, Key=key, IfMatch=etag, ContentType="application/json",
+                              Body=json.dumps(manifest, separators=(",", ":")).encode("utf-8"))
+                return
+            except ClientError as e:
+                if e.response["Error"]["Code"] not in ("PreconditionFailed", "ConditionalRequestConflict"):
+                    log(f"manifest write error for {project}: {e}")
+                    return
+    except Exception as e:
+        log(f"manifest update error for {project}: {e}")
+        return
+    log(f"⚠️ Gave up updating manifest for {project}")
 
 # ===============================================
 #               FREECAD EXECUTION
 # ===============================================
+# Warm interpreters skip freecadcmd start-up and module imports for every
+# script. They are off by default; set "warm_interpreters": true and deploy
+# freecad_pool.py next to this file to use them.
+freecad_pool = None
+if C.get("warm_interpreters", False):
+    from freecad_pool import FreeCADPool
+    freecad_pool = FreeCADPool(
+        size=MAX_PARALLEL_JOBS,
+        command=["freecadcmd"],
+        max_jobs=int(C.get("interpreter_max_jobs", 50)),
+        max_rss_mb=int(C.get("interpreter_max_rss_mb", 1024))
+    )
+
 def run_freecad_script(local_script_path, output_dir, timeout):
     """Runs the FreeCAD script using freecadcmd with a specific output directory."""
     try:
+        if freecad_pool:
+            return freecad_pool.run(local_script_path, output_dir, timeout)
         env = os.environ.copy()
         env["FREECAD_OUTPUT"] = output_dir
         cmd = ["freecadcmd", local_script_path]
@@ -107,86 +263,314 @@ def run_freecad_script(local_script_path, output_dir, timeout):
 # ===============================================
 #                 FILE PROCESSING
 # ===============================================
-def process_project(project):
-    """Processes all .py files in a given project folder from S3."""
-    prefix = f"{INPUT_PREFIX}{project}/"
-    resp = s3.list_objects_v2(Bucket=BUCKET, Prefix=prefix)
-    if "Contents" not in resp:
-        return
+def process_project(project, incremental=False):
+    """Processes all unprocessed .py files in a given project folder from S3.
+
+    An incremental scan only probes for scripts uploaded since the project's
+    cursor; process_script still skips any of them that were processed already.
+    """
+    if incremental and project in _cursors:
+        files = list_new_scripts(project, _cursors[project])
+        processed = set()
+    else:
+        prefix = f"{INPUT_PREFIX}{project}/"
+        files = [obj['Key'] for obj in iter_objects(prefix) if obj['Key'].endswith(".py")]
+        if not files:
+            return
+        # One listing of processed/ per cycle instead of a head_object per version
+        processed = list_processed(project)
 
-    files = [obj['Key'] for obj in resp["Contents"] if obj['Key'].endswith(".py")]
     for key in files:
-        filename = os.path.basename(key)
-        if is_processed(project, filename):
-            log(f"⏩ Skipping already processed script: {filename}")
-            continue
+        if os.path.basename(key) not in processed:
+            submit_script(project, key)
+    advance_cursor(project, files)
 
-        log(f"Processing {filename} in project {project}")
+def process_script(project, key, queued_at=None):
+    """Runs one input script through FreeCAD and uploads its outputs and log.
 
-        local_input_dir = os.path.join(BASE, "input", project)
-        os.makedirs(local_input_dir, exist_ok=True)
+    Each run gets its own scratch directory under jobs/, so scripts can run
+    in parallel. queued_at (time.monotonic() at submission) is used to report
+    how long the script waited for a free slot.
+    """
+    started = time.monotonic()
+    queue_wait = round(started - queued_at, 3) if queued_at is not None else 0.0
+    filename = os.path.basename(key)
+    if is_processed(project, filename):
+        log(f"⏩ Skipping already processed script: {filename}")
+        return
 
-        local_script_path = os.path.join(local_input_dir, filename)
-        s3.download_file(BUCKET, key, local_script_path)
+    log(f"Processing {filename} in project {project} (waited {queue_wait:.2f}s)")
 
-        # Extract version number from filename (e.g., project-123_v2.py -> v2)
-        version_num = extract_version_from_filename(filename)
-        project_name = get_project_name_from_filename(filename)
-        
-        # Create version-based output folder (v1, v2, v3...)
-        version_output_dir = os.path.join(BASE, "output", project, f"v{version_num}")
-        os.makedirs(version_output_dir, exist_ok=True)
+    job_dir = os.path.join(BASE, "jobs", uuid.uuid4().hex)
+    local_input_dir = os.path.join(job_dir, "input")
+    os.makedirs(local_input_dir, exist_ok=True)
 
-        try:
-            out, err, code = run_freecad_script(local_script_path, version_output_dir, FREECAD_TIMEOUT)
-            output = f"STDOUT:\n{out}\nSTDERR:\n{err}\nReturn code: {code}\n"
-            upload_log(project, filename.replace('.py', ''), output, is_error=(code != 0))
-
-            # Upload all supported output files with standardized names
-            for root, _, files in os.walk(version_output_dir):
-                for f in files:
-                    file_ext = os.path.splitext(f)[1].upper()
-                    if file_ext in [ext.upper() for ext in SUPPORTED_FORMATS]:
-                        full_path = os.path.join(root, f)
-                        
-                        # Standardize filename: use project name + extension
-                        # e.g., "Bottle.stl" -> "project-46021509.stl"
-                        standardized_name = f"{project_name}{file_ext.lower()}"
-                        
-                        # S3 key: output/project-46021509/v2/project-46021509.stl
-                        s3_key = f"{OUTPUT_PREFIX}{project}/v{version_num}/{standardized_name}"
-                        
-                        s3.upload_file(full_path, BUCKET, s3_key)
-                        log(f"✅ Uploaded {s3_key} (original: {f})")
-
-            if code == 0:
-                mark_processed(project, filename)
-                log(f"✅ Marked {filename} as processed.")
-        except Exception as e:
-            tb = traceback.format_exc()
-            log(f"❌ Error while processing {filename}: {e}")
-            upload_log(project, filename.replace('.py', ''), tb, is_error=True)
-        finally:
-            shutil.rmtree(local_input_dir, ignore_errors=True)
-            shutil.rmtree(version_output_dir, ignore_errors=True)
+    local_script_path = os.path.join(local_input_dir, filename)
+    s3.download_file(BUCKET, key, local_script_path)
+
+    # Extract version number from filename (e.g., project-123_v2.py -> v2)
+    version_num = extract_version_from_filename(filename)
+    project_name = get_project_name_from_filename(filename)
+    
+    # Create version-based output folder (v1, v2, v3...)
+    version_output_dir = os.path.join(job_dir, "output", f"v{version_num}")
+    os.makedirs(version_output_dir, exist_ok=True)
+
+    log_info = None
+    try:
+        out, err, code = run_freecad_script(local_script_path, version_output_dir, FREECAD_TIMEOUT)
+        output = f"STDOUT:\n{out}\nSTDERR:\n{err}\nReturn code: {code}\n"
+        log_info = upload_log(project, filename.replace('.py', ''), output, is_error=(code != 0))
+
+        outputs = []
+
+        # Upload all supported output files with standardized names
+        for root, _, files in os.walk(version_output_dir):
+            for f in files:
+                file_ext = os.path.splitext(f)[1].upper()
+                if file_ext in [ext.upper() for ext in SUPPORTED_FORMATS]:
+                    full_path = os.path.join(root, f)
+                    
+                    # Standardize filename: use project name + extension
+                    # e.g., "Bottle.stl" -> "project-46021509.stl"
+                    standardized_name = f"{project_name}{file_ext.lower()}"
+                    
+                    # S3 key: output/project-46021509/v2/project-46021509.stl
+                    s3_key = f"{OUTPUT_PREFIX}{project}/v{version_num}/{standardized_name}"
+                    
+                    s3.upload_file(full_path, BUCKET, s3_key)
+                    log(f"✅ Uploaded {s3_key} (original: {f})")
+                    outputs.append({
+                        "filename": standardized_name,
+                        "key": s3_key,
+                        "format": file_ext,
+                        "size": os.path.getsize(full_path),
+                        "version": version_num,
+                        "last_modified": datetime.utcnow().isoformat() + "+00:00",
+                        "etag": None,
+                        "download_url": None
+                    })
+
+        now = datetime.utcnow().isoformat() + "+00:00"
+        timings = {"queue_wait_seconds": queue_wait, "run_seconds": round(time.monotonic() - started, 3)}
+        if code == 0:
+            mark_processed(project, filename)
+            log(f"✅ Marked {filename} as processed.")
+            update_manifest(project, version_num, log_info, status="processed",
+                            processed_at=now, outputs=outputs, error=None, timings=timings)
+        else:
+            update_manifest(project, version_num, log_info, status="failed", outputs=outputs,
+                            error={"error_message": f"FreeCAD exited with code {code}", "failed_at": now},
+                            timings=timings)
+    except Exception as e:
+        tb = traceback.format_exc()
+        log(f"❌ Error while processing {filename}: {e}")
+        error_log = upload_log(project, filename.replace('.py', ''), tb, is_error=True)
+        update_manifest(project, version_num, error_log, status="failed",
+                        error={"error_message": str(e), "failed_at": datetime.utcnow().isoformat() + "+00:00"},
+                        timings={"queue_wait_seconds": queue_wait, "run_seconds": round(time.monotonic() - started, 3)})
+    finally:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        log(f"⏱️ {filename}: waited {queue_wait:.2f}s, ran {time.monotonic() - started:.2f}s")
+
+# ===============================================
+#                 SCAN CURSORS
+# ===============================================
+# Highest script version seen in each project, persisted to BASE/cursors.json
+# so incremental scans, including the first one after a restart, only probe
+# for scripts uploaded since. Scripts rewritten under an existing version
+# (retry, replace, auto-fix) are announced by the API with an empty
+# rescan/<project> object, and those projects get a full scan.
+CURSORS_PATH = os.path.join(BASE, "cursors.json")
+_cursors = {}
+_cursors_lock = threading.Lock()
+_cursors_dirty = False
+
+def script_version(project, key):
+    """Returns N for input/<project>/<project>_vN.py keys, else None."""
+    match = re.fullmatch(re.escape(project) + r'_v(\d+)\.py', os.path.basename(key))
+    return int(match.group(1)) if match else None
+
+def list_new_scripts(project, version):
+    """Lists the project's scripts with a version above `version`.
+
+    Version numbers are not zero-padded, so keys after the cursor's key in
+    text order are mostly older versions. Instead this probes one version at
+    a time: the prefix <project>_v<N> matches vN.py and only higher versions
+    (vN0.py, vN00.py, ...), so each probe is a small listing at any number of
+    digits. It steps over a single skipped version number and stops after two
+    empty probes in a row, so an idle project costs two listings per cycle.
+    """
+    stem = f"{INPUT_PREFIX}{project}/{project}_v"
+    found = {}
+    probe, misses = version + 1, 0
+    while misses < 2 or probe <= max(found.values(), default=0):
+        hit = False
+        for obj in iter_objects(f"{stem}{probe}"):
+            v = script_version(project, obj['Key'])
+            if v and v > version:
+                found[obj['Key']] = v
+                hit = hit or v == probe
+        misses = 0 if hit else misses + 1
+        probe += 1
+    return sorted(found, key=found.get)
+
+def take_rescan_requests():
+    """Returns the projects the API flagged for a full rescan, clearing the flags.
+
+    Flags are deleted before the projects are scanned, so a flag written while
+    this runs follows a change the scan will see.
+    """
+    projects = set()
+    for obj in iter_objects(RESCAN_PREFIX):
+        s3.delete_object(Bucket=BUCKET, Key=obj['Key'])
+        projects.add(obj['Key'][len(RESCAN_PREFIX):])
+    return projects
+
+def advance_cursor(project, keys):
+    """Moves the project's cursor to the highest script version in keys."""
+    global _cursors_dirty
+    versions = [v for v in (script_version(project, k) for k in keys) if v]
+    if not versions:
+        return
+    with _cursors_lock:
+        if max(versions) > _cursors.get(project, 0):
+            _cursors[project] = max(versions)
+            _cursors_dirty = True
+
+def load_cursors():
+    """Loads the saved cursors; a missing or unreadable file means full scans."""
+    try:
+        with open(CURSORS_PATH, "r") as f:
+            _cursors.update(json.load(f))
+        log(f"Loaded scan cursors for {len(_cursors)} projects.")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        log(f"⚠️ Ignoring unreadable {CURSORS_PATH}: {e}")
+
+def save_cursors():
+    """Atomically writes the cursors if they moved since the last save."""
+    global _cursors_dirty
+    with _cursors_lock:
+        if not _cursors_dirty:
+            return
+        data = dict(_cursors)
+        _cursors_dirty = False
+    tmp_path = CURSORS_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, CURSORS_PATH)
+
+# ===============================================
+#                EXECUTION POOL
+# ===============================================
+# Scripts run on a pool of MAX_PARALLEL_JOBS threads, each driving its own
+# freecadcmd subprocess. A script is never submitted twice while in flight.
+EXECUTOR = ThreadPoolExecutor(max_workers=MAX_PARALLEL_JOBS, thread_name_prefix="freecad")
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+# Queue mode only takes a job when a slot is free, so leases do not run out
+# while jobs wait inside the pool
+_slots = threading.BoundedSemaphore(MAX_PARALLEL_JOBS)
+
+def _run_job(project, key, queued_at, job):
+    """Pool task: processes one script and settles its queue job, if any."""
+    try:
+        process_script(project, key, queued_at)
+        if job:
+            job_queue.ack(job)
+    except Exception as e:
+        log(f"❌ Processing {key} failed: {e}")
+        if job:
+            job_queue.nack(job, delay=CHECK_INTERVAL)
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard(key)
+        if job:
+            _slots.release()
+
+def submit_script(project, key, job=None):
+    """Queues a script on the execution pool; returns False if it is already in flight."""
+    with _in_flight_lock:
+        if key in _in_flight:
+            return False
+        _in_flight.add(key)
+    EXECUTOR.submit(_run_job, project, key, time.monotonic(), job)
+    return True
+
+def wait_for_idle(poll=0.05):
+    """Blocks until no script is queued or running."""
+    while True:
+        with _in_flight_lock:
+            if not _in_flight:
+                return
+        time.sleep(poll)
 
 # ===============================================
 #                   MAIN LOOP
 # ===============================================
+def scan_all_projects(incremental=False):
+    """Submits every unprocessed script found by listing S3 (only new ones if incremental)."""
+    rescan = take_rescan_requests()
+    projects = list_projects()
+    if not projects:
+        log("No projects found.")
+    for p in projects:
+        try:
+            process_project(p, incremental and p not in rescan)
+        except Exception as e:
+            log(f"❌ Scanning project {p} failed: {e}")
+    save_cursors()
+
+def take_queue_job(timeout):
+    """Waits for a free slot, then for a job, and submits it to the pool."""
+    if not _slots.acquire(timeout=timeout):
+        return
+    job = job_queue.dequeue(timeout=timeout)
+    if not job:
+        _slots.release()
+        return
+    if not submit_script(job.payload["project"], job.payload["key"], job):
+        # A scan already picked the script up; let the job come back later
+        job_queue.nack(job, delay=CHECK_INTERVAL)
+        _slots.release()
+
 def main():
     """The main loop for the worker process."""
     init_env()
-    log("🚀 Worker started with standardized output structure.")
+    load_cursors()
+    log(f"🚀 Worker started with {MAX_PARALLEL_JOBS} parallel FreeCAD slots "
+        f"({'warm' if freecad_pool else 'cold'} interpreters).")
+
+    # A restarted worker resumes from its cursors instead of listing everything
+    next_full_scan = time.monotonic() + RESCAN_INTERVAL if _cursors else 0.0
+
+    if job_queue is None:
+        while True:
+            try:
+                full_scan = time.monotonic() >= next_full_scan
+                scan_all_projects(incremental=not full_scan)
+                if full_scan:
+                    next_full_scan = time.monotonic() + RESCAN_INTERVAL
+            except Exception as e:
+                log(f"Main loop error: {e}")
+            time.sleep(CHECK_INTERVAL)
+
+    log(f"📬 Waiting for jobs on the {JOB_QUEUE_BACKEND} queue (rescan every {RESCAN_INTERVAL}s)")
+    next_scan = 0.0
     while True:
         try:
-            projects = list_projects()
-            if not projects:
-                log("No projects found.")
-            for p in projects:
-                process_project(p)
+            if time.monotonic() >= next_scan:
+                full_scan = time.monotonic() >= next_full_scan
+                scan_all_projects(incremental=not full_scan)
+                next_scan = next_full_scan = time.monotonic() + RESCAN_INTERVAL
+
+            take_queue_job(timeout=min(20, max(1, next_scan - time.monotonic())))
         except Exception as e:
             log(f"Main loop error: {e}")
-        time.sleep(CHECK_INTERVAL)
+            time.sleep(CHECK_INTERVAL)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Pool of warm FreeCAD interpreters.
+
+Starting freecadcmd and importing FreeCAD/Part/Mesh costs hundreds of
+milliseconds to seconds per script. FreeCADPool keeps long-lived interpreter
+processes with those modules already imported and sends them scripts over a
+pipe, so small scripts finish in tens of milliseconds.
+
+Each job runs in a fresh namespace with every FreeCAD document closed, its
+own working directory and environment, and stdout/stderr (including FreeCAD's
+console output) captured to files. An interpreter is recycled after
+`max_jobs` jobs or when its memory grows past `max_rss_mb`. If an interpreter
+cannot start or dies mid-job, the script is run in a cold freecadcmd
+subprocess instead, within whatever is left of its timeout; a script that
+runs past its timeout kills its interpreter and raises TimeoutExpired.
+
+    pool = FreeCADPool(size=4)
+    stdout, stderr, returncode = pool.run(script_path, output_dir, timeout=300)
+"""
+import os
+import sys
+import json
+import queue
+import select
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+
+# Runs inside freecadcmd. Requests and responses are JSON lines on the file
+# descriptors named by FREECAD_POOL_FDS, so stdout/stderr stay free for the
+# scripts and FreeCAD's console.
+BOOTSTRAP = r'''
+import os, sys, json, runpy, traceback
+
+request_fd, response_fd = (int(fd) for fd in os.environ["FREECAD_POOL_FDS"].split(","))
+requests = os.fdopen(request_fd, "r")
+responses = os.fdopen(response_fd, "w")
+
+for name in os.environ.get("FREECAD_POOL_PRELOAD", "").split(","):
+    if name:
+        try:
+            __import__(name)
+        except Exception:
+            pass
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except Exception:
+        return 0.0
+
+def close_documents():
+    app = sys.modules.get("FreeCAD")
+    if app is not None:
+        for name in list(app.listDocuments()):
+            try:
+                app.closeDocument(name)
+            except Exception:
+                pass
+
+def run(request):
+    saved_fds = (os.dup(1), os.dup(2))
+    saved_env, saved_cwd, saved_path = dict(os.environ), os.getcwd(), list(sys.path)
+    saved_modules = set(sys.modules)
+    script_dir = os.path.dirname(os.path.abspath(request["script_path"]))
+    returncode = 0
+    try:
+        with open(request["stdout_path"], "w") as out, open(request["stderr_path"], "w") as err:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(out.fileno(), 1)
+            os.dup2(err.fileno(), 2)
+            try:
+                os.environ.update(request["env"])
+                os.chdir(request["cwd"])
+                sys.path.insert(0, script_dir)
+                sys.argv = [request["script_path"]]
+                close_documents()
+                runpy.run_path(request["script_path"], run_name="__main__")
+            except SystemExit as e:
+                returncode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+                if not isinstance(e.code, (int, type(None))):
+                    print(e.code, file=sys.stderr)
+            except BaseException:
+                traceback.print_exc()
+                returncode = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os.dup2(saved_fds[0], 1)
+                os.dup2(saved_fds[1], 2)
+    finally:
+        os.close(saved_fds[0])
+        os.close(saved_fds[1])
+        close_documents()
+        os.environ.clear()
+        os.environ.update(saved_env)
+        os.chdir(saved_cwd)
+        sys.path[:] = saved_path
+        # Forget modules the script imported from its own directory
+        for name in set(sys.modules) - saved_modules:
+            module_file = getattr(sys.modules[name], "__file__", None) or ""
+            if os.path.abspath(module_file).startswith(script_dir + os.sep):
+                del sys.modules[name]
+    return returncode
+
+responses.write(json.dumps({"ready": True, "rss_mb": rss_mb()}) + "\n")
+responses.flush()
+for line in requests:
+    returncode = run(json.loads(line))
+    responses.write(json.dumps({"returncode": returncode, "rss_mb": rss_mb()}) + "\n")
+    responses.flush()
+'''
+
+
+class InterpreterError(Exception):
+    """A warm interpreter failed to start or crashed."""
+
+
+class InterpreterTimeout(InterpreterError):
+    """A script ran past its timeout on a warm interpreter."""
+
+
+class _Interpreter:
+    """One long-lived FreeCAD process speaking the BOOTSTRAP protocol."""
+
+    def __init__(self, command, bootstrap_path, preload, startup_timeout):
+        request_read, self._request_write = os.pipe()
+        self._response_read, response_write = os.pipe()
+        env = dict(os.environ)
+        env["FREECAD_POOL_FDS"] = f"{request_read},{response_write}"
+        env["FREECAD_POOL_PRELOAD"] = ",".join(preload)
+        try:
+            self.process = subprocess.Popen(
+                command + [bootstrap_path],
+                pass_fds=(request_read, response_write),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                env=env
+            )
+        finally:
+            os.close(request_read)
+            os.close(response_write)
+        self.jobs = 0
+        self.rss_mb = 0.0
+        self._responses = os.fdopen(self._response_read, "r")
+        self._requests = os.fdopen(self._request_write, "w")
+        self.rss_mb = self._read_response(startup_timeout)["rss_mb"]
+
+    def _read_response(self, timeout, error=InterpreterError):
+        ready, _, _ = select.select([self._response_read], [], [], timeout)
+        if not ready:
+            self.kill()
+            raise error(f"no response within {timeout}s")
+        line = self._responses.readline()
+        if not line:
+            self.kill()
+            raise InterpreterError(f"interpreter exited with code {self.process.poll()}")
+        return json.loads(line)
+
+    def run(self, request, timeout):
+        try:
+            self._requests.write(json.dumps(request) + "\n")
+            self._requests.flush()
+        except (BrokenPipeError, OSError) as e:
+            self.kill()
+            raise InterpreterError(f"interpreter is gone: {e}")
+        response = self._read_response(timeout, InterpreterTimeout)
+        self.jobs += 1
+        self.rss_mb = response["rss_mb"]
+        return response["returncode"]
+
+    def close(self):
+        """Ask the interpreter to exit (EOF on its request pipe)."""
+        try:
+            self._requests.close()
+            self.process.wait(timeout=10)
+        except Exception:
+            self.kill()
+        finally:
+            self._responses.close()
+
+    def kill(self):
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        for pipe in (self._requests, self._responses):
+            try:
+                pipe.close()
+            except Exception:
+                pass
+
+
+class FreeCADPool:
+    """
+    Thread-safe pool of up to `size` warm FreeCAD interpreters.
+
+    Args:
+        size: Maximum number of interpreters (one job each at a time)
+        command: Command that runs a Python file inside FreeCAD
+        preload: Modules imported once per interpreter
+        max_jobs: Recycle an interpreter after this many jobs
+        max_rss_mb: Recycle an interpreter whose resident memory exceeds this
+        startup_timeout: Seconds to wait for a new interpreter to be ready
+        startup_backoff: After a failed start, run scripts cold for this many seconds
+    """
+
+    def __init__(self, size=1, command=None, preload=("FreeCAD", "Part", "Mesh", "Import"),
+                 max_jobs=50, max_rss_mb=1024, startup_timeout=60, startup_backoff=300):
+        self.size = size
+        self.command = list(command or ["freecadcmd"])
+        self.preload = list(preload)
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.startup_timeout = startup_timeout
+        self.startup_backoff = startup_backoff
+        self._warm_after = 0.0
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._closed = False
+        self.stats = {"warm_runs": 0, "cold_runs": 0, "started": 0, "recycled": 0, "crashed": 0, "timeouts": 0}
+
+        self._work_dir = tempfile.mkdtemp(prefix="freecad-pool-")
+        self._bootstrap_path = os.path.join(self._work_dir, "freecad_pool_bootstrap.py")
+        with open(self._bootstrap_path, "w") as f:
+            f.write(BOOTSTRAP)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        self._count("started")
+        try:
+            return _Interpreter(self.command, self._bootstrap_path, self.preload, self.startup_timeout)
+        except Exception as e:
+            self._warm_after = time.monotonic() + self.startup_backoff
+            raise InterpreterError(f"could not start interpreter: {e}")
+
+    def _release(self, interpreter):
+        if self._closed or interpreter.jobs >= self.max_jobs or interpreter.rss_mb > self.max_rss_mb:
+            self._count("recycled")
+            interpreter.close()
+        else:
+            self._idle.put(interpreter)
+
+    def run_cold(self, script_path, output_dir, timeout, env=None):
+        """Run a script in a fresh FreeCAD process (the pre-pool behaviour)."""
+        self._count("cold_runs")
+        run_env = dict(os.environ)
+        run_env.update(env or {})
+        run_env["FREECAD_OUTPUT"] = output_dir
+        result = subprocess.run(self.command + [script_path], capture_output=True, text=True,
+                                timeout=timeout, env=run_env)
+        return result.stdout, result.stderr, result.returncode
+
+    def run(self, script_path, output_dir, timeout, env=None):
+        """
+        Run a script on a warm interpreter with FREECAD_OUTPUT=output_dir.
+
+        Returns:
+            (stdout, stderr, returncode), like a freecadcmd subprocess
+
+        Raises:
+            subprocess.TimeoutExpired: If the script (warm or cold) exceeds the timeout
+        """
+        if time.monotonic() < self._warm_after:
+            return self.run_cold(script_path, output_dir, timeout, env)
+
+        request_env = dict(env or {})
+        request_env["FREECAD_OUTPUT"] = output_dir
+        capture_dir = tempfile.mkdtemp(dir=self._work_dir)
+        request = {
+            "script_path": os.path.abspath(script_path),
+            "cwd": os.path.dirname(os.path.abspath(script_path)),
+            "env": request_env,
+            "stdout_path": os.path.join(capture_dir, "stdout"),
+            "stderr_path": os.path.join(capture_dir, "stderr")
+        }
+
+        self._slots.acquire()
+        started = time.monotonic()
+        try:
+            interpreter = self._acquire()
+            returncode = interpreter.run(request, timeout)
+            self._count("warm_runs")
+            self._release(interpreter)
+            with open(request["stdout_path"], errors="replace") as out, open(request["stderr_path"], errors="replace") as err:
+                return out.read(), err.read(), returncode
+        except InterpreterTimeout:
+            # The interpreter was killed; a cold run would time out as well
+            self._count("timeouts")
+            raise subprocess.TimeoutExpired(script_path, timeout)
+        except InterpreterError:
+            self._count("crashed")
+        finally:
+            self._slots.release()
+            shutil.rmtree(capture_dir, ignore_errors=True)
+
+        # The cold run only gets what is left of the timeout
+        remaining = timeout - (time.monotonic() - started)
+        if remaining <= 0:
+            raise subprocess.TimeoutExpired(script_path, timeout)
+        return self.run_cold(script_path, output_dir, remaining, env)
+
+    def close(self):
+        """Stop every idle interpreter; busy ones stop when their job returns."""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        shutil.rmtree(self._work_dir, ignore_errors=True)
@@ -819,59 +819,47 @@ const WorkspacePageEnhanced = () => {
     // Priority order: STEP > IGES > FCSTD > STL > OBJ (assembled formats first)
     const formatPriority = ['STEP', 'IGES', 'FCSTD', 'STL', 'OBJ'];
     
-    for (const format of formatPriority) {
-      try {
-        console.log(`🔍 Trying format: ${format} for project ${projectId}`);
-        
-        const response = await fetch(`/api/projects/${encodeURIComponent(projectId)}/download/${format}`, {
-          headers: {
-            'Authorization': `Bearer ${token}`,
-            'Content-Type': 'application/json'
-          }
-        });
-        
-        console.log(`📡 ${format} API response status: ${response.status}`);
+    try {
+      console.log(`🔍 Fetching download URLs for all formats of project ${projectId}`);
+      
+      // One request returns pre-signed URLs for every available format
+      const response = await fetch(`/api/projects/${encodeURIComponent(projectId)}/downloads`, {
+        headers: {
+          'Authorization': `Bearer ${token}`,
+          'Content-Type': 'application/json'
+        }
+      });
+      
+      console.log(`📡 Downloads API response status: ${response.status}`);
+      
+      const contentType = response.headers.get('content-type');
+      if (response.ok && contentType && contentType.includes('application/json')) {
+        const data = await response.json();
+        console.log(`📁 Downloads API response data:`, data);
         
-        if (response.ok) {
-          // Check if response is actually JSON
-          const contentType = response.headers.get('content-type');
-          console.log(`📋 Response content-type: ${contentType}`);
+        const format = formatPriority.find(f => data.formats?.[f]?.download_url);
+        if (data.success && format) {
+          const downloadUrl = data.formats[format].download_url;
+          console.log(`✅ Got ${format} S3 URL for ${projectId}: ${downloadUrl}`);
           
-          if (!contentType || !contentType.includes('application/json')) {
-            console.log(`⚠️ ${format} returned non-JSON response, trying next format...`);
-            continue; // Try next format
-          }
+          // Cache the S3 URL
+          setS3ModelUrls(prev => ({
+            ...prev,
+            [projectId]: downloadUrl
+          }));
           
-          const data = await response.json();
-          console.log(`📁 ${format} API response data:`, data);
+          // Force ThreeViewer to reload with new URL
+          setViewerRefreshKey(prev => prev + 1);
           
-          if (data.success && data.download_url) {
-            console.log(`✅ Got ${format} S3 URL for ${projectId}: ${data.download_url}`);
-            
-            // Cache the S3 URL
-            setS3ModelUrls(prev => ({
-              ...prev,
-              [projectId]: data.download_url
-            }));
-            
-            // Force ThreeViewer to reload with new URL
-            setViewerRefreshKey(prev => prev + 1);
-            
-            toast.success(`3D model loaded successfully! (${format} format)`);
-            setLoadingOutputs(prev => ({ ...prev, [projectId]: false }));
-            return; // Success! Exit the format loop
-          } else {
-            console.log(`⚠️ No ${format} file found for project ${projectId}, trying next format...`);
-            continue; // Try next format
-          }
-        } else {
-          console.log(`❌ ${format} request failed (${response.status}), trying next format...`);
-          continue; // Try next format
+          toast.success(`3D model loaded successfully! (${format} format)`);
+          setLoadingOutputs(prev => ({ ...prev, [projectId]: false }));
+          return;
         }
-      } catch (formatError) {
-        console.log(`❌ Error trying ${format}: ${formatError.message}, trying next format...`);
-        continue; // Try next format
+      } else {
+        console.log(`❌ Downloads request failed (${response.status})`);
       }
+    } catch (error) {
+      console.log(`❌ Error fetching download URLs: ${error.message}`);
     }
     
     // If we get here, no format worked